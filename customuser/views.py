@@ -3,18 +3,20 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.contrib.auth.tokens import default_token_generator
 from django.conf import settings
+from django.db import transaction
 from django.urls import reverse
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.cache import never_cache
 from django.utils import timezone
 
+from notifications.outbox import queue_email
+
 from .models import CustomUser, Profile
 from .forms import CustomUserCreationForm, CustomUserLoginForm, ProfileUpdateForm
 
@@ -29,13 +31,14 @@ def register_view(request):
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
             # Create inactive user
-            user = form.save(commit=False)
-            user.is_active = False
-            user.is_email_verified = False
-            user.save()
-            
-            # Send verification email
-            send_verification_email(request, user)
+            with transaction.atomic():
+                user = form.save(commit=False)
+                user.is_active = False
+                user.is_email_verified = False
+                user.save()
+
+                # Queue the verification email with the account
+                send_verification_email(request, user)
             
             messages.success(
                 request, 
@@ -49,7 +52,7 @@ def register_view(request):
 
 
 def send_verification_email(request, user):
-    """Send email verification link"""
+    """Queue the email verification link in the outbox"""
     token = default_token_generator.make_token(user)
     uid = urlsafe_base64_encode(force_bytes(user.pk))
     
@@ -64,13 +67,13 @@ def send_verification_email(request, user):
         'site_name': settings.SITE_NAME if hasattr(settings, 'SITE_NAME') else 'Our Site',
     })
     
-    send_mail(
-        subject,
-        '',  # Plain text version (optional)
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-        html_message=message,
-        fail_silently=False,
+    queue_email(
+        to=user.email,
+        subject=subject,
+        html_body=message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        category='verification',
+        reference=user.pk,
     )
 
 
@@ -0,0 +1,139 @@
+# feeds/activity.py - Daily rollups and retention for FeedActivity
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import FeedActivity, FeedActivityDaily
+
+
+# Raw activity rows are kept this long before being compacted into rollups
+ACTIVITY_RETENTION_DAYS = getattr(settings, 'FEED_ACTIVITY_RETENTION_DAYS', 30)
+
+# Raw rows compacted per transaction
+ACTIVITY_COMPACT_BATCH_SIZE = 5000
+
+
+def _merge_rollups(counts):
+    """Add ``counts`` {(day, feed_id, post_id, type): n} to the daily rollup rows"""
+    days = {day for day, _, _, _ in counts}
+    post_ids = {post_id for _, _, post_id, _ in counts if post_id is not None}
+    types = {activity_type for _, _, _, activity_type in counts}
+
+    existing = {}
+    for rollup in FeedActivityDaily.objects.select_for_update().filter(
+        Q(post__in=post_ids) | Q(post__isnull=True),
+        day__in=days,
+        activity_type__in=types,
+    ):
+        existing.setdefault((rollup.day, rollup.feed_id, rollup.post_id, rollup.activity_type), rollup)
+
+    updated, created = [], []
+    for key, n in counts.items():
+        rollup = existing.get(key)
+        if rollup is not None:
+            rollup.count += n
+            updated.append(rollup)
+        else:
+            day, feed_id, post_id, activity_type = key
+            created.append(FeedActivityDaily(
+                day=day, feed_id=feed_id, post_id=post_id, activity_type=activity_type, count=n
+            ))
+
+    FeedActivityDaily.objects.bulk_update(updated, ['count'])
+    FeedActivityDaily.objects.bulk_create(created)
+
+
+def _claim_activity(before, batch_size):
+    """
+    Delete up to ``batch_size`` raw rows older than ``before`` and return
+    their (created_at, feed_id, post_id, activity_type).
+
+    As in feeds.counters._claim_deltas, the delete is the claim: only one
+    of two overlapping compactions gets a row, so none is rolled up
+    twice, and on SQLite the write lock is taken by the first statement.
+    """
+    meta = FeedActivity._meta
+    fields = [meta.get_field(name) for name in ('created_at', 'feed', 'post', 'activity_type')]
+    quote = connection.ops.quote_name
+    table = quote(meta.db_table)
+    pk = quote(meta.pk.column)
+    columns = ', '.join(quote(field.column) for field in fields)
+    lock = ' FOR UPDATE SKIP LOCKED' if connection.features.has_select_for_update_skip_locked else ''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE {pk} IN ("
+            f"SELECT {pk} FROM {table} WHERE {quote(fields[0].column)} < %s ORDER BY {pk} LIMIT %s{lock}"
+            f") RETURNING {columns}",
+            [fields[0].get_db_prep_value(before, connection), batch_size],
+        )
+        rows = cursor.fetchall()
+
+    # Raw rows come back as the backend stores them (e.g. datetimes and
+    # UUIDs as text on SQLite); convert them as a queryset would
+    expressions = [field.get_col(meta.db_table) for field in fields]
+    converters = [
+        connection.ops.get_db_converters(expression) + expression.get_db_converters(connection)
+        for expression in expressions
+    ]
+    claimed = []
+    for row in rows:
+        values = []
+        for value, expression, field_converters in zip(row, expressions, converters):
+            for converter in field_converters:
+                value = converter(value, expression, connection)
+            values.append(value)
+        claimed.append(tuple(values))
+    return claimed
+
+
+def compact_activity(before, batch_size=ACTIVITY_COMPACT_BATCH_SIZE):
+    """
+    Fold one batch of raw activity older than ``before`` into the rollups.
+
+    Rows are claimed (deleted) in primary key (i.e. insertion) order,
+    counted per day, feed, post and type and added to FeedActivityDaily,
+    all in one transaction, so overlapping runs never count a row twice.
+    Returns the number of raw rows compacted; call until it returns 0.
+    """
+    with transaction.atomic():
+        rows = _claim_activity(before, batch_size)
+        if not rows:
+            return 0
+
+        _merge_rollups(Counter(
+            (timezone.localdate(created_at), feed_id, post_id, activity_type)
+            for created_at, feed_id, post_id, activity_type in rows
+        ))
+
+    return len(rows)
+
+
+def retention_cutoff(days=ACTIVITY_RETENTION_DAYS):
+    """Start of the oldest day kept as raw rows"""
+    start_of_today = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+    return start_of_today - timedelta(days=days)
+
+
+def activity_counts(since, feed=None):
+    """
+    Activity per type since ``since``, from rollups and raw rows combined.
+
+    ``since`` is a datetime; rollups are counted from its day on, so it
+    should fall on a day boundary when it reaches into compacted history.
+    """
+    raw = FeedActivity.objects.filter(created_at__gte=since)
+    rollups = FeedActivityDaily.objects.filter(day__gte=timezone.localdate(since))
+    if feed is not None:
+        raw = raw.filter(feed=feed)
+        rollups = rollups.filter(feed=feed)
+
+    totals = Counter()
+    for row in raw.values('activity_type').annotate(n=Count('pk')).order_by():
+        totals[row['activity_type']] += row['n']
+    for row in rollups.values('activity_type').annotate(n=Sum('count')).order_by():
+        totals[row['activity_type']] += row['n']
+    return totals
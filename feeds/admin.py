@@ -5,8 +5,9 @@ from django.urls import reverse
 from django.db.models import Count
 from .models import (
     Feed, Post, PostMedia, Comment, PostLike, CommentLike,
-    PostShare, Poll, PollOption, PollVote, FeedActivity
+    PostShare, Poll, PollOption, PollVote, FeedActivity, FeedActivityDaily
 )
+from .timeline import fan_out_post
 
 
 @admin.register(Feed)
@@ -145,7 +146,11 @@ class PostAdmin(admin.ModelAdmin):
     engagement_score_display.short_description = 'Engagement'
     
     def approve_posts(self, request, queryset):
+        # update() skips post_save, so queue the timeline fan-out here
+        newly_approved = list(queryset.filter(is_approved=False).select_related('feed__group'))
         updated = queryset.update(is_approved=True, is_flagged=False)
+        for post in newly_approved:
+            fan_out_post(post)
         self.message_user(request, f'{updated} posts approved.')
     approve_posts.short_description = 'Approve selected posts'
     
@@ -299,6 +304,14 @@ class FeedActivityAdmin(admin.ModelAdmin):
     #     return False
 
 
+@admin.register(FeedActivityDaily)
+class FeedActivityDailyAdmin(admin.ModelAdmin):
+    list_display = ['day', 'feed', 'post', 'activity_type', 'count']
+    list_filter = ['activity_type', 'day']
+    search_fields = ['feed__group__name', 'post__title']
+    readonly_fields = ['day', 'feed', 'post', 'activity_type', 'count']
+
+
 # Custom admin site configuration
 admin.site.site_header = 'Social Feeds Administration'
 admin.site.site_title = 'Feeds Admin'
@@ -0,0 +1,48 @@
+# feeds/comment_preview.py - Bounded "latest comments" preview for feed pages
+from collections import defaultdict
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Comment
+
+
+COMMENT_PREVIEW_SIZE = 3
+
+
+def attach_comment_previews(posts, limit=COMMENT_PREVIEW_SIZE):
+    """
+    Attach the latest ``limit`` top-level comments to every post on a page.
+
+    Sets ``post.comment_preview`` (newest first). A ROW_NUMBER() window
+    partitioned by post keeps only the first ``limit`` rows per post in
+    the database, so a single query returns at most len(posts) * limit
+    comments with their authors and profiles, however many comments the
+    posts actually have.
+    """
+    posts = list(posts)
+    if not posts:
+        return posts
+
+    comments = Comment.objects.filter(
+        post_id__in=[post.pk for post in posts],
+        parent__isnull=True,
+        is_approved=True,
+    ).annotate(
+        preview_rank=Window(
+            RowNumber(),
+            partition_by=F('post_id'),
+            order_by=[F('created_at').desc(), F('id').desc()],
+        )
+    ).filter(
+        preview_rank__lte=limit
+    ).select_related('author', 'author__profile').order_by('post_id', 'preview_rank')
+
+    previews = defaultdict(list)
+    for comment in comments:
+        previews[comment.post_id].append(comment)
+
+    for post in posts:
+        post.comment_preview = previews.get(post.pk, [])
+
+    return posts
@@ -0,0 +1,135 @@
+# feeds/counters.py - Write-behind engagement counters
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+
+from .models import CounterDelta, PollOption, Post
+
+
+# Journal rows folded per transaction
+COUNTER_FOLD_BATCH_SIZE = getattr(settings, 'FEED_COUNTER_FOLD_BATCH_SIZE', 1000)
+
+TARGETS = (
+    ('post_id', Post),
+    ('option_id', PollOption),
+)
+
+
+def _pending_sums(target, ids):
+    """Map id -> {field: un-folded delta} for the given targets"""
+    rows = CounterDelta.objects.filter(
+        **{f'{target}__in': ids}
+    ).values(target, 'field').annotate(total=Sum('delta'))
+
+    pending = defaultdict(dict)
+    for row in rows:
+        pending[row[target]][row['field']] = row['total']
+    return pending
+
+
+def _merge(objects, target):
+    objects = list(objects)
+    if not objects:
+        return objects
+
+    pending = _pending_sums(target, [obj.pk for obj in objects])
+    for obj in objects:
+        for field, total in pending.get(obj.pk, {}).items():
+            setattr(obj, field, max(getattr(obj, field) + total, 0))
+    return objects
+
+
+def merge_pending_counts(posts):
+    """
+    Add un-folded deltas to the counters of already loaded posts.
+
+    One query for the whole page, so feed pages show exact counts even
+    while the fold worker is behind.
+    """
+    return _merge(posts, 'post_id')
+
+
+def merge_pending_votes(options):
+    """Same as merge_pending_counts, for PollOption.votes_count"""
+    return _merge(options, 'option_id')
+
+
+def current_count(obj, field):
+    """Read a single counter from the database, including pending deltas"""
+    target = 'option_id' if isinstance(obj, PollOption) else 'post_id'
+    stored = type(obj).objects.filter(pk=obj.pk).values_list(field, flat=True).first() or 0
+    pending = CounterDelta.objects.filter(
+        **{target: obj.pk}, field=field
+    ).aggregate(total=Sum('delta'))['total'] or 0
+    return max(stored + pending, 0)
+
+
+def _claim_deltas(batch_size):
+    """
+    Delete up to ``batch_size`` journal rows and return their
+    (post_id, option_id, field, delta).
+
+    DELETE ... RETURNING makes the delete itself the claim: two folders
+    can never both sum a row, since only one of them deletes it. Run as
+    the first statement of the fold's transaction it also takes SQLite's
+    write lock up front, rather than after a read that a concurrent fold
+    would invalidate. Where SKIP LOCKED exists, concurrent folders take
+    different batches instead of queueing behind one another.
+    """
+    table = connection.ops.quote_name(CounterDelta._meta.db_table)
+    pk = connection.ops.quote_name(CounterDelta._meta.pk.column)
+    columns = ', '.join(
+        connection.ops.quote_name(CounterDelta._meta.get_field(name).column)
+        for name in ('post', 'option', 'field', 'delta')
+    )
+    lock = ' FOR UPDATE SKIP LOCKED' if connection.features.has_select_for_update_skip_locked else ''
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE {pk} IN (SELECT {pk} FROM {table} ORDER BY {pk} LIMIT %s{lock}) "
+            f"RETURNING {columns}",
+            [batch_size],
+        )
+        return cursor.fetchall()
+
+
+def fold_counter_deltas(batch_size=None):
+    """
+    Apply one batch of journalled deltas to the counter columns.
+
+    Deltas are summed per row first, so a memorial post that received a
+    thousand likes since the last fold is updated once. The journal rows
+    are claimed (deleted) and the counters updated in the same
+    transaction, so any number of folders may run at once.
+    Returns (journal rows folded, ids of the posts whose counters changed),
+    the latter for rescoring (feeds.ranking.rescore_posts).
+    """
+    batch_size = batch_size or COUNTER_FOLD_BATCH_SIZE
+
+    with transaction.atomic():
+        rows = _claim_deltas(batch_size)
+        if not rows:
+            return 0, set()
+
+        updates = {target: defaultdict(lambda: defaultdict(int)) for target, _ in TARGETS}
+        for post_id, option_id, field, delta in rows:
+            if post_id is not None:
+                updates['post_id'][post_id][field] += delta
+            elif option_id is not None:
+                updates['option_id'][option_id][field] += delta
+
+        changed_posts = set()
+        for target, model in TARGETS:
+            for pk, fields in updates[target].items():
+                fields = {field: total for field, total in fields.items() if total}
+                if fields:
+                    model.objects.filter(pk=pk).update(**{
+                        field: Greatest(F(field) + total, 0)
+                        for field, total in fields.items()
+                    })
+                    if model is Post:
+                        changed_posts.add(pk)
+
+    return len(rows), changed_posts
@@ -0,0 +1,168 @@
+# feeds/impressions.py - Deduplicated, batched post view counting
+"""
+Views are reported by the browser in batches as posts scroll into view.
+Each (user, post) pair is counted at most once per FEED_VIEW_WINDOW_SECONDS,
+using a rotating pair of Bloom filters held in memory, and the counts are
+written as views_count deltas to the counter journal (see feeds.counters)
+in bulk, so no row is written per impression.
+
+Error bounds:
+- A Bloom false positive drops a real view; the filters are sized for
+  FEED_VIEW_FILTER_ERROR_RATE (1%) at FEED_VIEW_FILTER_CAPACITY entries
+  and rotate early when full, so undercounting stays below that rate.
+- Each process has its own filters, so with N worker processes a user may
+  be counted up to N times per window.
+- Pending counts are written by a timer at most
+  FEED_VIEW_FLUSH_INTERVAL_SECONDS after the first of them, and at
+  interpreter exit; only a process killed outright loses them (at most
+  FEED_VIEW_FLUSH_THRESHOLD views).
+"""
+import atexit
+import hashlib
+import math
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+
+from .models import CounterDelta
+
+
+VIEW_WINDOW = getattr(settings, 'FEED_VIEW_WINDOW_SECONDS', 6 * 60 * 60)
+
+VIEW_FILTER_CAPACITY = getattr(settings, 'FEED_VIEW_FILTER_CAPACITY', 100_000)
+
+VIEW_FILTER_ERROR_RATE = getattr(settings, 'FEED_VIEW_FILTER_ERROR_RATE', 0.01)
+
+# Pending views are written once this many have accumulated or the
+# interval has passed, whichever comes first
+VIEW_FLUSH_THRESHOLD = getattr(settings, 'FEED_VIEW_FLUSH_THRESHOLD', 500)
+
+VIEW_FLUSH_INTERVAL = getattr(settings, 'FEED_VIEW_FLUSH_INTERVAL_SECONDS', 30)
+
+# Post ids accepted per request
+MAX_IMPRESSIONS_PER_REQUEST = 50
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key):
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    @property
+    def is_full(self):
+        return self.count >= self.capacity
+
+
+class ImpressionTracker:
+    """
+    Counts each (user, post) view once per window and batches the writes.
+
+    Two filter generations are kept; the current one is retired every
+    half window (or when full), so a view is remembered for between half
+    and a whole window.
+    """
+
+    def __init__(self, window=VIEW_WINDOW, capacity=VIEW_FILTER_CAPACITY,
+                 error_rate=VIEW_FILTER_ERROR_RATE, flush_threshold=VIEW_FLUSH_THRESHOLD,
+                 flush_interval=VIEW_FLUSH_INTERVAL):
+        self.rotate_every = window / 2
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.flush_threshold = flush_threshold
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous = BloomFilter(capacity, error_rate)
+        self.rotated_at = time.monotonic()
+        self.pending = Counter()
+        self.flushed_at = time.monotonic()
+        self.timer = None
+
+    def _rotate(self, now):
+        if self.current.is_full or now - self.rotated_at >= self.rotate_every:
+            self.previous = self.current
+            self.current = BloomFilter(self.capacity, self.error_rate)
+            self.rotated_at = now
+
+    def record(self, user_id, post_ids):
+        """
+        Count views of ``post_ids`` by ``user_id`` not seen in this window.
+
+        Returns the number of new views.
+        """
+        now = time.monotonic()
+        new_views = 0
+
+        with self.lock:
+            self._rotate(now)
+            for post_id in post_ids:
+                key = f"{user_id}:{post_id}"
+                if key in self.current or key in self.previous:
+                    continue
+                self.current.add(key)
+                self.pending[post_id] += 1
+                new_views += 1
+
+            due = (
+                sum(self.pending.values()) >= self.flush_threshold
+                or now - self.flushed_at >= self.flush_interval
+            )
+            if self.pending and not due and self.timer is None:
+                # Without further requests the views would wait forever
+                self.timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+                self.timer.daemon = True
+                self.timer.start()
+
+        if due:
+            self.flush()
+        return new_views
+
+    def flush(self):
+        """Write pending views to the counter journal, one row per post"""
+        with self.lock:
+            pending, self.pending = self.pending, Counter()
+            self.flushed_at = time.monotonic()
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+        if pending:
+            CounterDelta.objects.bulk_create([
+                CounterDelta(post_id=post_id, field='views_count', delta=views)
+                for post_id, views in pending.items()
+            ])
+        return sum(pending.values())
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            # The timer thread's own connection
+            connections.close_all()
+
+
+impression_tracker = ImpressionTracker()
+atexit.register(impression_tracker.flush)
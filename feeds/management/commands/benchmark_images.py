@@ -0,0 +1,108 @@
+# feeds/management/commands/benchmark_images.py
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from PIL import Image, ImageOps
+
+from feeds.utils import derive_image_files
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _baseline():
+    return _peak_rss_mb(), 0.0
+
+
+def _legacy(path):
+    """The previous in-request path: full decode, BytesIO outputs, full copy"""
+    started = time.monotonic()
+    image = Image.open(path)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
+        image = background
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((2048, 2048), Image.Resampling.LANCZOS)
+    BytesIO().write(_encode(image))
+    thumbnail = image.copy()
+    thumbnail.thumbnail((300, 300), Image.Resampling.LANCZOS)
+    BytesIO().write(_encode(thumbnail))
+    return _peak_rss_mb(), time.monotonic() - started
+
+
+def _encode(image):
+    output = BytesIO()
+    image.save(output, format='JPEG', quality=85)
+    return output.getvalue()
+
+
+def _current(path):
+    """The media worker's path (derive_image_files), the only one in use"""
+    started = time.monotonic()
+    image_path, thumbnail_path, _ = derive_image_files(path)
+    elapsed = time.monotonic() - started
+    os.remove(image_path)
+    os.remove(thumbnail_path)
+    return _peak_rss_mb(), elapsed
+
+
+class Command(BaseCommand):
+    help = 'Measure peak memory and time of derive_image_files per upload size'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--megapixels',
+            type=int,
+            nargs='+',
+            default=[2, 12, 24, 48],
+            help='Synthetic JPEG sizes to process'
+        )
+
+    def run_isolated(self, func, *args):
+        # A fresh process per measurement, so ru_maxrss is the peak of
+        # exactly one upload
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            return executor.submit(func, *args).result()
+
+    def handle(self, *args, **options):
+        baseline, _ = self.run_isolated(_baseline)
+
+        self.stdout.write('Image Processing Benchmark')
+        self.stdout.write('=' * 50)
+        self.stdout.write(f'Process baseline: {baseline:.0f} MB peak RSS')
+        self.stdout.write('')
+        self.stdout.write(f'{"Upload":>10} {"File":>9} {"Legacy":>16} {"Current":>16}')
+
+        for megapixels in options['megapixels']:
+            width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+            height = width * 3 // 4
+
+            fd, path = tempfile.mkstemp(suffix='.jpg')
+            try:
+                with os.fdopen(fd, 'wb') as output:
+                    Image.effect_noise((width, height), 40).convert('RGB').save(output, format='JPEG', quality=90)
+                file_mb = os.path.getsize(path) / (1024 * 1024)
+
+                legacy_rss, legacy_time = self.run_isolated(_legacy, path)
+                current_rss, current_time = self.run_isolated(_current, path)
+            finally:
+                os.remove(path)
+
+            self.stdout.write(
+                f'{megapixels:>8}MP {file_mb:>7.1f}MB '
+                f'{legacy_rss - baseline:>7.0f}MB {legacy_time:>5.2f}s '
+                f'{current_rss - baseline:>7.0f}MB {current_time:>5.2f}s'
+            )
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS('Peak RSS is shown above the process baseline'))
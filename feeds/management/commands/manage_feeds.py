@@ -1,12 +1,104 @@
 # feeds/management/commands/manage_feeds.py
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
 from django.utils import timezone
 from django.db.models import Count, Q
 from datetime import timedelta
 from feeds.models import Feed, Post, PostMedia, FeedActivity, Comment, PostLike
+from feeds.activity import activity_counts, compact_activity, retention_cutoff
+from feeds.recount import iter_chunks, recount_chunk
 from group.models import Group
 
 
+class RecountCheckpoint:
+    """
+    Progress of an update_counts run, persisted to a JSON file after every
+    chunk so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, path, scope):
+        self.path = path
+        self.scope = scope or 'all'
+        self.lock = threading.Lock()
+        self.state = {'scope': self.scope, 'last_pk': None, 'feeds': {}, 'finished_feeds': [], 'done': 0}
+
+        if path and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get('scope') == self.scope:
+                self.state = saved
+
+    @property
+    def done(self):
+        return self.state['done']
+
+    def resume_after(self, feed_id=None):
+        if feed_id is None:
+            return self.state['last_pk']
+        return self.state['feeds'].get(str(feed_id))
+
+    def is_feed_done(self, feed_id):
+        return str(feed_id) in self.state['finished_feeds']
+
+    def save_chunk(self, last_pk, size, feed_id=None):
+        with self.lock:
+            if feed_id is None:
+                self.state['last_pk'] = str(last_pk)
+            else:
+                self.state['feeds'][str(feed_id)] = str(last_pk)
+            self.state['done'] += size
+            self._write()
+
+    def mark_feed_done(self, feed_id):
+        with self.lock:
+            self.state['feeds'].pop(str(feed_id), None)
+            self.state['finished_feeds'].append(str(feed_id))
+            self._write()
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _write(self):
+        if not self.path:
+            return
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+
+
+class RecountProgress:
+    """Thread-safe progress line for update_counts"""
+
+    def __init__(self, command, total, already_done=0):
+        self.command = command
+        self.total = total
+        self.done = already_done
+        self.resumed_from = already_done
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+
+        if already_done:
+            command.stdout.write(f'  → Resuming after {already_done} posts')
+
+    def advance(self, size):
+        with self.lock:
+            self.done += size
+            elapsed = time.monotonic() - self.started
+            rate = (self.done - self.resumed_from) / elapsed if elapsed else 0
+            percent = self.done / self.total * 100 if self.total else 100
+            self.command.stdout.write(
+                f'  ✓ {self.done}/{self.total} posts ({percent:.1f}%, {rate:.0f} posts/s)'
+            )
+
+
 class Command(BaseCommand):
     help = 'Management commands for the feeds system'
 
@@ -15,7 +107,8 @@ class Command(BaseCommand):
             'action',
             choices=[
                 'create_feeds', 'cleanup_media', 'update_counts', 
-                'moderate_posts', 'analytics', 'migrate_memorial'
+                'moderate_posts', 'analytics', 'migrate_memorial',
+                'compact_activity'
             ],
             help='Action to perform'
         )
@@ -24,7 +117,7 @@ class Command(BaseCommand):
             '--days',
             type=int,
             default=30,
-            help='Number of days for cleanup operations'
+            help='Number of days for cleanup operations (raw activity kept, for compact_activity)'
         )
         
         parser.add_argument(
@@ -38,6 +131,26 @@ class Command(BaseCommand):
             type=str,
             help='Specific group ID for targeted operations'
         )
+        
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Posts recounted per UPDATE (update_counts) or activity rows per batch (compact_activity)'
+        )
+        
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Recount feeds in parallel with this many workers (update_counts)'
+        )
+        
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            help='Checkpoint file; an interrupted update_counts resumes from it'
+        )
 
     def handle(self, *args, **options):
         action = options['action']
@@ -54,6 +167,8 @@ class Command(BaseCommand):
             self.show_analytics(options)
         elif action == 'migrate_memorial':
             self.migrate_memorial_posts(options)
+        elif action == 'compact_activity':
+            self.compact_feed_activity(options)
 
     def create_missing_feeds(self, options):
         """Create Feed objects for groups that don't have them"""
@@ -155,36 +270,47 @@ class Command(BaseCommand):
         if options['group_id']:
             posts_query = posts_query.filter(feed__group_id=options['group_id'])
         
-        updated_count = 0
-        
-        for post in posts_query:
-            if not options['dry_run']:
-                # Recalculate counts
-                post.likes_count = post.likes.count() # type: ignore
-                post.comments_count = post.comments.count() # type: ignore
-                post.shares_count = post.shares.count() # type: ignore
-                
-                # Update views from activity log
-                views_count = FeedActivity.objects.filter(
-                    post=post,
-                    activity_type='view'
-                ).values('user').distinct().count()
-                post.views_count = views_count
-                
-                post.save(update_fields=[
-                    'likes_count', 'comments_count', 'shares_count', 'views_count'
-                ])
-                
-                updated_count += 1
-            else:
-                self.stdout.write(f'  → Would update post: {post.title or post.content[:50]}')
+        total = posts_query.count()
         
         if options['dry_run']:
-            self.stdout.write(f'Would update {posts_query.count()} posts')
+            self.stdout.write(f'Would update {total} posts')
+            return
+        
+        checkpoint = RecountCheckpoint(options['checkpoint'], options['group_id'])
+        progress = RecountProgress(self, total, already_done=checkpoint.done)
+        chunk_size = options['chunk_size']
+        
+        if options['workers'] > 1:
+            # One task per feed; each worker walks its feed in pk chunks
+            feed_ids = [
+                feed_id for feed_id in posts_query.order_by().values_list('feed_id', flat=True).distinct()
+                if not checkpoint.is_feed_done(feed_id)
+            ]
+            
+            def recount_feed(feed_id):
+                try:
+                    feed_posts = posts_query.filter(feed_id=feed_id)
+                    for first, last, size in iter_chunks(feed_posts, chunk_size, checkpoint.resume_after(feed_id)):
+                        recount_chunk(feed_posts, first, last)
+                        checkpoint.save_chunk(last, size, feed_id=feed_id)
+                        progress.advance(size)
+                    checkpoint.mark_feed_done(feed_id)
+                finally:
+                    connection.close()
+            
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                for future in as_completed([pool.submit(recount_feed, feed_id) for feed_id in feed_ids]):
+                    future.result()
         else:
-            self.stdout.write(
-                self.style.SUCCESS(f'Updated engagement counts for {updated_count} posts')
-            )
+            for first, last, size in iter_chunks(posts_query, chunk_size, checkpoint.resume_after()):
+                recount_chunk(posts_query, first, last)
+                checkpoint.save_chunk(last, size)
+                progress.advance(size)
+        
+        checkpoint.clear()
+        self.stdout.write(
+            self.style.SUCCESS(f'Updated engagement counts for {progress.done} posts')
+        )
 
     def auto_moderate_posts(self, options):
         """Auto-moderate posts based on keywords and patterns"""
@@ -312,6 +438,10 @@ class Command(BaseCommand):
         self.stdout.write(f'  New Posts: {recent_posts}')
         self.stdout.write(f'  New Comments: {recent_comments}')
         
+        activity_types = dict(FeedActivity.ACTIVITY_TYPES)
+        for activity_type, count in activity_counts(retention_cutoff(days=7)).most_common():
+            self.stdout.write(f'  {activity_types.get(activity_type, activity_type)}: {count}')
+        
         # Memorial integration stats
         memorial_posts = Post.objects.filter(
             memorial_related__isnull=False,
@@ -332,6 +462,28 @@ class Command(BaseCommand):
                 type_display = dict(Post.POST_TYPES).get(mt['post_type'], mt['post_type'])
                 self.stdout.write(f'    {type_display}: {mt["count"]}')
 
+    def compact_feed_activity(self, options):
+        """Fold raw activity older than --days into the daily rollups"""
+        cutoff = retention_cutoff(days=options['days'])
+        self.stdout.write(f'Compacting feed activity before {cutoff:%Y-%m-%d}...')
+        
+        if options['dry_run']:
+            count = FeedActivity.objects.filter(created_at__lt=cutoff).count()
+            self.stdout.write(f'Would compact {count} activity rows')
+            return
+        
+        total = 0
+        while True:
+            compacted = compact_activity(cutoff, batch_size=options['chunk_size'])
+            if not compacted:
+                break
+            total += compacted
+            self.stdout.write(f'  ✓ {total} rows compacted')
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Compacted {total} activity rows into daily rollups')
+        )
+
     def migrate_memorial_posts(self, options):
         """Migrate existing memorial posts to the feeds system"""
         self.stdout.write('Migrating memorial posts to feeds system...')
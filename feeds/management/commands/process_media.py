@@ -0,0 +1,59 @@
+# feeds/management/commands/process_media.py
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from feeds.media_pipeline import run_pending_media
+
+
+class Command(BaseCommand):
+    help = 'Derive optimised images and thumbnails for uploaded post media'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue once and exit instead of polling'
+        )
+
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Image processing processes (defaults to the CPU count)'
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Uploads claimed per poll'
+        )
+
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=1.0,
+            help='Seconds to wait between polls when the queue is empty'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Processing post media...')
+
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                started = time.monotonic()
+                processed, failed = run_pending_media(executor, limit=options['batch_size'])
+                elapsed = time.monotonic() - started
+
+                if processed or failed:
+                    self.stdout.write(f'  ✓ {processed} processed, {failed} failed in {elapsed:.2f}s')
+                    continue
+
+                if options['once']:
+                    break
+
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS('Media queue drained'))
@@ -0,0 +1,35 @@
+# feeds/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from feeds.models import Post
+from feeds.recount import iter_chunks
+from feeds.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text post search index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Posts indexed per batch'
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f'Rebuilding search index ({type(backend).__name__})...')
+
+        backend.clear()
+        total = 0
+        posts = Post.objects.all()
+
+        for first, last, size in iter_chunks(posts, options['batch_size']):
+            backend.index_posts(
+                posts.filter(pk__gte=first, pk__lte=last).select_related('author__profile')
+            )
+            total += size
+            self.stdout.write(f'  ✓ {total} posts indexed')
+
+        self.stdout.write(self.style.SUCCESS(f'Search index rebuilt with {total} posts'))
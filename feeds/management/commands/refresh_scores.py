@@ -0,0 +1,87 @@
+# feeds/management/commands/refresh_scores.py
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from feeds.models import Post
+from feeds.ranking import SCORE_LOOKBACK, activity_watermark, refresh_scores, rescore_posts
+from feeds.recount import iter_chunks
+
+
+class Command(BaseCommand):
+    help = 'Keep the stored post scores used by the Top feed up to date'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Rescore every post (e.g. after changing the formula) and exit'
+        )
+
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Rescore posts with recent activity once and exit instead of polling'
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Activity rows (or posts with --all) handled per pass'
+        )
+
+        parser.add_argument(
+            '--lookback',
+            type=int,
+            default=None,
+            help=f'Minutes of activity to re-read on start (default: {int(SCORE_LOOKBACK.total_seconds() // 60)})'
+        )
+
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=30.0,
+            help='Seconds to wait between passes when there is no new activity'
+        )
+
+    def handle(self, *args, **options):
+        if options['all']:
+            self.rescore_all(options['batch_size'] or 1000)
+            return
+
+        lookback = SCORE_LOOKBACK
+        if options['lookback'] is not None:
+            lookback = timedelta(minutes=options['lookback'])
+
+        watermark = activity_watermark(lookback)
+        self.stdout.write(f'Refreshing post scores from activity #{watermark}...')
+
+        while True:
+            started = time.monotonic()
+            rescored, next_watermark = refresh_scores(watermark, batch_size=options['batch_size'])
+            elapsed = time.monotonic() - started
+
+            if next_watermark != watermark:
+                watermark = next_watermark
+                self.stdout.write(f'  ✓ {rescored} post(s) rescored in {elapsed:.2f}s (activity #{watermark})')
+                continue
+
+            if options['once']:
+                break
+
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS('Post scores up to date'))
+
+    def rescore_all(self, chunk_size):
+        self.stdout.write('Rescoring all posts...')
+        total = 0
+
+        for first, last, size in iter_chunks(Post.objects.all(), chunk_size):
+            ids = Post.objects.filter(pk__gte=first, pk__lte=last).values_list('pk', flat=True)
+            total += rescore_posts(list(ids))
+            self.stdout.write(f'  ✓ {size} post(s) checked')
+
+        self.stdout.write(self.style.SUCCESS(f'{total} post score(s) updated'))
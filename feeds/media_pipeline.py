@@ -0,0 +1,216 @@
+# feeds/media_pipeline.py - Background processing of uploaded post media
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import File
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import PostMedia
+from .utils import derive_image_files
+from .video import derive_video_files
+
+
+# A row left in 'processing' longer than this belongs to a crashed worker
+MEDIA_PROCESSING_LEASE = timedelta(seconds=getattr(settings, 'MEDIA_PROCESSING_LEASE_SECONDS', 600))
+
+MEDIA_MAX_ATTEMPTS = 3
+
+
+def store_upload(post, upload, media_type, uploaded_by, caption='', alt_text=''):
+    """
+    Save an upload untouched and queue it for processing.
+
+    Only the copy to storage happens in the request (in chunks, so large
+    videos are never held in memory); decoding, resizing, probing and
+    thumbnailing are left to the process_media worker.
+    """
+    extension = os.path.splitext(upload.name)[1].lower()
+    if media_type == 'image':
+        name = f"originals/{uuid.uuid4().hex}{extension}"
+    else:
+        name = f"posts/videos/{uuid.uuid4().hex}{extension or '.mp4'}"
+
+    return PostMedia.objects.create(
+        post=post,
+        media_type=media_type,
+        # Wrapped in File because UploadedFile.name drops directories
+        file=File(upload, name=name),
+        caption=caption,
+        alt_text=alt_text,
+        file_size=upload.size,
+        uploaded_by=uploaded_by,
+        processing_status='pending',
+    )
+
+
+def expire_media(now=None):
+    """
+    Fail rows whose lease ran out on their last attempt.
+
+    claim_media will not hand them out again, so without this they would
+    stay 'processing' (and their lightbox keep polling) forever.
+    Returns the number of rows failed.
+    """
+    now = now or timezone.now()
+    return PostMedia.objects.filter(
+        processing_status='processing',
+        processing_started_at__lt=now - MEDIA_PROCESSING_LEASE,
+        processing_attempts__gte=MEDIA_MAX_ATTEMPTS,
+    ).update(
+        processing_status='failed',
+        processing_error='Processing did not finish',
+    )
+
+
+def claim_media(limit=10):
+    """
+    Claim up to ``limit`` pending (or abandoned) media rows for this worker.
+
+    Each row is claimed with a conditional UPDATE so two workers never
+    process the same upload.
+    """
+    now = timezone.now()
+    claimable = (Q(processing_status='pending') | Q(
+        processing_status='processing',
+        processing_started_at__lt=now - MEDIA_PROCESSING_LEASE
+    )) & Q(processing_attempts__lt=MEDIA_MAX_ATTEMPTS)
+
+    candidate_ids = list(
+        PostMedia.objects.filter(claimable)
+        .order_by('uploaded_at')
+        .values_list('id', flat=True)[:limit]
+    )
+
+    claimed = [
+        media_id for media_id in candidate_ids
+        if PostMedia.objects.filter(claimable, pk=media_id).update(
+            processing_status='processing',
+            processing_started_at=now,
+            processing_attempts=F('processing_attempts') + 1,
+        )
+    ]
+
+    return list(PostMedia.objects.filter(pk__in=claimed))
+
+
+def _local_original(media):
+    """
+    Return (path, is_temporary) for a local copy of the original upload.
+
+    File system storage hands back the stored file itself; other backends
+    are streamed to a temporary file chunk by chunk.
+    """
+    try:
+        return media.file.path, False
+    except NotImplementedError:
+        pass
+
+    fd, path = tempfile.mkstemp()
+    with os.fdopen(fd, 'wb') as output, media.file.open('rb') as f:
+        for chunk in f.chunks():
+            output.write(chunk)
+    return path, True
+
+
+def finish_media(media, image_path, thumbnail_path):
+    """Swap the original for the derived files and mark the row ready"""
+    original = media.file.name
+    name = uuid.uuid4().hex
+
+    with open(image_path, 'rb') as image, open(thumbnail_path, 'rb') as thumbnail:
+        media.file.save(f"posts/{name}.jpg", File(image), save=False)
+        media.thumbnail.save(f"thumbnails/{name}.jpg", File(thumbnail), save=False)
+    media.file_size = os.path.getsize(image_path)
+    media.processing_status = 'ready'
+    media.processing_error = ''
+    media.save(update_fields=['file', 'thumbnail', 'file_size', 'processing_status', 'processing_error'])
+
+    media.file.storage.delete(original)
+
+
+def finish_video(media, info, poster_path):
+    """Record the probed metadata and poster frame and mark the row ready"""
+    update_fields = ['processing_status', 'processing_error']
+
+    if info is not None:
+        if info.duration is not None:
+            media.duration = round(info.duration)
+            update_fields.append('duration')
+        if info.codec:
+            media.codec = info.codec[:32]
+            update_fields.append('codec')
+
+    if poster_path:
+        with open(poster_path, 'rb') as poster:
+            media.thumbnail.save(f"thumbnails/{uuid.uuid4().hex}.jpg", File(poster), save=False)
+        update_fields.append('thumbnail')
+
+    media.processing_status = 'ready'
+    media.processing_error = ''
+    media.save(update_fields=update_fields)
+
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except (FileNotFoundError, TypeError):
+            pass
+
+
+def fail_media(media, error):
+    """Return the row to the queue, or give up after MEDIA_MAX_ATTEMPTS"""
+    media.processing_status = 'failed' if media.processing_attempts >= MEDIA_MAX_ATTEMPTS else 'pending'
+    media.processing_error = str(error)
+    media.save(update_fields=['processing_status', 'processing_error'])
+
+
+def run_pending_media(executor, limit=10):
+    """
+    Claim a batch of uploads and derive their files on ``executor``.
+
+    Images get an optimised copy and thumbnail; videos are probed for
+    duration and codec and get a poster frame. That work is CPU bound and
+    runs in the executor's worker processes; this process only does the
+    storage and database I/O. Files travel between the processes as
+    paths, never as bytes. Rows abandoned on their last attempt are
+    failed first.
+    Returns a tuple of (processed, failed).
+    """
+    expired = expire_media()
+    batch = claim_media(limit)
+    futures = []
+    for media in batch:
+        try:
+            source_path, is_temporary = _local_original(media)
+            derive = derive_video_files if media.media_type == 'video' else derive_image_files
+            futures.append((media, source_path if is_temporary else None,
+                            executor.submit(derive, source_path)))
+        except Exception as e:
+            fail_media(media, e)
+
+    processed = 0
+    failed = expired + len(batch) - len(futures)
+    for media, temporary_source, future in futures:
+        outputs = []
+        try:
+            if media.media_type == 'video':
+                info, poster_path = future.result()
+                outputs = [poster_path]
+                finish_video(media, info, poster_path)
+            else:
+                image_path, thumbnail_path, _ = future.result()
+                outputs = [image_path, thumbnail_path]
+                finish_media(media, image_path, thumbnail_path)
+            processed += 1
+        except Exception as e:
+            fail_media(media, e)
+            failed += 1
+        finally:
+            _remove(temporary_source, *outputs)
+
+    return processed, failed
@@ -64,19 +64,12 @@ def create_memory_post_view(request, group_slug):
             is_approved=not feed.require_approval
         )
         
-        # Process media files if any
-        from .utils import process_media_file, validate_media_file
+        # Queue media files if any (processed by the process_media worker)
+        from .utils import validate_media_file
+        from .media_pipeline import store_upload
         for media_file in media_files:
             if validate_media_file(media_file, 'photo'):
-                processed_file, thumbnail, metadata = process_media_file(media_file, 'photo')
-                PostMedia.objects.create(
-                    post=post,
-                    media_type='image',
-                    file=processed_file,
-                    thumbnail=thumbnail,
-                    file_size=metadata.get('file_size', 0),
-                    uploaded_by=request.user
-                )
+                store_upload(post, media_file, media_type='image', uploaded_by=request.user)
         
         # Render the post partial
         html = render_to_string('feeds/partials/post_item.html', {
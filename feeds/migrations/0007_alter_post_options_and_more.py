@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0006_alter_post_memorial_related_delete_memorial'),
+        ('memorial', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ['-is_pinned', '-is_urgent', '-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['feed', '-is_pinned', '-is_urgent', '-created_at', '-id'], name='feeds_post_feed_id_b418fa_idx'),
+        ),
+    ]
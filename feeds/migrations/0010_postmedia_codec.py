@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0009_postmedia_processing_attempts_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postmedia',
+            name='codec',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
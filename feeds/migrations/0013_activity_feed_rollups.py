@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_activity_feed(apps, schema_editor):
+    FeedActivity = apps.get_model('feeds', 'FeedActivity')
+    Post = apps.get_model('feeds', 'Post')
+    FeedActivity.objects.filter(feed__isnull=True, post__isnull=False).update(
+        feed=models.Subquery(Post.objects.filter(pk=models.OuterRef('post_id')).values('feed_id')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0012_post_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedActivityDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('activity_type', models.CharField(choices=[('view', 'View Post'), ('like', 'Like Post'), ('comment', 'Comment'), ('share', 'Share'), ('click_link', 'Click Link'), ('join_event', 'Join Event'), ('vote_poll', 'Vote in Poll')], max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddField(
+            model_name='feedactivity',
+            name='feed',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='activities', to='feeds.feed'),
+        ),
+        migrations.AddIndex(
+            model_name='feedactivity',
+            index=models.Index(fields=['feed', '-created_at'], name='feeds_feeda_feed_id_560916_idx'),
+        ),
+        migrations.AddField(
+            model_name='feedactivitydaily',
+            name='feed',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to='feeds.feed'),
+        ),
+        migrations.AddField(
+            model_name='feedactivitydaily',
+            name='post',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_activity', to='feeds.post'),
+        ),
+        migrations.AddIndex(
+            model_name='feedactivitydaily',
+            index=models.Index(fields=['feed', 'day'], name='feeds_feeda_feed_id_b5982a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedactivitydaily',
+            index=models.Index(fields=['post', 'day'], name='feeds_feeda_post_id_d23ebd_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedactivitydaily',
+            constraint=models.UniqueConstraint(fields=('day', 'feed', 'post', 'activity_type'), name='unique_daily_activity'),
+        ),
+        migrations.RunPython(backfill_activity_feed, migrations.RunPython.noop),
+    ]
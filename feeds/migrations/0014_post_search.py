@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_fts_table(apps, schema_editor):
+    # Other databases use a different search backend (see feeds.search)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS feeds_post_fts "
+        "USING fts5(title, content, link, author, tokenize='porter unicode61')"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS feeds_post_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0013_activity_feed_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='feeds.post')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostSearchIndex',
+            fields=[
+                ('document', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='fts', serialize=False, to='feeds.postsearchdocument')),
+                ('title', models.TextField()),
+                ('content', models.TextField()),
+                ('link', models.TextField()),
+                ('author', models.TextField()),
+            ],
+            options={
+                'db_table': 'feeds_post_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
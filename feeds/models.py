@@ -3,6 +3,7 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from django.urls import reverse
+import math
 import uuid
 
 
@@ -30,6 +31,10 @@ class Feed(models.Model):
         return f"Feed for {self.group.name}"
 
 
+# Seconds of recency worth a tenfold increase in engagement (see Post.hot_score)
+SCORE_TIMESCALE = getattr(settings, 'FEED_SCORE_TIMESCALE_SECONDS', 45000)
+
+
 class Post(models.Model):
     """Universal post model for all group types"""
     
@@ -114,14 +119,20 @@ class Post(models.Model):
     shares_count     = models.PositiveIntegerField(default=0)
     views_count      = models.PositiveIntegerField(default=0)
 
+    # Stored hot_score() for the "Top" ordering, kept fresh by refresh_scores
+    score = models.FloatField(default=0, editable=False)
+
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
-        ordering = ['-is_pinned', '-is_urgent', '-created_at']
+        # 'id' makes the order total so the feed can be keyset-paginated
+        ordering = ['-is_pinned', '-is_urgent', '-created_at', '-id']
         indexes = [
             models.Index(fields=['feed', '-created_at']),
+            models.Index(fields=['feed', '-is_pinned', '-is_urgent', '-created_at', '-id']),
+            models.Index(fields=['feed', '-score', '-id']),
             models.Index(fields=['author', '-created_at']),
             models.Index(fields=['post_type', '-created_at']),
         ]
@@ -134,13 +145,13 @@ class Post(models.Model):
         return f"{self.get_post_type_display()} by {author_name}" # type: ignore
     
     def get_absolute_url(self):
-        return reverse('post_detail', kwargs={'pk': self.pk})
+        return reverse('feeds:group_feed', kwargs={'slug': self.feed.group.slug}) + f'#post-{self.pk}'
     
     def can_edit(self, user):
         if not user.is_authenticated:
             return False
         return (
-            user == self.author or 
+            user.pk == self.author_id or 
             self.feed.group.is_admin(user)
         )
     
@@ -149,18 +160,23 @@ class Post(models.Model):
     
     def can_view(self, user):
         """Check if user can view this post based on privacy level"""
+        group = self.feed.group
+        is_public_group = group.privacy == 'public'
         if not user.is_authenticated:
-            return self.privacy_level == 'public' and self.feed.group.is_public
+            return self.privacy_level == 'public' and is_public_group
         
+        # Membership and admin status come from the per-request role cache
+        role = group.role_for(user)
         if self.privacy_level == 'public':
-            return self.feed.group.is_member(user) or self.feed.group.is_public
+            return role.is_member or is_public_group
         elif self.privacy_level == 'members_only':
-            return self.feed.group.is_member(user)
+            return role.is_member
         elif self.privacy_level == 'admins_only':
-            return self.feed.group.is_admin(user)
+            return role.is_admin
         elif self.privacy_level == 'close_friends':
-            # Implement close friends logic
-            return self.author.profile.close_friends.filter(id=user.id).exists() if hasattr(self.author, 'profile') else False
+            # Profiles don't store close friends lists yet, so only the
+            # author qualifies (feeds.search.visible_posts_q matches this)
+            return user.pk == self.author_id
         
         return False
     
@@ -178,6 +194,24 @@ class Post(models.Model):
             self.views_count * 0.1
         )
 
+    def hot_score(self):
+        """
+        Ranking score combining engagement with recency.
+
+        Newer posts start higher and engagement is counted on a log scale,
+        so a post needs ten times the engagement to rank with one posted
+        SCORE_TIMESCALE seconds later. The score only changes when
+        engagement does, which lets it be stored and refreshed
+        incrementally instead of decaying every row on a timer.
+        """
+        created = self.created_at or timezone.now()
+        return math.log10(max(self.engagement_score, 1)) + created.timestamp() / SCORE_TIMESCALE
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and not self.score:
+            self.score = self.hot_score()
+        super().save(*args, **kwargs)
+
 
 class PostMedia(models.Model):
     """Media attachments for posts"""
@@ -202,15 +236,38 @@ class PostMedia(models.Model):
     # Metadata
     file_size = models.PositiveIntegerField(default=0)  # in bytes
     duration = models.PositiveIntegerField(blank=True, null=True)  # for video/audio in seconds
+    codec = models.CharField(max_length=32, blank=True)  # for video, from the container headers
     
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
+    # Background processing (see feeds.media_pipeline). Uploads are stored
+    # as-is and marked pending; a worker replaces the original with the
+    # optimised file and adds the thumbnail.
+    PROCESSING_STATUS = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
+    processing_status = models.CharField(max_length=10, choices=PROCESSING_STATUS, default='ready')
+    processing_attempts = models.PositiveSmallIntegerField(default=0)
+    processing_started_at = models.DateTimeField(blank=True, null=True)
+    processing_error = models.TextField(blank=True)
+    
     class Meta:
         ordering = ['id']  # Maintain upload order
+        indexes = [
+            models.Index(fields=['processing_status', 'uploaded_at']),
+        ]
     
     def __str__(self):
         return f"{self.get_media_type_display()} for {self.post}" # pyright: ignore[reportAttributeAccessIssue]
+    
+    @property
+    def is_processing(self):
+        return self.processing_status in ('pending', 'processing')
 
 
 class Comment(models.Model):
@@ -252,7 +309,7 @@ class Comment(models.Model):
     def can_edit(self, user):
         if not user.is_authenticated:
             return False
-        return user == self.author or self.post.feed.group.is_admin(user)
+        return user.pk == self.author_id or self.post.feed.group.is_admin(user)
     
     @property
     def is_reply(self):
@@ -329,7 +386,12 @@ class Poll(models.Model):
     
     @property
     def total_votes(self):
-        return self.options.aggregate(total=models.Sum('votes_count'))['total'] or 0 # type: ignore
+        stored = self.options.aggregate(total=models.Sum('votes_count'))['total'] or 0 # type: ignore
+        # Include votes not yet folded into the options (see feeds.counters)
+        pending = CounterDelta.objects.filter(
+            option__poll=self, field='votes_count'
+        ).aggregate(total=models.Sum('delta'))['total'] or 0
+        return max(stored + pending, 0)
 
 
 class PollOption(models.Model):
@@ -372,6 +434,8 @@ class FeedActivity(models.Model):
     
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     post = models.ForeignKey(Post, on_delete=models.SET_NULL, null=True, blank=True, related_name='activities')
+    # Copied from the post so per-feed queries don't join through Post
+    feed = models.ForeignKey(Feed, on_delete=models.CASCADE, null=True, blank=True, related_name='activities')
     activity_type = models.CharField(max_length=20, choices=ACTIVITY_TYPES)
     
     # Context data (JSON field for flexibility)
@@ -383,8 +447,137 @@ class FeedActivity(models.Model):
         indexes = [
             models.Index(fields=['user', '-created_at']),
             models.Index(fields=['post', 'activity_type']),
+            models.Index(fields=['feed', '-created_at']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.feed_id is None and self.post is not None:
+            self.feed_id = self.post.feed_id
+        super().save(*args, **kwargs)
+
+
+class FeedActivityDaily(models.Model):
+    """
+    Activity counts per day, feed, post and activity type.
+
+    Raw FeedActivity rows older than the retention period are compacted
+    into these rows (see feeds.activity) so history stays queryable while
+    the raw table stays small.
+    """
+
+    day = models.DateField()
+    feed = models.ForeignKey(Feed, on_delete=models.CASCADE, null=True, blank=True, related_name='daily_activity')
+    post = models.ForeignKey(Post, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_activity')
+    activity_type = models.CharField(max_length=20, choices=FeedActivity.ACTIVITY_TYPES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'feed', 'post', 'activity_type'], name='unique_daily_activity'),
+        ]
+        indexes = [
+            models.Index(fields=['feed', 'day']),
+            models.Index(fields=['post', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.activity_type} x{self.count} on {self.day}"
+
+
+class TimelineEntry(models.Model):
+    """
+    A post in one user's home timeline (fan-out on write, see feeds.timeline).
+
+    ``created_at`` is copied from the post so the whole timeline is read
+    with a single (user, created_at, post) index range scan.
+    """
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    group = models.ForeignKey('group.Group', on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-created_at', '-post_id']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'], name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post']),
         ]
 
+    def __str__(self):
+        return f"{self.post} for {self.user}"
+
+
+class PostSearchDocument(models.Model):
+    """
+    Integer key of a post in the full-text index.
+
+    FTS5 rows are addressed by an integer rowid and posts have UUID keys,
+    so each indexed post gets one of these; its id is the rowid of the
+    post's PostSearchIndex row (see feeds.search).
+    """
+
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='search_document')
+
+    def __str__(self):
+        return f"Search document for {self.post_id}"
+
+
+class PostSearchIndex(models.Model):
+    """
+    The FTS5 virtual table behind post search (SQLite only).
+
+    Created by migration rather than by Django, and written with raw SQL
+    by feeds.search; the model exists so searches can be expressed as
+    ordinary querysets joined to Post.
+    """
+
+    document = models.OneToOneField(
+        PostSearchDocument, on_delete=models.DO_NOTHING, db_constraint=False,
+        primary_key=True, db_column='rowid', related_name='fts'
+    )
+    title = models.TextField()
+    content = models.TextField()
+    link = models.TextField()
+    author = models.TextField()
+
+    class Meta:
+        managed = False
+        db_table = 'feeds_post_fts'
+
+
+class CounterDelta(models.Model):
+    """
+    Pending change to a denormalised engagement counter.
+
+    Likes, comments, shares and poll votes append a row here instead of
+    updating the hot Post / PollOption row directly; feeds.counters folds
+    the journal into the counter columns in the background.
+    """
+
+    COUNTER_FIELDS = [
+        ('likes_count', 'Likes'),
+        ('comments_count', 'Comments'),
+        ('shares_count', 'Shares'),
+        ('views_count', 'Views'),
+        ('votes_count', 'Poll Votes'),
+    ]
+
+    # No database constraint: deleting a post cascades to its likes and
+    # comments, whose delete signals journal deltas for the post being
+    # removed. Such rows simply fold into nothing.
+    post = models.ForeignKey(Post, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='counter_deltas')
+    option = models.ForeignKey(PollOption, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='counter_deltas')
+    field = models.CharField(max_length=20, choices=COUNTER_FIELDS)
+    delta = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.field} {self.delta:+d}"
+
 
 # Signal handlers for updating counts
 from django.db.models.signals import post_save, post_delete
@@ -393,37 +586,35 @@ from django.dispatch import receiver
 @receiver(post_save, sender=PostLike)
 def increment_post_likes(sender, instance, created, **kwargs):
     if created:
-        Post.objects.filter(pk=instance.post.pk).update(likes_count=models.F('likes_count') + 1)
+        CounterDelta.objects.create(post_id=instance.post_id, field='likes_count', delta=1)
 
 @receiver(post_delete, sender=PostLike)
 def decrement_post_likes(sender, instance, **kwargs):
-    Post.objects.filter(pk=instance.post.pk).update(likes_count=models.F('likes_count') - 1)
+    CounterDelta.objects.create(post_id=instance.post_id, field='likes_count', delta=-1)
 
 @receiver(post_save, sender=Comment)
 def increment_comment_count(sender, instance, created, **kwargs):
     if created:
-        Post.objects.filter(pk=instance.post.pk).update(comments_count=models.F('comments_count') + 1)
+        CounterDelta.objects.create(post_id=instance.post_id, field='comments_count', delta=1)
 
 @receiver(post_delete, sender=Comment)
 def decrement_comment_count(sender, instance, **kwargs):
-    Post.objects.filter(pk=instance.post.pk).update(comments_count=models.F('comments_count') - 1)
+    CounterDelta.objects.create(post_id=instance.post_id, field='comments_count', delta=-1)
 
 @receiver(post_save, sender=PostShare)
 def increment_share_count(sender, instance, created, **kwargs):
     if created:
-        Post.objects.filter(pk=instance.post.pk).update(shares_count=models.F('shares_count') + 1)
+        CounterDelta.objects.create(post_id=instance.post_id, field='shares_count', delta=1)
 
 @receiver(post_delete, sender=PostShare)
 def decrement_share_count(sender, instance, **kwargs):
-    Post.objects.filter(pk=instance.post.pk).update(shares_count=models.F('shares_count') - 1)
+    CounterDelta.objects.create(post_id=instance.post_id, field='shares_count', delta=-1)
 
 @receiver(post_save, sender=PollVote)
 def increment_poll_option_votes(sender, instance, created, **kwargs):
     if created:
-        PollOption.objects.filter(pk=instance.option.pk).update(votes_count=models.F('votes_count') + 1)
+        CounterDelta.objects.create(option_id=instance.option_id, field='votes_count', delta=1)
 
 @receiver(post_delete, sender=PollVote)
 def decrement_poll_option_votes(sender, instance, **kwargs):
-    PollOption.objects.filter(pk=instance.option.pk).update(votes_count=models.F('votes_count') - 1)
-
-
+    CounterDelta.objects.create(option_id=instance.option_id, field='votes_count', delta=-1)
@@ -0,0 +1,134 @@
+# feeds/pagination.py - Keyset (cursor) pagination for feeds
+import base64
+import binascii
+import datetime
+import json
+import operator
+from functools import reduce
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder, but datetimes and times keep their microseconds: a
+    cursor cut to milliseconds matches no row, so rows sharing the
+    boundary's millisecond would be skipped
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    """Pack the sort key of the last row on a page into an opaque token"""
+    raw = json.dumps(list(values), cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; raises ValueError for malformed tokens"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+class KeysetPage:
+    """One page of keyset-paginated results"""
+
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by seeking past the sort key of the previous page.
+
+    Unlike django.core.paginator.Paginator this never runs COUNT(*) and
+    never uses OFFSET, so page 100 costs the same as page 1, and rows
+    inserted while the user scrolls don't shift later pages.
+
+    ``ordering`` must be a total order (end with a unique field such as
+    '-id') and should match an index.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-')) for name in self.ordering
+        ]
+
+    def _field(self, name):
+        """Model field or annotation (e.g. a search rank) named in the ordering"""
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.queryset.model._meta.get_field(name)
+
+    def _parse(self, values):
+        if len(values) != len(self.fields):
+            raise ValueError('Invalid cursor')
+        try:
+            return [
+                self._field(name).to_python(value)
+                for (name, _), value in zip(self.fields, values)
+            ]
+        except Exception as e:
+            raise ValueError('Invalid cursor') from e
+
+    def _seek(self, values):
+        """Q selecting rows that sort strictly after ``values``"""
+        clauses = []
+        for i, (name, descending) in enumerate(self.fields):
+            equal = {field: value for (field, _), value in zip(self.fields[:i], values[:i])}
+            lookup = f"{name}__{'lt' if descending else 'gt'}"
+            clauses.append(Q(**equal, **{lookup: values[i]}))
+        return reduce(operator.or_, clauses)
+
+    def get_page(self, cursor=None):
+        """
+        Return the page following ``cursor``.
+
+        A missing or malformed cursor returns the first page, mirroring
+        Paginator.get_page.
+        """
+        queryset = self.queryset.order_by(*self.ordering)
+
+        if cursor:
+            try:
+                queryset = queryset.filter(self._seek(self._parse(decode_cursor(cursor))))
+            except ValueError:
+                pass
+
+        # Fetch one extra row to learn whether another page exists
+        rows = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            last = rows[-1]
+            next_cursor = encode_cursor([getattr(last, name) for name, _ in self.fields])
+
+        return KeysetPage(rows, next_cursor)
@@ -12,6 +12,7 @@ from datetime import datetime, timedelta
 import json
 
 from .models import Feed, Post, Poll, PollOption, PollVote
+from .counters import merge_pending_votes
 from group.models import Group
 
 
@@ -269,9 +270,11 @@ def get_poll_results_view(request, poll_id):
     post = get_object_or_404(Post, poll=poll)
     
     # Calculate percentages and get voter details
+    options = merge_pending_votes(poll.options.all()) # type: ignore
+    total_votes = sum(option.votes_count for option in options)
     options_data = []
-    for option in poll.options.all(): # type: ignore
-        percentage = (option.votes_count / poll.total_votes * 100) if poll.total_votes > 0 else 0
+    for option in options:
+        percentage = (option.votes_count / total_votes * 100) if total_votes > 0 else 0
         voters = option.votes.select_related('user', 'user__profile').all()[:10]  # Show first 10
         
         options_data.append({
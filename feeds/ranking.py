@@ -0,0 +1,91 @@
+# feeds/ranking.py - Stored scores for the "Top" feed ordering
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .counters import merge_pending_counts
+from .models import FeedActivity, Post
+
+
+# Keyset order of the Top feed; matches the (feed, -score, -id) index
+TOP_ORDERING = ('-score', '-id')
+
+FEED_SORTS = ('latest', 'top')
+
+# Activity rows read per refresh pass
+SCORE_REFRESH_BATCH_SIZE = getattr(settings, 'FEED_SCORE_REFRESH_BATCH_SIZE', 1000)
+
+# Score changes smaller than this (about 45ms of recency) aren't written
+SCORE_EPSILON = 1e-6
+
+# How far back a freshly started refresh worker re-reads activity
+SCORE_LOOKBACK = timedelta(minutes=getattr(settings, 'FEED_SCORE_LOOKBACK_MINUTES', 60))
+
+
+def feed_ordering(sort):
+    """Keyset ordering for a feed sort mode ('latest' or 'top')"""
+    return TOP_ORDERING if sort == 'top' else Post._meta.ordering
+
+
+def rescore_posts(post_ids):
+    """
+    Recompute the stored score of the given posts.
+
+    Counters include deltas the fold worker hasn't applied yet. Only rows
+    whose score actually changed are written. Returns that number.
+    """
+    posts = list(
+        Post.objects.filter(pk__in=post_ids).only(
+            'likes_count', 'comments_count', 'shares_count', 'views_count',
+            'created_at', 'score',
+        )
+    )
+    merge_pending_counts(posts)
+
+    changed = []
+    for post in posts:
+        score = post.hot_score()
+        if abs(score - post.score) > SCORE_EPSILON:
+            post.score = score
+            changed.append(post)
+
+    Post.objects.bulk_update(changed, ['score'])
+    return len(changed)
+
+
+def activity_watermark(lookback=SCORE_LOOKBACK):
+    """
+    The activity id to start refreshing after, ``lookback`` before now.
+
+    Rescoring is idempotent, so a restarted worker simply goes back a
+    little and re-reads recent activity instead of persisting its position.
+    """
+    first_recent = FeedActivity.objects.filter(
+        created_at__gte=timezone.now() - lookback
+    ).order_by('pk').values_list('pk', flat=True).first()
+
+    if first_recent is not None:
+        return first_recent - 1
+    return FeedActivity.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def refresh_scores(after, batch_size=None):
+    """
+    Rescore the posts with activity logged after activity id ``after``.
+
+    Reads at most ``batch_size`` FeedActivity rows and rescores each
+    affected post once. Returns (posts_rescored, new_watermark); the
+    watermark is unchanged when there was no new activity.
+    """
+    batch_size = batch_size or SCORE_REFRESH_BATCH_SIZE
+    rows = list(
+        FeedActivity.objects.filter(pk__gt=after)
+        .order_by('pk')
+        .values_list('pk', 'post_id')[:batch_size]
+    )
+    if not rows:
+        return 0, after
+
+    post_ids = {post_id for _, post_id in rows if post_id is not None}
+    return rescore_posts(post_ids), rows[-1][0]
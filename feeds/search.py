@@ -0,0 +1,231 @@
+# feeds/search.py - Full-text post search
+"""
+Posts are indexed by title, content, link fields and author name.
+
+On SQLite the index is an FTS5 table (PostSearchIndex) ranked with BM25;
+other databases fall back to SimpleSearchBackend, or to the backend named
+by the FEED_SEARCH_BACKEND setting (a dotted path to a SearchBackend
+subclass). Every backend returns a Post queryset annotated with
+``search_rank`` (lower is better), so privacy filtering and keyset
+pagination are shared and happen inside the same query.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from group.models import Group, GroupMembership
+
+from .models import Post, PostSearchDocument
+
+
+# Keyset order of search results; search_rank ties fall back to recency
+SEARCH_ORDERING = ('search_rank', '-created_at', '-id')
+
+# Post fields whose change requires re-indexing the post
+INDEXED_FIELDS = {
+    'title', 'content', 'link_url', 'link_title', 'link_description', 'author', 'is_anonymous',
+}
+
+# BM25 weight of each FTS column: title, content, link, author
+FTS_WEIGHTS = (10.0, 1.0, 2.0, 5.0)
+
+TERM_RE = re.compile(r'\w+')
+
+
+def search_terms(query):
+    return TERM_RE.findall(query or '')
+
+
+def document_fields(post):
+    """The text indexed for ``post``, keyed by index column"""
+    author = ''
+    if not post.is_anonymous:
+        profile = getattr(post.author, 'profile', None)
+        names = [profile.full_name if profile else '', post.author.username or '']
+        author = ' '.join(name for name in names if name)
+
+    return {
+        'title': post.title or '',
+        'content': post.content or '',
+        'link': ' '.join(filter(None, [post.link_title, post.link_description, post.link_url])),
+        'author': author,
+    }
+
+
+class SearchBackend:
+    """Interface of a post search backend"""
+
+    def index_posts(self, posts):
+        """Add or refresh the index entries of ``posts``"""
+        raise NotImplementedError
+
+    def remove_documents(self, document_ids):
+        """Drop the index entries of deleted PostSearchDocuments"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def search(self, query):
+        """Posts matching ``query``, annotated with search_rank"""
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """SQLite FTS5 index ranked with bm25()"""
+
+    table = 'feeds_post_fts'
+
+    def index_posts(self, posts):
+        posts = list(posts)
+        if not posts:
+            return
+
+        documents = dict(
+            PostSearchDocument.objects.filter(post__in=posts).values_list('post_id', 'id')
+        )
+        missing = [PostSearchDocument(post=post) for post in posts if post.pk not in documents]
+        for document in PostSearchDocument.objects.bulk_create(missing):
+            documents[document.post_id] = document.pk
+
+        rows = []
+        for post in posts:
+            fields = document_fields(post)
+            rows.append((documents[post.pk], fields['title'], fields['content'], fields['link'], fields['author']))
+
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(row[0],) for row in rows])
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, title, content, link, author) VALUES (%s, %s, %s, %s, %s)",
+                rows,
+            )
+
+    def remove_documents(self, document_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(pk,) for pk in document_ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+        PostSearchDocument.objects.all().delete()
+
+    def match_expression(self, query):
+        """
+        FTS5 query for the user's text: every word must match, the last
+        one as a prefix. Words are quoted so FTS syntax in the input is
+        never interpreted.
+        """
+        terms = [f'"{term}"' for term in search_terms(query)]
+        if not terms:
+            return None
+        terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, query):
+        expression = self.match_expression(query)
+        if expression is None:
+            return Post.objects.none()
+
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        return Post.objects.filter(
+            search_document__fts__isnull=False
+        ).filter(
+            RawSQL(f"{self.table} MATCH %s", [expression], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(f"bm25({self.table}, {weights})", [], output_field=FloatField())
+        )
+
+
+class SimpleSearchBackend(SearchBackend):
+    """
+    Unindexed fallback for databases without an index backend: every
+    word must appear in one of the fields. Results are unranked.
+    """
+
+    def index_posts(self, posts):
+        pass
+
+    def remove_documents(self, document_ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, query):
+        terms = search_terms(query)
+        if not terms:
+            return Post.objects.none()
+
+        posts = Post.objects.all()
+        for term in terms:
+            posts = posts.filter(
+                Q(title__icontains=term) | Q(content__icontains=term) |
+                Q(link_title__icontains=term) | Q(link_description__icontains=term) |
+                Q(is_anonymous=False, author__profile__first_name__icontains=term) |
+                Q(is_anonymous=False, author__profile__surname__icontains=term)
+            )
+        return posts.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    backend = getattr(settings, 'FEED_SEARCH_BACKEND', None)
+    if backend:
+        return import_string(backend)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTSBackend()
+    return SimpleSearchBackend()
+
+
+def visible_posts_q(user):
+    """
+    Post.can_view expressed as a filter, so privacy is applied in the
+    search query itself rather than to each result afterwards.
+    """
+    member_groups = GroupMembership.objects.filter(user=user, is_active=True).values('group_id')
+    admin_groups = Group.admins.through.objects.filter(customuser=user).values('group_id')
+
+    return (
+        Q(privacy_level='public') & (Q(feed__group__in=member_groups) | Q(feed__group__privacy='public')) |
+        Q(privacy_level='members_only', feed__group__in=member_groups) |
+        Q(privacy_level='admins_only') & (Q(feed__group__creator=user) | Q(feed__group__in=admin_groups)) |
+        # Close friends lists aren't stored yet, so only the author qualifies
+        Q(privacy_level='close_friends', author=user)
+    )
+
+
+def search_posts(user, q='', post_type='', date_from=None, date_to=None, author=''):
+    """
+    Approved posts ``user`` may see matching the PostSearchForm fields.
+
+    Without search text the filters alone are applied and results are
+    newest first.
+    """
+    if search_terms(q):
+        posts = get_search_backend().search(q)
+    else:
+        posts = Post.objects.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    posts = posts.filter(visible_posts_q(user), is_approved=True)
+
+    if post_type:
+        posts = posts.filter(post_type=post_type)
+    if date_from:
+        posts = posts.filter(created_at__date__gte=date_from)
+    if date_to:
+        posts = posts.filter(created_at__date__lte=date_to)
+    if author:
+        posts = posts.filter(
+            Q(author__email__icontains=author) |
+            Q(author__username__icontains=author) |
+            Q(author__profile__first_name__icontains=author) |
+            Q(author__profile__surname__icontains=author),
+            is_anonymous=False,
+        )
+
+    return posts
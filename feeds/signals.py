@@ -1,23 +1,37 @@
 # feeds/signals.py - Django signals for automatic notifications
-from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.db.models.signals import post_init, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.contenttypes.models import ContentType
 
-from .models import Post, Comment, PostLike, Poll, PollVote, PostShare
+from .models import Post, Comment, PostLike, Poll, PollVote, PostShare, PostSearchDocument
+from .counters import current_count
+from .search import INDEXED_FIELDS, get_search_backend
+from .timeline import (
+    backfill_timeline, backfill_timelines, fan_out_post, remove_from_timeline, remove_from_timelines,
+)
+from group.membership import memberships_changed
+from group.models import GroupMembership
+from customuser.models import Profile
 from notifications.utils import NotificationService
 from notifications.models import Notification
+from notifications.coalesce import coalesce_notification, group_key
+from notifications.fanout import enqueue_fanout
+
+
+def _display_name(user):
+    """Name shown for a user in notification text"""
+    profile = getattr(user, 'profile', None)
+    return (profile.full_name if profile else None) or user.username or user.email
 
 
 @receiver(post_save, sender=Post)
 def post_created_notification(sender, instance, created, **kwargs):
-    """Send notifications when a new post is created"""
+    """Queue notifications to the group when a new post is created"""
     if not created or not instance.is_approved:
         return
     
     group = instance.feed.group
-    
-    # Don't notify the author
-    recipients = group.members.exclude(id=instance.author.id)
+    author_name = _display_name(instance.author)
     
     # Determine notification type based on post type
     notification_type_map = {
@@ -36,17 +50,18 @@ def post_created_notification(sender, instance, created, **kwargs):
     # Special handling for memorial posts
     if instance.memorial_related:
         notification_type = 'new_memory_posted'
-        title = f"New memory shared for {instance.memorial_related.full_name}"
-        message = f"{instance.author.get_full_name() or instance.author.username} shared a memory"
+        deceased = instance.memorial_related.deceased
+        title = f"New memory shared for {deceased.full_name if deceased else group.name}"
+        message = f"{author_name} shared a memory"
     elif instance.post_type == 'event':
         title = f"New event in {group.name}"
-        message = f"{instance.author.get_full_name() or instance.author.username} created an event: {instance.title}"
+        message = f"{author_name} created an event: {instance.title}"
     elif instance.post_type == 'condolence':
         title = f"New condolence in {group.name}"
-        message = f"{instance.author.get_full_name() or instance.author.username} shared condolences"
+        message = f"{author_name} shared condolences"
     else:
         title = f"New post in {group.name}"
-        message = f"{instance.author.get_full_name() or instance.author.username} shared: {instance.content[:100]}..."
+        message = f"{author_name} shared: {instance.content[:100]}..."
     
     # Set priority based on post characteristics
     priority = 'normal'
@@ -55,106 +70,185 @@ def post_created_notification(sender, instance, created, **kwargs):
     elif instance.is_pinned or instance.post_type in ['event', 'condolence']:
         priority = 'high'
     
-    # Create notifications for all group members
-    for recipient in recipients:
-        NotificationService.create_notification(
-            recipient=recipient,
-            notification_type=notification_type,
-            title=title,
-            message=message if len(message) <= 500 else message[:497] + '...',
-            related_object=instance,
-            action_url=instance.get_absolute_url(),
-            priority=priority,
-            data={
-                'group_id': group.id,
-                'group_name': group.name,
-                'post_type': instance.post_type,
-                'author_name': instance.author.get_full_name() or instance.author.username,
-                'memorial_id': instance.memorial_related.id if instance.memorial_related else None
-            }
-        )
+    # One queued event per post; the fan-out worker writes the per-member
+    # notifications in bulk so the request doesn't scale with group size
+    enqueue_fanout(
+        event_type='post_published',
+        group=group,
+        exclude_user=instance.author,
+        notification_type=notification_type,
+        title=title,
+        message=message if len(message) <= 500 else message[:497] + '...',
+        related_object=instance,
+        action_url=instance.get_absolute_url(),
+        priority=priority,
+        data={
+            'group_id': group.id,
+            'group_name': group.name,
+            'post_id': instance.id,
+            'post_type': instance.post_type,
+            'author_name': author_name,
+            'memorial_id': instance.memorial_related.id if instance.memorial_related else None
+        }
+    )
+
+
+@receiver(post_init, sender=Post)
+def remember_post_approval(sender, instance, **kwargs):
+    instance._was_approved = instance.is_approved
+
+
+@receiver(post_save, sender=Post)
+def post_timeline_fanout(sender, instance, created, **kwargs):
+    """Add a post to its members' home timelines once it is approved"""
+    if instance.is_approved and (created or not instance._was_approved):
+        fan_out_post(instance)
+    instance._was_approved = instance.is_approved
+
+
+@receiver(post_save, sender=Post)
+def post_search_index(sender, instance, update_fields=None, **kwargs):
+    """Keep the post's full-text index entry in step with its text"""
+    if update_fields is not None and not INDEXED_FIELDS.intersection(update_fields):
+        return
+    get_search_backend().index_posts([instance])
+
+
+@receiver(post_delete, sender=PostSearchDocument)
+def post_search_remove(sender, instance, **kwargs):
+    # Deleted along with its post
+    get_search_backend().remove_documents([instance.pk])
+
+
+@receiver(post_save, sender=Profile)
+def author_search_reindex(sender, instance, created, update_fields=None, **kwargs):
+    """Author names are indexed, so re-index the user's posts when they change"""
+    if created or (update_fields is not None and not {'first_name', 'surname'}.intersection(update_fields)):
+        return
+    posts = Post.objects.filter(author_id=instance.user_id, is_anonymous=False).select_related('author__profile')
+    get_search_backend().index_posts(posts)
+
+
+def _is_active_member(membership):
+    return membership.is_active and membership.status == 'active'
+
+
+@receiver(post_init, sender=GroupMembership)
+def remember_membership_state(sender, instance, **kwargs):
+    instance._was_active_member = _is_active_member(instance)
+
+
+@receiver(post_save, sender=GroupMembership)
+def membership_timeline_sync(sender, instance, created, **kwargs):
+    """Backfill or clear a member's home timeline when they join or leave"""
+    active = _is_active_member(instance)
+    if active and (created or not instance._was_active_member):
+        backfill_timeline(instance.user_id, instance.group_id)
+    elif not active and instance._was_active_member:
+        remove_from_timeline(instance.user_id, instance.group_id)
+    instance._was_active_member = active
+
+
+@receiver(post_delete, sender=GroupMembership)
+def membership_timeline_cleanup(sender, instance, **kwargs):
+    remove_from_timeline(instance.user_id, instance.group_id)
+
+
+@receiver(memberships_changed)
+def bulk_membership_timeline_sync(sender, group, activated, deactivated, **kwargs):
+    """Timeline counterpart of membership_timeline_sync for bulk admin actions"""
+    if activated:
+        backfill_timelines(activated, group.pk)
+    if deactivated:
+        remove_from_timelines(deactivated, group.pk)
 
 
 @receiver(post_save, sender=Comment)
 def comment_created_notification(sender, instance, created, **kwargs):
-    """Notify post author and mentioned users about new comments"""
+    """
+    Notify the post author and earlier commenters about new comments,
+    rolled up into one notification per post while unread
+    """
     if not created:
         return
     
     post = instance.post
+    commenter_name = _display_name(instance.author)
+    key = group_key(post, 'comments')
+    action_url = f"{post.get_absolute_url()}#comment-{instance.id}"
+    data = {
+        'group_id': post.feed.group.id,
+        'post_id': post.id,
+        'comment_id': instance.id
+    }
     
     # Notify post author (if not commenting on their own post)
-    if post.author != instance.author:
-        NotificationService.create_notification(
-            recipient=post.author,
+    if post.author_id != instance.author_id:
+        coalesce_notification(
+            [post.author_id],
+            key,
             notification_type='new_condolence' if post.post_type == 'memory' else 'group_updated',
-            title=f"New comment on your post",
-            message=f"{instance.author.get_full_name() or instance.author.username} commented: {instance.content[:100]}...",
+            actor=instance.author,
+            actor_name=commenter_name,
+            verb='commented on your post',
+            title="New comment on your post",
+            message=f"{commenter_name} commented: {instance.content[:100]}...",
             related_object=post,
-            action_url=f"{post.get_absolute_url()}#comment-{instance.id}",
-            priority='normal',
-            data={
-                'group_id': post.feed.group.id,
-                'post_id': post.id,
-                'comment_id': instance.id,
-                'commenter_name': instance.author.get_full_name() or instance.author.username
-            }
+            action_url=action_url,
+            data={**data, 'commenter_name': commenter_name}
         )
     
     # Notify other commenters (excluding post author and comment author)
     other_commenters = Comment.objects.filter(
         post=post
     ).exclude(
-        author__in=[post.author, instance.author]
-    ).values_list('author', flat=True).distinct()
+        author__in=[post.author_id, instance.author_id]
+    ).order_by().values_list('author', flat=True).distinct()
     
-    for commenter_id in other_commenters:
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        try:
-            commenter = User.objects.get(id=commenter_id)
-            NotificationService.create_notification(
-                recipient=commenter,
-                notification_type='group_updated',
-                title=f"New comment on post you commented on",
-                message=f"{instance.author.get_full_name() or instance.author.username} also commented on a post",
-                related_object=post,
-                action_url=f"{post.get_absolute_url()}#comment-{instance.id}",
-                priority='normal',
-                data={
-                    'group_id': post.feed.group.id,
-                    'post_id': post.id,
-                    'comment_id': instance.id
-                }
-            )
-        except User.DoesNotExist:
-            continue
+    coalesce_notification(
+        other_commenters,
+        key,
+        notification_type='group_updated',
+        actor=instance.author,
+        actor_name=commenter_name,
+        verb='also commented on a post you commented on',
+        title="New comment on post you commented on",
+        message=f"{commenter_name} also commented on a post",
+        related_object=post,
+        action_url=action_url,
+        data=data
+    )
 
 
 @receiver(post_save, sender=PostLike)
 def post_like_notification(sender, instance, created, **kwargs):
-    """Notify post author about likes (batched)"""
+    """Notify post author about likes, rolled up per post while unread"""
     if not created or instance.post.author == instance.user:
         return
     
     post = instance.post
     
     # Only send notification for memorial posts or if it's the first like
-    if post.memorial_related or post.likes_count == 1:
+    if post.memorial_related or current_count(post, 'likes_count') == 1:
         reaction_text = "supported" if post.post_type == 'memory' else "liked"
+        liker_name = _display_name(instance.user)
         
-        NotificationService.create_notification(
-            recipient=post.author,
+        coalesce_notification(
+            [post.author_id],
+            group_key(post, 'likes'),
             notification_type='new_condolence' if post.memorial_related else 'group_updated',
+            actor=instance.user,
+            actor_name=liker_name,
+            verb=f'{reaction_text} your post',
             title=f"Someone {reaction_text} your post",
-            message=f"{instance.user.get_full_name() or instance.user.username} {reaction_text} your post in {post.feed.group.name}",
+            message=f"{liker_name} {reaction_text} your post in {post.feed.group.name}",
             related_object=post,
             action_url=post.get_absolute_url(),
             priority='low',
             data={
                 'group_id': post.feed.group.id,
                 'post_id': post.id,
-                'liker_name': instance.user.get_full_name() or instance.user.username,
+                'liker_name': liker_name,
                 'reaction_type': instance.reaction_type
             }
         )
@@ -172,14 +266,14 @@ def post_share_notification(sender, instance, created, **kwargs):
         recipient=post.author,
         notification_type='group_updated',
         title=f"Your post was shared",
-        message=f"{instance.user.get_full_name() or instance.user.username} shared your post",
+        message=f"{_display_name(instance.user)} shared your post",
         related_object=post,
         action_url=post.get_absolute_url(),
         priority='low',
         data={
             'group_id': post.feed.group.id,
             'post_id': post.id,
-            'sharer_name': instance.user.get_full_name() or instance.user.username,
+            'sharer_name': _display_name(instance.user),
             'share_message': instance.message
         }
     )
@@ -1,7 +1,12 @@
 from django import template
 
+from feeds import variants
+from feeds.models import PostLike
+
 register = template.Library()
 
+REACTION_EMOJI = dict(PostLike.REACTION_TYPES)
+
 @register.filter(name='can_edit')
 def can_edit(post, user=None):
     """Return the can_edit boolean attribute if present."""
@@ -19,5 +24,32 @@ def has_liked_post(post, user):
     """Return True if the user has liked the post, else False."""
     if not user or not user.is_authenticated:
         return False
+    # Feed pages attach the viewer's reaction up front (see feeds.viewer_state)
+    if hasattr(post, 'viewer_reaction'):
+        return post.viewer_reaction is not None
     # Use the related_name 'likes' for PostLike
     return post.likes.filter(user=user).exists()
+
+
+@register.filter(name='reaction_emoji')
+def reaction_emoji(reaction_type):
+    """Return the emoji for a PostLike reaction type."""
+    return REACTION_EMOJI.get(reaction_type, '')
+
+
+@register.filter(name='media_processing')
+def media_processing(media_items):
+    """Return True while any of the media is still waiting for the worker."""
+    return any(media.is_processing for media in media_items)
+
+
+@register.filter(name='media_srcset')
+def media_srcset(media, fmt='jpeg'):
+    """Return the srcset value listing the responsive renditions of an image."""
+    return variants.srcset(media, fmt)
+
+
+@register.filter(name='media_variant')
+def media_variant(media, spec):
+    """Return the URL of one named rendition, e.g. media|media_variant:'w640.jpeg'."""
+    return variants.variant_url(media, spec)
@@ -1,3 +1,152 @@
+import os
+import random
+import struct
+import tempfile
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+
+from customuser.models import CustomUser
+from group.models import Group
+
+from .models import Feed, Post
+from .pagination import KeysetPaginator, decode_cursor, encode_cursor
+from .video import VideoInfo, VideoProbeError, probe_video
+
+
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        self.author = CustomUser.objects.create_user(email='author@example.com', password='pw')
+        group = Group.objects.create(name='Paging Group', description='d', creator=self.author)
+        self.feed = Feed.objects.get(group=group)
+
+    def test_cursor_keeps_microseconds(self):
+        value = timezone.now().replace(microsecond=123456)
+        self.assertEqual(decode_cursor(encode_cursor([value])), [value.isoformat()])
+
+    def test_walks_posts_within_one_millisecond(self):
+        # 200µs apart: several posts share each millisecond, and page
+        # boundaries fall inside one
+        start = timezone.now().replace(microsecond=0)
+        posts = [Post.objects.create(author=self.author, feed=self.feed, content=f'post {i}') for i in range(25)]
+        for i, post in enumerate(posts):
+            Post.objects.filter(pk=post.pk).update(created_at=start + timedelta(microseconds=200 * i))
+
+        paginator = KeysetPaginator(Post.objects.filter(feed=self.feed), Post._meta.ordering, 4)
+        seen = []
+        cursor = None
+        while True:
+            page = paginator.get_page(cursor)
+            seen.extend(post.pk for post in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+
+        expected = list(Post.objects.filter(feed=self.feed).order_by(*Post._meta.ordering).values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), 25)
+
+
+def _box(box_type, payload=b''):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def _mp4(duration=12.5, timescale=1000, width=1280, height=720, moov_last=False, mdat_size=4096):
+    mvhd = _box(b'mvhd', b'\x00' * 4 + b'\x00' * 8 + struct.pack('>II', timescale, int(duration * timescale)) + b'\x00' * 80)
+    hdlr = _box(b'hdlr', b'\x00' * 4 + b'\x00' * 4 + b'vide' + b'\x00' * 12 + b'VideoHandler\x00')
+    sample_entry = struct.pack('>I4s', 86, b'avc1') + b'\x00' * 6 + b'\x00\x01' + b'\x00' * 16 + struct.pack('>HH', width, height) + b'\x00' * 50
+    stsd = _box(b'stsd', b'\x00' * 4 + struct.pack('>I', 1) + sample_entry)
+    trak = _box(b'trak', _box(b'mdia', hdlr + _box(b'minf', _box(b'stbl', stsd))))
+    sound = _box(b'trak', _box(b'mdia', _box(b'hdlr', b'\x00' * 8 + b'soun' + b'\x00' * 12)))
+    moov = _box(b'moov', mvhd + sound + trak)
+    ftyp = _box(b'ftyp', b'isom\x00\x00\x02\x00isomavc1')
+    mdat = _box(b'mdat', b'\x00' * mdat_size)
+    return ftyp + (mdat + moov if moov_last else moov + mdat)
+
+
+def _vint_size(size):
+    return bytes([0x10]) + size.to_bytes(3, 'big')
+
+
+def _element(element_id, payload=b'', unknown_size=False):
+    size = b'\x01\xff\xff\xff\xff\xff\xff\xff' if unknown_size else _vint_size(len(payload))
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big') + size + payload
+
+
+def _webm(duration_ms=7500.0, width=640, height=360, unknown_segment=False):
+    header = _element(0x1A45DFA3, _element(0x4282, b'webm'))
+    info = _element(0x1549A966, _element(0x2AD7B1, (1_000_000).to_bytes(3, 'big')) + _element(0x4489, struct.pack('>d', duration_ms)))
+    audio = _element(0xAE, _element(0x83, b'\x02') + _element(0x86, b'A_OPUS'))
+    video = _element(0xAE, _element(0x83, b'\x01') + _element(0x86, b'V_VP9') + _element(
+        0xE0, _element(0xB0, width.to_bytes(2, 'big')) + _element(0xBA, height.to_bytes(2, 'big'))
+    ))
+    tracks = _element(0x1654AE6B, audio + video)
+    cluster = _element(0x1F43B675, b'\x00' * 256)
+    return header + _element(0x18538067, info + tracks + cluster, unknown_size=unknown_segment)
+
+
+class ProbeVideoTests(TestCase):
+    def probe(self, data):
+        fd, path = tempfile.mkstemp()
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        return probe_video(path)
+
+    def assert_probes_or_rejects(self, data):
+        """Bad input gives a VideoInfo (possibly incomplete) or VideoProbeError, nothing else"""
+        try:
+            info = self.probe(data)
+        except VideoProbeError:
+            return
+        self.assertIsInstance(info, VideoInfo)
+
+    def test_mp4(self):
+        info = self.probe(_mp4())
+        self.assertEqual(info, VideoInfo('mp4', 'avc1', 12.5, 1280, 720))
+
+    def test_mp4_with_moov_after_media_data(self):
+        info = self.probe(_mp4(duration=3, width=640, height=480, moov_last=True))
+        self.assertEqual(info, VideoInfo('mp4', 'avc1', 3.0, 640, 480))
+
+    def test_webm(self):
+        info = self.probe(_webm())
+        self.assertEqual(info, VideoInfo('webm', 'V_VP9', 7.5, 640, 360))
+
+    def test_webm_with_unknown_size_segment(self):
+        info = self.probe(_webm(unknown_segment=True))
+        self.assertEqual(info, VideoInfo('webm', 'V_VP9', 7.5, 640, 360))
+
+    def test_webm_with_invalid_duration(self):
+        for duration in (float('nan'), float('inf'), -1.0):
+            with self.subTest(duration=duration):
+                self.assertIsNone(self.probe(_webm(duration_ms=duration)).duration)
+
+    def test_truncated_files(self):
+        for data in (_mp4(mdat_size=16), _mp4(mdat_size=16, moov_last=True), _webm()):
+            for length in range(len(data)):
+                with self.subTest(container=data[4:8], length=length):
+                    self.assert_probes_or_rejects(data[:length])
+
+    def test_corrupted_files(self):
+        rng = random.Random(0)
+        for data in (_mp4(mdat_size=16), _webm()):
+            for _ in range(300):
+                corrupted = bytearray(data)
+                for _ in range(rng.randint(1, 4)):
+                    corrupted[rng.randrange(len(corrupted))] = rng.randrange(256)
+                with self.subTest(corrupted=bytes(corrupted).hex()):
+                    self.assert_probes_or_rejects(bytes(corrupted))
+
+    def test_garbage(self):
+        rng = random.Random(1)
+        for prefix in (b'', b'\x00\x00\x00\x20ftyp', b'\x1a\x45\xdf\xa3'):
+            for _ in range(100):
+                data = prefix + bytes(rng.randrange(256) for _ in range(rng.randint(0, 200)))
+                with self.subTest(data=data.hex()):
+                    self.assert_probes_or_rejects(data)
 
-# Create your tests here.
+    def test_unknown_container(self):
+        with self.assertRaises(VideoProbeError):
+            self.probe(b'RIFF\x00\x00\x00\x00AVI LIST')
@@ -0,0 +1,135 @@
+# feeds/timeline.py - Materialised home timeline across all of a user's groups
+from django.conf import settings
+
+from group.models import Group, GroupMembership
+from notifications.fanout import enqueue_fanout, register_fanout_handler
+
+from .models import Post, TimelineEntry
+from .pagination import KeysetPage, KeysetPaginator, encode_cursor
+
+
+# Groups with more active members than this are not fanned out on write;
+# their posts are merged into each member's timeline when it is read
+TIMELINE_FANOUT_LIMIT = getattr(settings, 'FEED_TIMELINE_FANOUT_LIMIT', 5000)
+
+# Posts copied into a timeline when the user joins a group
+TIMELINE_BACKFILL = 50
+
+TIMELINE_ORDERING = ('-created_at', '-post_id')
+
+
+def _write_timeline_entries(fanout, recipient_ids, now):
+    post_id = fanout.data['post_id']
+    created_at = Post.objects.filter(pk=post_id).values_list('created_at', flat=True).first()
+    if created_at is None:
+        # Deleted before the worker got to it
+        return
+
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(user_id=user_id, post_id=post_id, group_id=fanout.group_id, created_at=created_at)
+        for user_id in recipient_ids
+    ], ignore_conflicts=True)
+
+
+register_fanout_handler('timeline_post', _write_timeline_entries)
+
+
+def fan_out_post(post):
+    """
+    Queue the insertion of ``post`` into its group members' timelines.
+
+    Runs on the notification fan-out queue (run_fanout), in the same
+    chunked, resumable way as notifications. Posts in very large groups
+    are skipped here and read on demand instead.
+    """
+    group = post.feed.group
+    if group.member_count > TIMELINE_FANOUT_LIMIT:
+        return
+
+    enqueue_fanout(
+        event_type='timeline_post',
+        group=group,
+        notification_type='',
+        title='',
+        message='',
+        related_object=post,
+        data={'post_id': str(post.pk)},
+    )
+
+
+def backfill_timelines(user_ids, group_id, limit=TIMELINE_BACKFILL):
+    """Copy the group's recent posts into the timelines of new members"""
+    recent = list(Post.objects.filter(
+        feed__group_id=group_id, is_approved=True
+    ).order_by('-created_at').values_list('pk', 'created_at')[:limit])
+
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(user_id=user_id, post_id=post_id, group_id=group_id, created_at=created_at)
+        for user_id in user_ids
+        for post_id, created_at in recent
+    ], ignore_conflicts=True, batch_size=1000)
+
+
+def backfill_timeline(user_id, group_id, limit=TIMELINE_BACKFILL):
+    backfill_timelines([user_id], group_id, limit)
+
+
+def remove_from_timelines(user_ids, group_id):
+    """Drop a group's posts from the timelines of members who left"""
+    TimelineEntry.objects.filter(user_id__in=user_ids, group_id=group_id).delete()
+
+
+def remove_from_timeline(user_id, group_id):
+    remove_from_timelines([user_id], group_id)
+
+
+def _large_group_ids(user):
+    """The user's groups whose posts are read on demand rather than fanned out"""
+    joined = GroupMembership.objects.filter(
+        user=user, is_active=True, status='active'
+    ).values('group_id')
+    return list(
+        Group.objects.filter(pk__in=joined, member_count__gt=TIMELINE_FANOUT_LIMIT)
+        .values_list('pk', flat=True)
+    )
+
+
+def home_timeline_page(user, cursor=None, per_page=10):
+    """
+    One keyset page of the user's home timeline, newest first.
+
+    For most users this is a single range scan of the (user, created_at,
+    post) index. Posts from groups above TIMELINE_FANOUT_LIMIT are
+    fetched with the same cursor and merged in.
+    """
+    entries = TimelineEntry.objects.filter(user=user, post__is_approved=True)
+    page = KeysetPaginator(entries, TIMELINE_ORDERING, per_page).get_page(cursor)
+    post_ids = [entry.post_id for entry in page.object_list]
+    rank = [(entry.created_at, entry.post_id) for entry in page.object_list]
+    has_more = page.has_next()
+
+    large_groups = _large_group_ids(user)
+    if large_groups:
+        # The cursor of both sources is the same (created_at, post id) key
+        pulled = KeysetPaginator(
+            Post.objects.filter(feed__group__in=large_groups, is_approved=True),
+            ('-created_at', '-id'),
+            per_page,
+        ).get_page(cursor)
+        # A group that grew past the limit can have both entries and
+        # on-demand posts for the same post
+        merged = sorted(
+            set(rank) | {(post.created_at, post.pk) for post in pulled.object_list},
+            reverse=True,
+        )
+        has_more = has_more or pulled.has_next() or len(merged) > per_page
+        rank = merged[:per_page]
+        post_ids = [post_id for _, post_id in rank]
+
+    posts = Post.objects.filter(pk__in=post_ids).select_related(
+        'author', 'author__profile', 'feed__group'
+    ).prefetch_related('media').in_bulk()
+    ordered = [posts[post_id] for post_id in post_ids if post_id in posts]
+
+    next_cursor = encode_cursor(rank[-1]) if has_more and rank else None
+    return KeysetPage(ordered, next_cursor)
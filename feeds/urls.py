@@ -6,6 +6,11 @@ from . import poll_views
 app_name = 'feeds'
 
 urlpatterns = [
+    # Must come before the group slug patterns
+    path('home/', views.home_feed_view, name='home_feed'),
+    path('home/load_more/', views.home_load_more, name='home_load_more'),
+    path('impressions/', views.record_impressions, name='record_impressions'),
+    path('search/', views.search_posts_view, name='search_posts'),
     path('<slug:slug>/', views.group_feed_view, name='group_feed'),
     path('<slug:group_slug>/create_post/', views.create_post_view, name='create_post'),
     path('posts/<uuid:post_id>/like/', views.toggle_post_like, name='toggle_post_like'),
@@ -14,6 +19,8 @@ urlpatterns = [
     path('<slug:slug>/load_more/', views.load_more_posts, name='load_more_posts'),
     path('posts/<uuid:post_id>/comments/', views.load_comments, name='load_comments'),
     path('posts/<uuid:post_id>/delete/', views.delete_post, name='delete_post'),
+    path('posts/<uuid:post_id>/media/status/', views.post_media_status, name='post_media_status'),
+    path('media/<uuid:media_id>/<str:spec>/', views.media_variant, name='media_variant'),
     path('comments/<uuid:comment_id>/delete/', views.delete_comment, name='delete_comment'),
     path('comments/<uuid:comment_id>/edit/', views.edit_comment, name='edit_comment'),
     path('comments/<uuid:comment_id>/edit-form/', views.get_edit_comment_form, name='get_edit_comment_form'),
@@ -1,12 +1,10 @@
 # feeds/utils.py
 
-from django.core.files.base import ContentFile
 from django.conf import settings
 from PIL import Image, ImageOps
 import os
 import mimetypes
-from io import BytesIO
-import uuid
+import tempfile
 
 
 def validate_media_file(file, post_type):
@@ -31,129 +29,89 @@ def validate_media_file(file, post_type):
     return mime_type in allowed_types
 
 
-def process_media_file(file, post_type):
-    """Process uploaded media file - resize, optimize, generate thumbnails"""
-    metadata = {
-        'file_size': file.size,
-        'original_name': file.name
-    }
+# EXIF orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def open_image(source, max_size=None):
+    """
+    Open an image, letting JPEGs decode at a reduced scale.
+
+    JPEG can be decoded at 1/2, 1/4 or 1/8 of its size directly from the
+    DCT coefficients. Asking for the size the image will be shrunk to
+    anyway means a 24MP phone photo is never expanded to a full-size
+    bitmap just to be thrown away by the resize.
+    """
+    image = Image.open(source)
     
-    if post_type == 'photo':
-        return process_image_file(file, metadata)
-    elif post_type == 'video':
-        return process_video_file(file, metadata)
-    else:
-        return file, None, metadata
-
-
-def process_image_file(file, metadata):
-    """Process and optimize image file"""
-    try:
-        # Open and process the image
-        image = Image.open(file)
-        
-        # Convert to RGB if necessary (for JPEG compatibility)
-        if image.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', image.size, (255, 255, 255))
-            if image.mode == 'P':
-                image = image.convert('RGBA')
-            background.paste(image, mask=image.split()[-1] if image.mode == 'RGBA' else None)
-            image = background
-        
-        # Auto-rotate based on EXIF data
-        image = ImageOps.exif_transpose(image)
-        
-        # Resize if too large
-        max_size = getattr(settings, 'MAX_IMAGE_DIMENSIONS', (2048, 2048))
-        if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-        
-        # Save optimized image
-        output = BytesIO()
-        image.save(output, format='JPEG', quality=85, optimize=True)
-        output.seek(0)
-        
-        # Generate filename
-        file_extension = '.jpg'
-        filename = f"posts/{uuid.uuid4().hex}{file_extension}"
-        
-        optimized_file = ContentFile(output.getvalue(), name=filename)
-        
-        # Generate thumbnail
-        thumbnail = generate_image_thumbnail(image)
-        
-        metadata.update({
-            'dimensions': image.size,
-            'format': 'JPEG'
-        })
-        
-        return optimized_file, thumbnail, metadata
-        
-    except Exception as e:
-        # If processing fails, return original file
-        return file, None, metadata
-
-
-def generate_image_thumbnail(image, size=(300, 300)):
-    """Generate thumbnail for image"""
-    try:
-        # Create thumbnail
-        thumbnail = image.copy()
-        thumbnail.thumbnail(size, Image.Resampling.LANCZOS)
-        
-        # Save thumbnail
-        output = BytesIO()
-        thumbnail.save(output, format='JPEG', quality=75)
-        output.seek(0)
-        
-        filename = f"thumbnails/{uuid.uuid4().hex}.jpg"
-        return ContentFile(output.getvalue(), name=filename)
-        
-    except Exception:
-        return None
-
-
-def process_video_file(file, metadata):
-    """Process video file - basic processing, generate thumbnail"""
-    # For video processing, you might want to use ffmpeg-python or similar
-    # For now, we'll keep it simple and just handle the basic file operations
+    if max_size and image.format == 'JPEG':
+        width, height = image.size
+        if image.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+            ratio = min(max_size[0] / height, max_size[1] / width)
+        else:
+            ratio = min(max_size[0] / width, max_size[1] / height)
+        if ratio < 1:
+            image.draft('RGB', (int(width * ratio) + 1, int(height * ratio) + 1))
+    
+    return image
+
+
+def optimise_image(image, max_size=None):
+    """EXIF-rotate, downscale and flatten a decoded image for the web"""
+    max_size = max_size or getattr(settings, 'MAX_IMAGE_DIMENSIONS', (2048, 2048))
+    
+    # Auto-rotate based on EXIF data
+    image = ImageOps.exif_transpose(image)
+    
+    # Resize if too large (reducing_gap shrinks by whole factors first, so
+    # LANCZOS only runs over the last step)
+    if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
+        image.thumbnail(max_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    
+    # Convert to RGB if necessary (for JPEG compatibility). Done after the
+    # resize so the white background is only allocated at the final size.
+    if image.mode in ('RGBA', 'LA', 'P'):
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    
+    return image
+
+
+def make_thumbnail(image, size=(300, 300)):
+    """Thumbnail resized from the already optimised image (no full copy)"""
+    return ImageOps.contain(image, size, Image.Resampling.LANCZOS)
+
+
+def save_jpeg(image, output, quality=85, optimize=True):
+    image.save(output, format='JPEG', quality=quality, optimize=optimize)
+    output.seek(0)
+    return output
+
+
+def derive_image_files(source_path, max_size=None):
+    """
+    Build the optimised image and thumbnail for the image at ``source_path``.
+
+    Pure function of its input (no ORM or storage access) so it can run in
+    a worker process. Outputs are written to temporary files; returns
+    (image_path, thumbnail_path, dimensions) and the caller deletes them.
+    """
+    max_size = max_size or getattr(settings, 'MAX_IMAGE_DIMENSIONS', (2048, 2048))
+    with open(source_path, 'rb') as source:
+        image = optimise_image(open_image(source, max_size), max_size)
+    
+    thumbnail = make_thumbnail(image)
+    
+    paths = []
+    for img, quality, optimize in ((image, 85, True), (thumbnail, 75, False)):
+        fd, path = tempfile.mkstemp(suffix='.jpg')
+        with os.fdopen(fd, 'wb') as output:
+            save_jpeg(img, output, quality, optimize)
+        paths.append(path)
     
-    try:
-        # Generate filename
-        file_extension = os.path.splitext(file.name)[1].lower()
-        if not file_extension:
-            file_extension = '.mp4'
-        
-        filename = f"posts/videos/{uuid.uuid4().hex}{file_extension}"
-        
-        # For thumbnail generation from video, you'd need ffmpeg
-        # For now, we'll return None for thumbnail
-        thumbnail = None
-        
-        # You could add video duration extraction here using ffmpeg-python
-        # metadata['duration'] = get_video_duration(file)
-        
-        return ContentFile(file.read(), name=filename), thumbnail, metadata
-        
-    except Exception as e:
-        return file, None, metadata
-
-
-def get_video_duration(video_file):
-    """Get video duration in seconds using ffmpeg (optional)"""
-    # This would require ffmpeg-python package
-    # import ffmpeg
-    # try:
-    #     probe = ffmpeg.probe(video_file.temporary_file_path())
-    #     duration = float(probe['streams'][0]['duration'])
-    #     return int(duration)
-    # except:
-    #     return None
-    return None
-
-
-def generate_video_thumbnail(video_file):
-    """Generate thumbnail from video using ffmpeg (optional)"""
-    # This would require ffmpeg-python package
-    # You could extract a frame at a specific time and create a thumbnail
-    return None
\ No newline at end of file
+    return paths[0], paths[1], image.size
@@ -0,0 +1,227 @@
+# feeds/variants.py - Responsive image renditions generated on demand
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from .utils import open_image
+
+try:
+    import fcntl
+except ImportError:  # Windows: the cache is only locked within one process
+    fcntl = None
+
+
+# Widths offered in srcset, smallest first
+VARIANT_WIDTHS = (320, 640, 1280)
+
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+VARIANT_QUALITY = 80
+
+VARIANT_ROOT = getattr(settings, 'MEDIA_VARIANT_ROOT', os.path.join(settings.MEDIA_ROOT, 'variants'))
+
+# Size-based eviction: once the cache grows past the limit the least
+# recently served renditions are removed until it's back under 90%
+VARIANT_CACHE_MAX_BYTES = getattr(settings, 'MEDIA_VARIANT_CACHE_MAX_BYTES', 1024 * 1024 * 1024)
+
+SPEC_RE = re.compile(r'^w(?P<width>\d+)\.(?P<format>[a-z]+)$')
+
+
+def variant_spec(width, fmt):
+    return f"w{width}.{fmt}"
+
+
+def parse_spec(spec):
+    """Return (width, format) for a spec such as 'w640.webp', or None"""
+    match = SPEC_RE.match(spec)
+    if not match:
+        return None
+    width, fmt = int(match['width']), match['format']
+    if width not in VARIANT_WIDTHS or fmt not in VARIANT_FORMATS:
+        return None
+    return width, fmt
+
+
+def variant_url(media, spec):
+    return reverse('feeds:media_variant', kwargs={'media_id': media.pk, 'spec': spec})
+
+
+def srcset(media, fmt='jpeg'):
+    """The srcset attribute value listing every width of ``media`` in ``fmt``"""
+    return ', '.join(
+        f"{variant_url(media, variant_spec(width, fmt))} {width}w"
+        for width in VARIANT_WIDTHS
+    )
+
+
+class VariantCache:
+    """
+    Renditions stored on disk under VARIANT_ROOT, as <media id>/<key>.
+
+    The cache's total size is kept in a small usage file, so a miss only
+    adds its rendition's size instead of walking the directory. A file's
+    mtime is bumped whenever it is served and is used as the LRU clock
+    when evicting; eviction walks the directory, which keeps it correct
+    whatever other processes did. Bookkeeping is serialised across
+    processes by an flock on the lock file.
+    """
+
+    def __init__(self, root=VARIANT_ROOT, max_bytes=VARIANT_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.usage_path = os.path.join(root, '.usage')
+        self.lock_path = os.path.join(root, '.lock')
+        self.lock = threading.Lock()
+
+    def key(self, media, spec):
+        # The source name is part of the key, so replacing the file (e.g.
+        # when the media worker finishes) never serves a stale rendition
+        source = hashlib.sha1(media.file.name.encode()).hexdigest()[:10]
+        return f"{media.pk}/{source}-{spec}"
+
+    def path(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, media, spec):
+        """
+        An open (binary) file of the rendition, generating it on a miss.
+
+        The file is opened here rather than handed out by path: an open
+        file stays readable when another process evicts it.
+        """
+        path = self.path(self.key(media, spec))
+
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            width, fmt = parse_spec(spec)
+            f = self._generate(media, width, fmt, path)
+            self._record(os.fstat(f.fileno()).st_size)
+            return f
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted since it was opened; still served from the open file
+            pass
+        return f
+
+    def _generate(self, media, width, fmt, path):
+        """Write the rendition to ``path`` and return it opened for reading"""
+        pil_format, _ = VARIANT_FORMATS[fmt]
+
+        with media.file.open('rb') as f:
+            # Height is effectively unbounded: renditions are constrained by width
+            bounds = (width, width * 100)
+            image = open_image(f, bounds)
+            image = ImageOps.exif_transpose(image)
+            if image.width > width:
+                image.thumbnail(bounds, Image.Resampling.LANCZOS)
+            if pil_format == 'JPEG' and image.mode != 'RGB':
+                image = image.convert('RGB')
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temporary file and rename, so a concurrent request
+            # never serves a half-written rendition. The same file object
+            # is returned, so it can't be evicted before it is served.
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+            out = os.fdopen(fd, 'w+b')
+            try:
+                image.save(out, format=pil_format, quality=VARIANT_QUALITY)
+                out.flush()
+                os.replace(tmp_path, path)
+            except BaseException:
+                out.close()
+                _remove(tmp_path)
+                raise
+
+        out.seek(0)
+        return out
+
+    @contextmanager
+    def _locked(self):
+        """Hold the cache's lock in this process and, where flock exists, across processes"""
+        with self.lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.root, exist_ok=True)
+            with open(self.lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _renditions(self):
+        """(last served, size, path) of every rendition on disk"""
+        renditions = []
+        for directory in os.scandir(self.root):
+            if not directory.is_dir() or directory.name.startswith('.'):
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                renditions.append((stat.st_mtime, stat.st_size, entry.path))
+        return renditions
+
+    def _read_usage(self):
+        try:
+            with open(self.usage_path) as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_usage(self, total):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.tmp-')
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(total))
+        os.replace(tmp_path, self.usage_path)
+
+    def _record(self, size):
+        with self._locked():
+            total = self._read_usage()
+            if total is None:
+                # First use (or a lost usage file): the new rendition is on disk already
+                total = sum(size for _, size, _ in self._renditions())
+            else:
+                total += size
+            if total > self.max_bytes:
+                total = self._evict()
+            self._write_usage(total)
+
+    def _evict(self):
+        """Remove the least recently served renditions down to 90% of the limit; returns the new total"""
+        renditions = sorted(self._renditions())
+        total = sum(size for _, size, _ in renditions)
+        target = self.max_bytes * 0.9
+        for _, size, path in renditions:
+            if total <= target:
+                break
+            _remove(path)
+            total -= size
+        return total
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+variant_cache = VariantCache()
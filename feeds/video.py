@@ -0,0 +1,332 @@
+# feeds/video.py - Video metadata probing and poster frames
+"""
+Reads duration, codec and dimensions straight from MP4/MOV (ISO base
+media) and WebM/Matroska container headers. Only the header boxes and
+elements are read; media data is skipped with seek(), so memory use does
+not depend on the size of the video.
+
+Poster frames need a decoder, so they are only produced when an ffmpeg
+binary is available (FFMPEG_BINARY setting, default 'ffmpeg' on PATH).
+"""
+import math
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+from collections import namedtuple
+
+from django.conf import settings
+
+
+VideoInfo = namedtuple('VideoInfo', ['container', 'codec', 'duration', 'width', 'height'])
+
+FFMPEG_BINARY = getattr(settings, 'FFMPEG_BINARY', 'ffmpeg')
+
+FFMPEG_TIMEOUT = 60
+
+POSTER_WIDTH = 640
+
+
+class VideoProbeError(Exception):
+    """The file is not a container this module understands, or is damaged"""
+
+
+def _read_exact(f, size):
+    """Read ``size`` bytes, failing on a truncated file rather than returning fewer"""
+    data = f.read(size)
+    if len(data) < size:
+        raise VideoProbeError('Truncated video file')
+    return data
+
+
+def probe_video(path):
+    """Return VideoInfo for the MP4 or WebM file at ``path``"""
+    with open(path, 'rb') as f:
+        head = f.read(12)
+        f.seek(0)
+        if head[:4] == b'\x1a\x45\xdf\xa3':
+            return _probe_matroska(f)
+        if head[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'wide', b'skip'):
+            return _probe_mp4(f)
+    raise VideoProbeError('Unrecognised video container')
+
+
+# --- MP4 / MOV -----------------------------------------------------------
+
+MP4_CONTAINERS = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+
+def _iter_boxes(f, start, end):
+    """Yield (type, payload_offset, box_end) for the boxes in [start, end)"""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        payload = offset + 8
+        if size == 1:
+            size = struct.unpack('>Q', _read_exact(f, 8))[0]
+            payload += 8
+        elif size == 0:
+            size = end - offset
+        if size < payload - offset:
+            raise VideoProbeError('Corrupt MP4 box')
+        yield box_type, payload, offset + size
+        offset += size
+
+
+def _probe_mp4(f):
+    f.seek(0, os.SEEK_END)
+    file_end = f.tell()
+
+    for box_type, payload, box_end in _iter_boxes(f, 0, file_end):
+        if box_type == b'moov':
+            return _parse_moov(f, payload, box_end)
+    raise VideoProbeError('MP4 has no moov box')
+
+
+def _parse_moov(f, start, end):
+    duration = None
+    codec = width = height = None
+
+    for box_type, payload, box_end in _iter_boxes(f, start, end):
+        if box_type == b'mvhd':
+            f.seek(payload)
+            version = _read_exact(f, 4)[0]
+            if version == 1:
+                timescale, length = struct.unpack('>16xIQ', _read_exact(f, 28))
+            else:
+                timescale, length = struct.unpack('>8xII', _read_exact(f, 16))
+            if timescale:
+                duration = length / timescale
+        elif box_type == b'trak' and codec is None:
+            codec, width, height = _parse_video_trak(f, payload, box_end)
+
+    return VideoInfo('mp4', codec, duration, width, height)
+
+
+def _find_box(f, start, end, path):
+    """Offsets of the box at ``path`` (e.g. [b'mdia', b'hdlr']) below start"""
+    for box_type, payload, box_end in _iter_boxes(f, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return payload, box_end
+            return _find_box(f, payload, box_end, path[1:])
+    return None
+
+
+def _parse_video_trak(f, start, end):
+    """Return (codec, width, height) if the track is a video track"""
+    hdlr = _find_box(f, start, end, [b'mdia', b'hdlr'])
+    if not hdlr:
+        return None, None, None
+    f.seek(hdlr[0] + 8)
+    if f.read(4) != b'vide':
+        return None, None, None
+
+    stsd = _find_box(f, start, end, [b'mdia', b'minf', b'stbl', b'stsd'])
+    if not stsd:
+        return None, None, None
+
+    # stsd: version/flags, entry count, then the first sample entry
+    f.seek(stsd[0] + 8)
+    entry = f.read(8 + 6 + 2 + 16 + 4)
+    if len(entry) < 36:
+        return None, None, None
+    codec = entry[4:8].decode('latin-1').strip()
+    width, height = struct.unpack('>HH', entry[32:36])
+    return codec, width, height
+
+
+# --- WebM / Matroska -----------------------------------------------------
+
+EBML_HEADER = 0x1A45DFA3
+SEGMENT = 0x18538067
+INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+CLUSTER = 0x1F43B675
+
+UNKNOWN_SIZE = object()
+
+# Largest CodecID read; real ones are a few bytes (e.g. 'V_VP9')
+MAX_CODEC_ID = 64
+
+
+def _read_vint(f, keep_marker):
+    first = f.read(1)
+    if not first:
+        raise VideoProbeError('Truncated Matroska element')
+    value = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not value & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise VideoProbeError('Invalid Matroska variable-length integer')
+
+    rest = f.read(length - 1)
+    if not keep_marker:
+        value &= mask - 1
+    all_ones = value == mask - 1 and all(b == 0xFF for b in rest)
+    for b in rest:
+        value = (value << 8) | b
+    return value, length, all_ones
+
+
+def _iter_elements(f, start, end):
+    """Yield (id, data_offset, data_end) for the elements in [start, end)"""
+    offset = start
+    while end is None or offset < end:
+        f.seek(offset)
+        try:
+            element_id, id_length, _ = _read_vint(f, keep_marker=True)
+            size, size_length, unknown = _read_vint(f, keep_marker=False)
+        except VideoProbeError:
+            return
+        data = offset + id_length + size_length
+        if unknown:
+            yield element_id, data, UNKNOWN_SIZE
+            return
+        yield element_id, data, data + size
+        offset = data + size
+
+
+def _read_uint(f, start, end):
+    # Sizes come from the file: never read more than an integer's 8 bytes
+    if end - start > 8:
+        raise VideoProbeError('Invalid Matroska integer')
+    f.seek(start)
+    return int.from_bytes(_read_exact(f, end - start), 'big')
+
+
+def _probe_matroska(f):
+    f.seek(0, os.SEEK_END)
+    file_end = f.tell()
+
+    for element_id, data, data_end in _iter_elements(f, 0, file_end):
+        if element_id == SEGMENT:
+            return _parse_segment(f, data, file_end if data_end is UNKNOWN_SIZE else data_end)
+    raise VideoProbeError('Matroska file has no segment')
+
+
+def _parse_segment(f, start, end):
+    timecode_scale = 1_000_000
+    raw_duration = None
+    codec = width = height = None
+
+    for element_id, data, data_end in _iter_elements(f, start, end):
+        if element_id == CLUSTER or data_end is UNKNOWN_SIZE:
+            # Headers come before the media clusters
+            break
+        if element_id == INFO:
+            for child, child_data, child_end in _iter_elements(f, data, data_end):
+                if child == TIMECODE_SCALE:
+                    timecode_scale = _read_uint(f, child_data, child_end)
+                elif child == DURATION:
+                    if child_end - child_data not in (4, 8):
+                        raise VideoProbeError('Invalid Matroska duration')
+                    f.seek(child_data)
+                    raw = _read_exact(f, child_end - child_data)
+                    raw_duration = struct.unpack('>f' if len(raw) == 4 else '>d', raw)[0]
+        elif element_id == TRACKS and codec is None:
+            codec, width, height = _parse_tracks(f, data, data_end)
+
+    duration = None
+    if raw_duration is not None and math.isfinite(raw_duration) and raw_duration >= 0:
+        duration = raw_duration * timecode_scale / 1e9
+    return VideoInfo('webm', codec, duration, width, height)
+
+
+def _parse_tracks(f, start, end):
+    for element_id, data, data_end in _iter_elements(f, start, end):
+        if element_id != TRACK_ENTRY:
+            continue
+        track_type = codec = width = height = None
+        for child, child_data, child_end in _iter_elements(f, data, data_end):
+            if child == TRACK_TYPE:
+                track_type = _read_uint(f, child_data, child_end)
+            elif child == CODEC_ID:
+                if child_end - child_data > MAX_CODEC_ID:
+                    raise VideoProbeError('Invalid Matroska codec ID')
+                f.seek(child_data)
+                codec = _read_exact(f, child_end - child_data).rstrip(b'\x00').decode('ascii', 'replace')
+            elif child == VIDEO:
+                for prop, prop_data, prop_end in _iter_elements(f, child_data, child_end):
+                    if prop == PIXEL_WIDTH:
+                        width = _read_uint(f, prop_data, prop_end)
+                    elif prop == PIXEL_HEIGHT:
+                        height = _read_uint(f, prop_data, prop_end)
+        if track_type == 1:
+            return codec, width, height
+    return None, None, None
+
+
+# --- Poster frames -------------------------------------------------------
+
+def ffmpeg_available():
+    return shutil.which(FFMPEG_BINARY) is not None
+
+
+def extract_poster(path, duration=None):
+    """
+    Write a JPEG poster frame for the video at ``path`` to a temp file.
+
+    Returns the temp file path, or None when ffmpeg isn't installed or
+    can't decode the video. ffmpeg seeks to the frame itself, so only the
+    data around it is read.
+    """
+    if not ffmpeg_available():
+        return None
+
+    position = min(1.0, duration / 2) if duration else 0
+    fd, poster_path = tempfile.mkstemp(suffix='.jpg')
+    os.close(fd)
+
+    try:
+        subprocess.run(
+            [
+                FFMPEG_BINARY, '-nostdin', '-loglevel', 'error', '-y',
+                '-ss', f'{position:.3f}', '-i', path,
+                '-frames:v', '1', '-vf', f'scale={POSTER_WIDTH}:-2',
+                poster_path,
+            ],
+            check=True,
+            timeout=FFMPEG_TIMEOUT,
+            capture_output=True,
+        )
+    except (subprocess.SubprocessError, OSError):
+        os.remove(poster_path)
+        return None
+
+    if not os.path.getsize(poster_path):
+        os.remove(poster_path)
+        return None
+    return poster_path
+
+
+def derive_video_files(source_path):
+    """
+    Probe a stored video and extract its poster frame.
+
+    Like utils.derive_image_files this has no ORM or storage access, so it
+    runs in the media worker's process pool. Returns (VideoInfo or None,
+    poster_path or None).
+    """
+    try:
+        info = probe_video(source_path)
+    except VideoProbeError:
+        info = None
+
+    return info, extract_poster(source_path, info.duration if info else None)
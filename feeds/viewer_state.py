@@ -0,0 +1,27 @@
+# feeds/viewer_state.py - Per-viewer state for a page of posts
+from .models import PostLike
+
+
+def attach_viewer_state(posts, user):
+    """
+    Attach the viewer's own reaction to every post on a feed page.
+
+    Sets ``post.viewer_reaction`` to the reaction type ('like', 'love',
+    'pray', ...) or None, using a single query for the whole page instead
+    of one ``likes.filter(user=...)`` per post render.
+    """
+    posts = list(posts)
+
+    reactions = {}
+    if user is not None and user.is_authenticated and posts:
+        reactions = dict(
+            PostLike.objects.filter(
+                user=user,
+                post_id__in=[post.pk for post in posts]
+            ).values_list('post_id', 'reaction_type')
+        )
+
+    for post in posts:
+        post.viewer_reaction = reactions.get(post.pk)
+
+    return posts
@@ -1,19 +1,57 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse, Http404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.paginator import Paginator
 from django.db.models import Q, F, Prefetch
 from django.utils import timezone
 from django.views.decorators.http import require_http_methods
 from django.template.loader import render_to_string
+from django.urls import reverse
 from django.utils import timezone
 from datetime import datetime
+import uuid
 from .models import Feed, Post, Comment, PostLike, CommentLike, FeedActivity, PostMedia
 from group.models import Group
 from .models import Feed, Post, PostMedia
 from group.models import Group
-from .utils import process_media_file, validate_media_file
+from .utils import validate_media_file
+from .comment_preview import attach_comment_previews
+from .counters import current_count, merge_pending_counts
+from .impressions import MAX_IMPRESSIONS_PER_REQUEST, impression_tracker
+from .media_pipeline import store_upload
+from .pagination import KeysetPaginator
+from .ranking import FEED_SORTS, feed_ordering
+from .search import SEARCH_ORDERING, search_posts, visible_posts_q
+from .forms import PostSearchForm
+from .timeline import home_timeline_page
+from .variants import VARIANT_FORMATS, parse_spec, variant_cache
+from .viewer_state import attach_viewer_state
+
+
+POSTS_PER_PAGE = 10
+
+
+def _prepare_feed_posts(posts, user):
+    """
+    Attach the per-viewer state read by the post templates.
+
+    Group admin status is resolved once per request (see group.roles) and
+    the viewer's reactions, un-folded counter deltas and the comment
+    previews are loaded for the whole page in one query each, so the cost doesn't grow with the number
+    of posts on the page (or the number of comments on them).
+    """
+    posts = attach_viewer_state(posts, user)
+    merge_pending_counts(posts)
+    attach_comment_previews(posts)
+    for post in posts:
+        post.can_edit = post.can_edit(user)
+    return posts
+
+
+def _feed_sort(request):
+    """The requested feed order: 'latest' (default) or 'top' (by stored score)"""
+    sort = request.GET.get('sort', 'latest')
+    return sort if sort in FEED_SORTS else 'latest'
 
 
 @login_required
@@ -46,9 +84,7 @@ def group_feed_view(request, slug):
     posts_queryset = Post.objects.filter(
         feed=feed,
         is_approved=True
-    ).select_related('author', 'author__profile').prefetch_related(
-        'media', 'likes', 'comments__author'
-    )
+    ).select_related('author', 'author__profile', 'feed__group').prefetch_related('media')
     
     # Apply privacy filtering
     if not request.user.is_authenticated:
@@ -56,23 +92,22 @@ def group_feed_view(request, slug):
     elif not group.is_member(request.user):
         posts_queryset = posts_queryset.filter(privacy_level='public')
     
-    # Pagination
-    paginator = Paginator(posts_queryset, 10)
-    page_number = request.GET.get('page', 1)
-    posts = paginator.get_page(page_number)
+    # Keyset pagination: no COUNT(*), and later pages cost the same as the first
+    sort = _feed_sort(request)
+    paginator = KeysetPaginator(posts_queryset, feed_ordering(sort), POSTS_PER_PAGE)
+    posts = paginator.get_page(request.GET.get('cursor'))
     
-        # Set can_edit attribute for each post
-    for post in posts.object_list:
-        post.can_edit = post.can_edit(request.user)
+    _prepare_feed_posts(posts.object_list, request.user)
     # Get recent activities for sidebar
     recent_activities = FeedActivity.objects.filter(
-        post__feed=feed
-    ).select_related('user', 'post').order_by('-created_at')[:5]
+        feed=feed
+    ).select_related('user', 'user__profile', 'post').order_by('-created_at')[:5]
     
     context = {
         'group': group,
         'feed': feed,
         'posts': posts,
+        'sort': sort,
         'recent_activities': recent_activities,
         'can_post': feed.allow_posts and group.is_member(request.user),
         'is_admin': group.is_admin(request.user),
@@ -205,24 +240,19 @@ def create_media_post_view(request, group_slug):
             is_approved=not feed.require_approval
         )
         
-        # Process and save media files
+        # Store the uploads; resizing and thumbnails happen in the
+        # process_media worker and the post polls until they're ready
         for i, media_file in enumerate(media_files):
             caption = captions[i] if i < len(captions) else ''
             alt_text = alt_texts[i] if i < len(alt_texts) else ''
             
-            # Process the media file (resize images, generate thumbnails, etc.)
-            processed_file, thumbnail, metadata = process_media_file(media_file, post_type)
-            
-            PostMedia.objects.create(
-                post=post,
+            store_upload(
+                post,
+                media_file,
                 media_type='image' if post_type == 'photo' else 'video',
-                file=processed_file,
-                thumbnail=thumbnail,
+                uploaded_by=request.user,
                 caption=caption,
-                alt_text=alt_text,
-                file_size=metadata.get('file_size', 0),
-                duration=metadata.get('duration'),
-                uploaded_by=request.user
+                alt_text=alt_text
             )
         
         # Render the post partial for HTMX
@@ -405,8 +435,10 @@ def toggle_post_like(request, post_id):
     if not created:
         like.delete()
         liked = False
+        post.viewer_reaction = None
     else:
         liked = True
+        post.viewer_reaction = like.reaction_type
         # Log activity
         FeedActivity.objects.create(
             user=request.user,
@@ -414,6 +446,8 @@ def toggle_post_like(request, post_id):
             activity_type='like'
         )
     
+    post.likes_count = current_count(post, 'likes_count')
+    
     # Return updated like button
     html = render_to_string('feeds/partials/like_button.html', {
         'post': post,
@@ -510,30 +544,159 @@ def load_more_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     feed = get_object_or_404(Feed, group=group)
     
-    page_number = request.GET.get('page', 1)
-    
     posts_queryset = Post.objects.filter(
         feed=feed,
         is_approved=True
-    ).select_related('author', 'author__profile').prefetch_related(
-        'media', 'likes',
-        # Prefetch comments in descending order to get the latest ones for the preview
-        Prefetch('comments', queryset=Comment.objects.order_by('-created_at').select_related('author__profile'))
-    )
+    ).select_related('author', 'author__profile', 'feed__group').prefetch_related('media')
     
     # Apply privacy filtering
     if not group.is_member(request.user):
         posts_queryset = posts_queryset.filter(privacy_level='public')
     
-    paginator = Paginator(posts_queryset, 10)
-    posts = paginator.get_page(page_number)
+    sort = _feed_sort(request)
+    paginator = KeysetPaginator(posts_queryset, feed_ordering(sort), POSTS_PER_PAGE)
+    posts = paginator.get_page(request.GET.get('cursor'))
+    _prepare_feed_posts(posts.object_list, request.user)
     
     return render(request, 'feeds/partials/post_list.html', {
+        'group': group,
         'posts': posts,
-        'user': request.user
+        'sort': sort,
+        'user': request.user,
+        'append': True,
+    })
+    
+
+@login_required
+def home_feed_view(request):
+    """Posts from every group the user belongs to, newest first"""
+    posts = home_timeline_page(request.user, request.GET.get('cursor'), POSTS_PER_PAGE)
+    _prepare_feed_posts(posts.object_list, request.user)
+    
+    return render(request, 'feeds/home_feed.html', {
+        'posts': posts,
+        'show_group': True,
+        'load_more_url': reverse('feeds:home_load_more'),
+    })
+
+
+@login_required
+def home_load_more(request):
+    """Next page of the home timeline for infinite scroll via HTMX"""
+    posts = home_timeline_page(request.user, request.GET.get('cursor'), POSTS_PER_PAGE)
+    _prepare_feed_posts(posts.object_list, request.user)
+    
+    return render(request, 'feeds/partials/post_list.html', {
+        'posts': posts,
+        'user': request.user,
+        'show_group': True,
+        'load_more_url': reverse('feeds:home_load_more'),
+        'append': True,
     })
     
 
+@login_required
+def search_posts_view(request):
+    """Full-text search over the posts the user can see"""
+    form = PostSearchForm(request.GET or None)
+    posts = None
+    
+    if form.is_bound and form.is_valid():
+        posts_queryset = search_posts(
+            request.user, **form.cleaned_data
+        ).select_related('author', 'author__profile', 'feed__group').prefetch_related('media')
+        
+        paginator = KeysetPaginator(posts_queryset, SEARCH_ORDERING, POSTS_PER_PAGE)
+        posts = paginator.get_page(request.GET.get('cursor'))
+        _prepare_feed_posts(posts.object_list, request.user)
+    
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    context = {
+        'form': form,
+        'posts': posts,
+        'user': request.user,
+        'show_group': True,
+        'load_more_url': f"{reverse('feeds:search_posts')}?{query.urlencode()}",
+        'empty_title': 'No matching posts',
+        'empty_message': 'Try other words or fewer filters.',
+    }
+    
+    if request.htmx:
+        return render(request, 'feeds/partials/post_list.html', {**context, 'append': True})
+    return render(request, 'feeds/search.html', context)
+
+
+@login_required
+@require_http_methods(["POST"])
+def record_impressions(request):
+    """
+    Count views of the posts the browser reports as seen (batched on scroll).
+    
+    Only posts the user can see are counted. Views are deduplicated per
+    user and written in bulk by feeds.impressions.
+    """
+    post_ids = []
+    for value in request.POST.getlist('post_id')[:MAX_IMPRESSIONS_PER_REQUEST]:
+        try:
+            post_ids.append(uuid.UUID(value))
+        except ValueError:
+            continue
+    
+    if post_ids:
+        post_ids = list(
+            Post.objects.filter(visible_posts_q(request.user), pk__in=post_ids).values_list('pk', flat=True)
+        )
+    impression_tracker.record(request.user.pk, post_ids)
+    return HttpResponse(status=204)
+    
+
+@login_required
+def post_media_status(request, post_id):
+    """Re-render a post's media; polled via HTMX while uploads are processing"""
+    post = get_object_or_404(Post.objects.prefetch_related('media'), id=post_id)
+    
+    if not post.can_view(request.user):
+        return JsonResponse({'error': 'Not allowed'}, status=403)
+    
+    html = render_to_string('feeds/partials/lightbox_media_post.html', {
+        'post': post,
+        'user': request.user,
+    }, request=request)
+    
+    return HttpResponse(html)
+    
+
+@login_required
+def media_variant(request, media_id, spec):
+    """Serve a resized rendition of a post image, generating it on first use"""
+    parsed = parse_spec(spec)
+    if parsed is None:
+        raise Http404("Unknown image variant")
+    
+    media = get_object_or_404(
+        PostMedia.objects.select_related('post__feed__group'),
+        id=media_id,
+        media_type='image'
+    )
+    
+    if not media.post.can_view(request.user):
+        return JsonResponse({'error': 'Not allowed'}, status=403)
+    
+    if media.is_processing:
+        raise Http404("Image is still processing")
+    
+    try:
+        rendition = variant_cache.get(media, spec)
+    except FileNotFoundError:
+        raise Http404("Image file is missing")
+    
+    response = FileResponse(rendition, content_type=VARIANT_FORMATS[parsed[1]][1])
+    # Renditions are keyed by the source file, so they never change
+    response['Cache-Control'] = 'private, max-age=604800, immutable'
+    return response
+
+
 #-----------------------------------load_comments---------------------------------------------#
 
 @login_required
@@ -548,7 +711,9 @@ def load_comments(request, post_id):
         post=post,
         parent__isnull=True,
         is_approved=True
-    ).select_related('author', 'author__profile').prefetch_related('replies__author')
+    ).select_related('author', 'author__profile', 'post__feed__group').prefetch_related(
+        Prefetch('replies', queryset=Comment.objects.select_related('author', 'post__feed__group'))
+    )
     
     html = render_to_string('feeds/partials/comments_list.html', {
         'comments': comments,
@@ -66,7 +66,7 @@ class GroupAdmin(admin.ModelAdmin):
     inlines = [GroupMembershipInline]
     
     def member_count(self, obj):
-        count = obj.memberships.filter(is_active=True, status='active').count()
+        count = obj.member_count
         if obj.max_members:
             return format_html(
                 '<span style="color: {};">{}/{}</span>',
@@ -76,11 +76,12 @@ class GroupAdmin(admin.ModelAdmin):
             )
         return count
     member_count.short_description = 'Members'
+    member_count.admin_order_field = 'member_count'
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related(
             'creator', 'category'
-        ).prefetch_related('memberships')
+        )
 
 
 @admin.register(GroupMembership)
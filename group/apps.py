@@ -6,4 +6,5 @@ class GroupConfig(AppConfig):
     name = 'group'
 
     def ready(self):
-        import group.signals  # noqa
\ No newline at end of file
+        import group.signals  # noqa
+        import group.invitations  # noqa - registers the invitation email delivery callback
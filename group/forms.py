@@ -4,6 +4,7 @@ from django.utils.text import slugify
 from django.core.exceptions import ValidationError
 
 from customuser.models import Profile
+from .invitations import MAX_INVITATION_EMAILS
 from .models import Group, Category, GroupMembership
 
 
@@ -167,8 +168,8 @@ class GroupInvitationForm(forms.Form):
         if not clean_emails:
             raise ValidationError("No valid email addresses found.")
         
-        if len(clean_emails) > 50:
-            raise ValidationError("Maximum 50 email addresses allowed per invitation.")
+        if len(clean_emails) > MAX_INVITATION_EMAILS:
+            raise ValidationError(f"Maximum {MAX_INVITATION_EMAILS} email addresses allowed per invitation.")
         
         # Remove duplicates while preserving order
         seen = set()
@@ -0,0 +1,166 @@
+# group/invitations.py - Invitation creation and email delivery
+"""
+Inviting a list of addresses costs a fixed number of queries: existing
+invitations, current members and registered users are each looked up for
+the whole list at once, new invitations are written with one bulk_create
+and previously used ones are re-armed with one bulk_update. Their emails
+are queued in the same transaction with one insert into the email outbox
+(notifications.outbox); the outbox worker sends them and reports back,
+and delivery_status on each invitation follows.
+
+Re-submitting the same list is harmless: addresses with a pending
+invitation or an active membership are skipped, so nobody is emailed
+twice.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.urls import reverse
+from django.utils import timezone
+
+from customuser.models import CustomUser
+from notifications.outbox import outbox_email, queue_emails, register_delivery_callback
+
+from .models import GroupInvitation, GroupMembership
+
+
+INVITATION_TTL = timedelta(days=7)
+
+# Addresses accepted by one submission of GroupInvitationForm; only the
+# rows are written in the request, so this can be generous
+MAX_INVITATION_EMAILS = getattr(settings, 'GROUP_INVITATION_MAX_EMAILS', 500)
+
+OUTBOX_CATEGORY = 'group_invitation'
+
+# OutboxEmail.status -> GroupInvitation.delivery_status
+DELIVERY_STATUS = {'pending': 'queued', 'sending': 'queued', 'sent': 'sent', 'failed': 'failed'}
+
+# Absolute links in emails sent outside a request
+SITE_URL = getattr(settings, 'SITE_URL', 'http://localhost:8000')
+
+InvitationResult = namedtuple('InvitationResult', ['queued', 'already_invited', 'already_members'])
+
+REARMED_FIELDS = [
+    'invited_by', 'invited_user', 'message', 'status', 'expires_at', 'responded_at',
+    'delivery_status', 'delivery_attempts', 'delivery_error', 'sent_at',
+]
+
+
+def create_invitations(group, invited_by, emails, message=''):
+    """
+    Invite ``emails`` to ``group`` and queue their emails.
+
+    Returns an InvitationResult of the queued invitations and the
+    addresses skipped because they are already invited or members.
+    """
+    # Addresses are matched case-insensitively but stored as entered
+    entered = {}
+    for email in emails:
+        email = email.strip()
+        if email:
+            entered.setdefault(email.lower(), email)
+    if not entered:
+        return InvitationResult([], [], [])
+
+    now = timezone.now()
+    existing = {
+        invitation.email_lower: invitation
+        for invitation in GroupInvitation.objects.annotate(email_lower=Lower('invited_email'))
+        .filter(group=group, email_lower__in=entered)
+    }
+    members = set(
+        GroupMembership.objects.annotate(email_lower=Lower('user__email'))
+        .filter(group=group, is_active=True, email_lower__in=entered)
+        .values_list('email_lower', flat=True)
+    )
+    user_ids = dict(
+        CustomUser.objects.annotate(email_lower=Lower('email'))
+        .filter(email_lower__in=entered)
+        .values_list('email_lower', 'pk')
+    )
+
+    created, rearmed, already_invited, already_members = [], [], [], []
+    for key, email in entered.items():
+        if key in members:
+            already_members.append(email)
+            continue
+
+        invitation = existing.get(key)
+        if invitation is None:
+            invitation = GroupInvitation(group=group, invited_email=email)
+            created.append(invitation)
+        elif invitation.status == 'pending' and invitation.expires_at > now:
+            already_invited.append(email)
+            continue
+        else:
+            # Declined, accepted-then-left or expired: (group, invited_email)
+            # is unique, so the old row is reused for the new invitation
+            rearmed.append(invitation)
+
+        invitation.invited_by = invited_by
+        invitation.invited_user_id = user_ids.get(key)
+        invitation.message = message
+        invitation.status = 'pending'
+        invitation.expires_at = now + INVITATION_TTL
+        invitation.responded_at = None
+        invitation.delivery_status = 'queued'
+        invitation.delivery_attempts = 0
+        invitation.delivery_error = ''
+        invitation.sent_at = None
+
+    with transaction.atomic():
+        # A concurrent submission of the same address loses the race quietly
+        GroupInvitation.objects.bulk_create(created, ignore_conflicts=True)
+        if created:
+            written = set(
+                GroupInvitation.objects.filter(pk__in=[invitation.pk for invitation in created])
+                .values_list('pk', flat=True)
+            )
+            created = [invitation for invitation in created if invitation.pk in written]
+        GroupInvitation.objects.bulk_update(rearmed, REARMED_FIELDS)
+
+        queued = created + rearmed
+        queue_emails([invitation_email(invitation) for invitation in queued])
+
+    return InvitationResult(queued, already_invited, already_members)
+
+
+def invitation_link(invitation):
+    path = reverse('join_group', kwargs={'slug': invitation.group.slug})
+    return f'{SITE_URL.rstrip("/")}{path}?invitation={invitation.pk}'
+
+
+def invitation_email(invitation):
+    """The unsaved OutboxEmail of ``invitation``"""
+    group = invitation.group
+    body = f"You've been invited to join {group.name}. Click here: {invitation_link(invitation)}"
+    if invitation.message:
+        body = f'{invitation.message}\n\n{body}'
+    return outbox_email(
+        to=invitation.invited_email,
+        subject=f'Invitation to join {group.name}',
+        body=body,
+        category=OUTBOX_CATEGORY,
+        reference=invitation.pk,
+    )
+
+
+def invitation_delivered(emails):
+    """Outbox callback: mirror the delivery of invitation emails"""
+    by_id = {email.reference: email for email in emails}
+    invitations = list(GroupInvitation.objects.filter(pk__in=list(by_id)))
+    for invitation in invitations:
+        email = by_id[str(invitation.pk)]
+        invitation.delivery_status = DELIVERY_STATUS[email.status]
+        invitation.delivery_attempts = email.attempts
+        invitation.delivery_error = email.last_error
+        invitation.sent_at = email.sent_at
+    GroupInvitation.objects.bulk_update(
+        invitations, ['delivery_status', 'delivery_attempts', 'delivery_error', 'sent_at']
+    )
+
+
+register_delivery_callback(OUTBOX_CATEGORY, invitation_delivered)
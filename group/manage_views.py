@@ -6,11 +6,12 @@ from django.contrib import messages
 from django.db.models import Q, Count
 from django.http import JsonResponse
 from django.core.paginator import Paginator
-from django.core.mail import send_mail
 from django.urls import reverse
 from contributions.models import Contribution
 from group.forms import GroupCreationForm, GroupInvitationForm, GroupJoinForm, GroupSearchForm, GroupEditForm
 from memorial.models import Memorial
+from . import membership as membership_service
+from .invitations import create_invitations
 from .models import Group, GroupMembership, GroupInvitation, Category
 
 from django.shortcuts import render, get_object_or_404, redirect
@@ -52,9 +53,9 @@ def group_settings_view(request, slug):
                     group.save()
                     
                     # Make sure new owner is admin
-                    membership = GroupMembership.objects.get(group=group, user=new_owner)
-                    membership.role = 'admin'
-                    membership.save()
+                    membership_service.change_role(
+                        GroupMembership.objects.get(group=group, user=new_owner), 'admin'
+                    )
                     
                     messages.success(request, f'Ownership transferred to {new_owner.email}')
                     return redirect('group_detail', slug=slug)
@@ -105,52 +106,23 @@ def group_invitations_view(request, slug):
             emails = form.cleaned_data['emails']
             message = form.cleaned_data.get('message', '')
             
-            sent_count = 0
-            for email in emails:
-                # Check if user already invited or is member
-                if GroupInvitation.objects.filter(group=group, invited_email=email, status='pending').exists():
-                    continue
-                
-                if GroupMembership.objects.filter(group=group, user__email=email, is_active=True).exists():
-                    continue
-                
-                # Create invitation
-                invitation = GroupInvitation.objects.create(
-                    group=group,
-                    invited_by=request.user,
-                    invited_email=email,
-                    message=message,
-                    expires_at=timezone.now() + timezone.timedelta(days=7)
-                )
-                
-                # Send invitation email
-                try:
-                    invitation_link = request.build_absolute_uri(
-                        reverse('join_group', kwargs={'slug': group.slug}) + f'?invitation={invitation.id}'
-                    )
-                    
-                    send_mail(
-                        subject=f'Invitation to join {group.name}',
-                        message=f'You\'ve been invited to join {group.name}. Click here: {invitation_link}',
-                        from_email=None,
-                        recipient_list=[email],
-                        fail_silently=True,
-                    )
-                    sent_count += 1
-                except:
-                    pass
-            
-            if sent_count > 0:
-                messages.success(request, f'{sent_count} invitation(s) sent successfully!')
+            result = create_invitations(group, request.user, emails, message)
+
+            if result.queued:
+                messages.success(request, f'{len(result.queued)} invitation(s) queued for sending.')
             else:
                 messages.info(request, 'No new invitations were sent.')
-            
+
+            skipped = len(result.already_invited) + len(result.already_members)
+            if skipped:
+                messages.info(request, f'{skipped} address(es) skipped: already invited or already members.')
+
             return redirect('group_manage_invitations', slug=slug)
     else:
         form = GroupInvitationForm()
     
     # Get existing invitations (using related_name from Group model)
-    invitations = GroupInvitation.objects.filter(group=group).order_by('-created_at')
+    invitations = GroupInvitation.objects.filter(group=group).select_related('invited_by__profile').order_by('-created_at')
     
     context = {
         'group': group,
@@ -209,9 +181,9 @@ def group_manage_view(request, slug):
         return redirect('group_detail', slug=slug)
     
     # Get membership statistics
-    total_members = group.memberships.filter(is_active=True).count() # type: ignore
-    active_members = group.memberships.filter(is_active=True, status='active').count() # type: ignore
+    active_members = group.member_count
     pending_members = group.memberships.filter(is_active=True, status='pending').count() # type: ignore
+    total_members = active_members + pending_members
     
     # Recent activity
     recent_memberships = group.memberships.filter(# type: ignore
@@ -242,13 +214,7 @@ def group_detail_view(request, slug):
     """
     Enhanced group detail view.
     """
-    group = get_object_or_404(
-        Group.objects.annotate(
-            num_members=Count('memberships', filter=Q(memberships__is_active=True, memberships__status='active'))
-        ),
-        slug=slug,
-        is_active=True
-    )
+    group = get_object_or_404(Group, slug=slug, is_active=True)
 
     # User's relationship with the group
     user_membership = GroupMembership.objects.filter(
@@ -0,0 +1,51 @@
+# group/management/commands/reconcile_member_counts.py
+from django.core.management.base import BaseCommand, CommandError
+
+from group.membership import reconcile_member_counts
+from group.models import Group
+from group.search import index_groups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored Group.member_count (and optionally search keywords) from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--group',
+            help='Slug of a single group to reconcile'
+        )
+
+        parser.add_argument(
+            '--keywords',
+            action='store_true',
+            help='Also rebuild the groups\' search keywords'
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Groups re-indexed per batch with --keywords'
+        )
+
+    def handle(self, *args, **options):
+        groups = Group.objects.all()
+        if options['group']:
+            groups = groups.filter(slug=options['group'])
+            if not groups.exists():
+                raise CommandError(f"No group with slug '{options['group']}'")
+
+        fixed = reconcile_member_counts(groups)
+        self.stdout.write(f'  ✓ {fixed} member count{"s" if fixed != 1 else ""} corrected')
+
+        if options['keywords']:
+            total = 0
+            batch_size = options['batch_size']
+            ids = list(groups.order_by('pk').values_list('pk', flat=True))
+            for start in range(0, len(ids), batch_size):
+                batch = ids[start:start + batch_size]
+                index_groups(Group.objects.filter(pk__in=batch).only('pk', 'name', 'tags'))
+                total += len(batch)
+            self.stdout.write(f'  ✓ {total} groups re-indexed')
+
+        self.stdout.write(self.style.SUCCESS('Groups reconciled'))
@@ -0,0 +1,260 @@
+# group/membership.py - Membership state transitions
+"""
+Joining, approval, leaving, removal, bans and deaths all change whether a
+membership counts towards Group.member_count. Each transition here locks
+the membership row, applies the change and saves it in one transaction;
+the GroupMembership signals then adjust the group's counter with an F()
+update inside that same transaction. Because the row is re-read under the
+lock, two concurrent requests removing the same member decrement the
+counter once.
+
+Saves made elsewhere (the admin, shell) still keep the counter in step
+through the signals, only without the lock; reconcile_member_counts
+repairs any drift.
+
+The bulk_* operations change many memberships of one group with a single
+UPDATE. No per-row signals fire for them, so they adjust the counter
+themselves, send memberships_changed for other apps' per-member state,
+and queue one notification job for everyone affected.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
+from django.utils import timezone
+
+from notifications.fanout import enqueue_fanout, register_fanout_handler, write_notifications
+from notifications.outbox import outbox_email, queue_emails
+
+from .models import Group, GroupMembership
+
+
+ROLES = [role for role, _ in GroupMembership.ROLE_CHOICES]
+
+# Sent after a bulk operation with the group and the ids of users who
+# became (``activated``) or stopped being (``deactivated``) active members
+memberships_changed = Signal()
+
+
+def counts_as_member(membership):
+    """Whether ``membership`` is included in Group.member_count"""
+    return membership.is_active and membership.status == 'active'
+
+
+def counted_members_q(prefix=''):
+    return Q(**{f'{prefix}is_active': True, f'{prefix}status': 'active'})
+
+
+def adjust_member_count(group_id, delta):
+    if delta:
+        Group.objects.filter(pk=group_id).update(member_count=F('member_count') + delta)
+
+
+def _locked(membership):
+    """The current row of ``membership``, locked until the transaction ends"""
+    return GroupMembership.objects.select_for_update().select_related('group', 'user').get(pk=membership.pk)
+
+
+def _apply(membership, **changes):
+    """
+    Lock ``membership``, set ``changes`` and save them. Returns the saved
+    instance, or None if the row already had those values.
+    """
+    with transaction.atomic():
+        current = _locked(membership)
+        fields = [name for name, value in changes.items() if getattr(current, name) != value]
+        if not fields:
+            return None
+        for name in fields:
+            setattr(current, name, changes[name])
+        current.save(update_fields=fields)
+
+    for name in fields:
+        setattr(membership, name, changes[name])
+    return current
+
+
+def join(group, user, status='active', role='member', join_message='', approved_by=None):
+    """Create ``user``'s membership of ``group``"""
+    with transaction.atomic():
+        return GroupMembership.objects.create(
+            group=group,
+            user=user,
+            role=role,
+            status=status,
+            join_message=join_message,
+            approved_at=timezone.now() if status == 'active' else None,
+            approved_by=approved_by if status == 'active' else None,
+        )
+
+
+def approve(membership, approved_by):
+    """Accept a pending request to join; False if it was already processed"""
+    with transaction.atomic():
+        if _locked(membership).status != 'pending':
+            return False
+        return _apply(
+            membership, status='active', approved_at=timezone.now(), approved_by=approved_by
+        ) is not None
+
+
+def reject(membership):
+    """Delete a pending request to join; False if it was already processed"""
+    with transaction.atomic():
+        current = _locked(membership)
+        if current.status != 'pending':
+            return False
+        current.delete()
+    return True
+
+
+def deactivate(membership):
+    """The member left or was removed; the row is kept for history"""
+    return _apply(membership, is_active=False) is not None
+
+
+leave = remove = deactivate
+
+
+def ban(membership):
+    return _apply(membership, status='banned', is_active=False) is not None
+
+
+def mark_deceased(membership):
+    return _apply(
+        membership,
+        status='deceased', is_active=False, is_deceased=True, can_post=False, can_comment=False,
+    ) is not None
+
+
+def change_role(membership, role):
+    if role not in ROLES:
+        raise ValueError(f'Unknown role {role!r}')
+    return _apply(membership, role=role) is not None
+
+
+def reconcile_member_counts(groups=None):
+    """
+    Recompute member_count from the memberships table with one UPDATE.
+    Returns the number of groups whose stored count was wrong.
+    """
+    if groups is None:
+        groups = Group.objects.all()
+
+    actual = Coalesce(
+        Subquery(
+            GroupMembership.objects.filter(counted_members_q(), group=OuterRef('pk'))
+            .values('group').annotate(n=Count('pk')).values('n')[:1]
+        ),
+        Value(0),
+    )
+    with transaction.atomic():
+        return groups.annotate(actual=actual).exclude(member_count=F('actual')).update(member_count=actual)
+
+
+def _notify_and_email(fanout, recipient_ids, now):
+    """
+    Fan-out handler of bulk membership actions: a notification and an
+    email each, the emails queued in the chunk's transaction
+    """
+    write_notifications(fanout, recipient_ids, now)
+
+    emails = get_user_model().objects.filter(pk__in=recipient_ids).exclude(email='').values_list('email', flat=True)
+    queue_emails([
+        outbox_email(to=email, subject=fanout.title, body=fanout.message, category='membership')
+        for email in emails
+    ])
+
+
+register_fanout_handler('membership_bulk', _notify_and_email)
+
+
+def _bulk_update(group, memberships, **changes):
+    """
+    Apply ``changes`` to ``memberships`` (a queryset of ``group``'s
+    memberships) with one UPDATE, keeping member_count in step.
+    Returns the user ids of the rows changed.
+    """
+    with transaction.atomic():
+        rows = list(memberships.select_for_update().values_list('pk', 'user_id', 'is_active', 'status'))
+        if not rows:
+            return []
+
+        pks = [pk for pk, _, _, _ in rows]
+        user_ids = [user_id for _, user_id, _, _ in rows]
+        was_counted = {user_id for _, user_id, is_active, status in rows if is_active and status == 'active'}
+
+        GroupMembership.objects.filter(pk__in=pks).update(**changes)
+
+        counted = set(
+            GroupMembership.objects.filter(counted_members_q(), pk__in=pks).values_list('user_id', flat=True)
+        )
+        adjust_member_count(group.pk, len(counted) - len(was_counted))
+
+        activated, deactivated = counted - was_counted, was_counted - counted
+        if activated or deactivated:
+            memberships_changed.send(
+                sender=GroupMembership, group=group, activated=activated, deactivated=deactivated
+            )
+
+    return user_ids
+
+
+def _queue_notice(group, user_ids, notification_type, title, message):
+    if user_ids:
+        enqueue_fanout(
+            event_type='membership_bulk',
+            group=group,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            action_url=group.get_absolute_url(),
+            recipient_ids=user_ids,
+        )
+
+
+def bulk_approve(group, membership_ids, approved_by):
+    """Approve the pending requests among ``membership_ids``; returns how many"""
+    user_ids = _bulk_update(
+        group,
+        group.memberships.filter(pk__in=membership_ids, status='pending'),
+        status='active', approved_at=timezone.now(), approved_by=approved_by,
+    )
+    _queue_notice(
+        group, user_ids, 'member_approved',
+        f'Welcome to {group.name}!', f'Your request to join {group.name} has been approved.',
+    )
+    return len(user_ids)
+
+
+def bulk_remove(group, membership_ids):
+    """Deactivate the active memberships among ``membership_ids``, never the creator's"""
+    user_ids = _bulk_update(
+        group,
+        group.memberships.filter(pk__in=membership_ids, is_active=True).exclude(user_id=group.creator_id),
+        is_active=False,
+    )
+    _queue_notice(
+        group, user_ids, 'member_left',
+        f'Removed from {group.name}', f'You have been removed from the group {group.name}.',
+    )
+    return len(user_ids)
+
+
+def bulk_change_role(group, membership_ids, role):
+    """Give ``role`` to the active memberships among ``membership_ids``, except the creator's"""
+    if role not in ROLES:
+        raise ValueError(f'Unknown role {role!r}')
+
+    user_ids = _bulk_update(
+        group,
+        group.memberships.filter(pk__in=membership_ids, is_active=True)
+        .exclude(role=role).exclude(user_id=group.creator_id),
+        role=role,
+    )
+    _queue_notice(
+        group, user_ids, 'group_updated',
+        f'Your role in {group.name} changed', f'You are now a {role} of {group.name}.',
+    )
+    return len(user_ids)
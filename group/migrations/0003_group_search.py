@@ -0,0 +1,97 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:48
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+# A copy of group.search as of this migration, so later changes to the
+# app code don't change what the backfill writes
+WORD_RE = re.compile(r'\w+')
+
+KEYWORD_MAX_LENGTH = 100
+
+
+def normalize(text):
+    return ' '.join((text or '').casefold().split())
+
+
+def group_keywords(group):
+    keywords = {('name', word) for word in WORD_RE.findall(normalize(group.name))}
+    for tag in (group.tags or '').split(','):
+        tag = normalize(tag)
+        keywords.add(('tag', tag))
+        keywords.update(('tag', word) for word in WORD_RE.findall(tag))
+    return {(source, keyword[:KEYWORD_MAX_LENGTH]) for source, keyword in keywords if keyword}
+
+
+def backfill_group_search(apps, schema_editor):
+    Group = apps.get_model('group', 'Group')
+    GroupKeyword = apps.get_model('group', 'GroupKeyword')
+    GroupMembership = apps.get_model('group', 'GroupMembership')
+
+    Group.objects.update(member_count=Coalesce(
+        models.Subquery(
+            GroupMembership.objects.filter(group=models.OuterRef('pk'), is_active=True, status='active')
+            .values('group').annotate(n=models.Count('pk')).values('n')[:1]
+        ),
+        0,
+    ))
+
+    GroupKeyword.objects.bulk_create(
+        (
+            GroupKeyword(group_id=group.pk, source=source, keyword=keyword)
+            for group in Group.objects.only('pk', 'name', 'tags').iterator()
+            for source, keyword in group_keywords(group)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('group', '0002_groupmembership_is_deceased'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupKeyword',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=100)),
+                ('source', models.CharField(choices=[('name', 'Name'), ('tag', 'Tag')], max_length=10)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['privacy', '-last_activity'], name='group_browse_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='group',
+            index=models.Index(fields=['privacy', '-member_count', 'name'], name='group_popular_idx'),
+        ),
+        migrations.AddField(
+            model_name='groupkeyword',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='keywords', to='group.group'),
+        ),
+        migrations.AddIndex(
+            model_name='groupkeyword',
+            index=models.Index(fields=['keyword', 'group'], name='group_keyword_prefix_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='groupkeyword',
+            constraint=models.UniqueConstraint(fields=('group', 'source', 'keyword'), name='unique_group_keyword'),
+        ),
+        migrations.RunPython(backfill_group_search, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('group', '0003_group_search'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='groupmembership',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending Approval'), ('active', 'Active'), ('inactive', 'Inactive'), ('banned', 'Banned'), ('deceased', 'Deceased')], default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_existing_sent(apps, schema_editor):
+    # Invitations created before the send_invitations worker were emailed
+    # synchronously; don't queue them again
+    GroupInvitation = apps.get_model('group', 'GroupInvitation')
+    GroupInvitation.objects.update(delivery_status='sent')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('group', '0004_groupmembership_deceased_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupinvitation',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='groupinvitation',
+            name='delivery_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='groupinvitation',
+            name='delivery_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='groupinvitation',
+            name='delivery_status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='queued', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='groupinvitation',
+            name='sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='groupinvitation',
+            index=models.Index(fields=['delivery_status', 'created_at'], name='invitation_delivery_idx'),
+        ),
+        migrations.RunPython(mark_existing_sent, migrations.RunPython.noop),
+    ]
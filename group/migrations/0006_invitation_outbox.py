@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:14
+
+from django.db import migrations, models
+
+
+def queue_undelivered(apps, schema_editor):
+    # Invitations the old send_invitations worker had not sent yet are
+    # handed to the email outbox
+    from group.invitations import invitation_email
+
+    GroupInvitation = apps.get_model('group', 'GroupInvitation')
+    OutboxEmail = apps.get_model('notifications', 'OutboxEmail')
+
+    invitations = GroupInvitation.objects.filter(delivery_status__in=['queued', 'sending']).select_related('group')
+    OutboxEmail.objects.bulk_create([
+        OutboxEmail(**{
+            field: getattr(email, field)
+            for field in ['to', 'subject', 'body', 'html_body', 'from_email', 'category', 'reference']
+        })
+        for email in map(invitation_email, invitations.iterator())
+    ])
+    invitations.filter(delivery_status='sending').update(delivery_status='queued')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('group', '0005_groupinvitation_delivery'),
+        ('notifications', '0003_outboxemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(queue_undelivered, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='groupinvitation',
+            name='claimed_at',
+        ),
+        migrations.AlterField(
+            model_name='groupinvitation',
+            name='delivery_status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('sent', 'Sent'), ('failed', 'Failed')], default='queued', max_length=20),
+        ),
+    ]
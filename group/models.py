@@ -73,8 +73,17 @@ class Group(models.Model):
     last_activity = models.DateTimeField(auto_now_add=True)
     is_active     = models.BooleanField(default=True)
 
+    # Active members (is_active and status 'active'), kept up to date by
+    # the GroupMembership signals
+    member_count  = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Orderings of the discoverable groups (public, active), see group.search
+            models.Index(fields=['privacy', '-last_activity'], name='group_browse_idx'),
+            models.Index(fields=['privacy', '-member_count', 'name'], name='group_popular_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -89,15 +98,18 @@ class Group(models.Model):
                 slug = f"{base_slug}-{counter}"
                 counter += 1
             self.slug = slug
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # member_count is only changed with F() updates; writing back the
+            # value loaded with this instance would undo concurrent joins
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'member_count'
+            ]
         super().save(*args, **kwargs)
 
     def get_absolute_url(self):
         return reverse('group_detail', kwargs={'slug': self.slug})
 
-    @property
-    def member_count(self):
-        return self.memberships.filter(is_active=True).count() # type: ignore
-
     @property
     def is_full(self):
         if self.max_members:
@@ -110,8 +122,13 @@ class Group(models.Model):
             return [tag.strip() for tag in self.tags.split(',') if tag.strip()]
         return []
 
+    def role_for(self, user):
+        """The user's cached membership/admin status for this group"""
+        from .roles import get_group_role
+        return get_group_role(self, user)
+
     def is_admin(self, user):
-        return user == self.creator or user in self.admins.all()
+        return self.role_for(user).is_admin
     
     @property
     def members(self):
@@ -123,7 +140,7 @@ class Group(models.Model):
         )
 
     def is_member(self, user):
-        return self.memberships.filter(user=user, is_active=True).exists() # type: ignore
+        return self.role_for(user).is_member
 
     def can_join(self, user):
         """Check if user can join this group"""
@@ -142,6 +159,34 @@ class Group(models.Model):
         return True, "Can join"
 
 
+class GroupKeyword(models.Model):
+    """
+    A normalised search term of a group: each word of its name and each
+    of its comma-separated tags, casefolded. Indexed so that group search
+    and autocomplete are prefix range scans rather than LIKE '%q%' scans.
+    """
+
+    SOURCE_CHOICES = [
+        ('name', 'Name'),
+        ('tag', 'Tag'),
+    ]
+
+    group   = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='keywords')
+    keyword = models.CharField(max_length=100)
+    source  = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'source', 'keyword'], name='unique_group_keyword'),
+        ]
+        indexes = [
+            models.Index(fields=['keyword', 'group'], name='group_keyword_prefix_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.keyword} ({self.source})"
+
+
 class GroupMembership(models.Model):
     """Track group memberships"""
     
@@ -156,6 +201,7 @@ class GroupMembership(models.Model):
         ('active', 'Active'),
         ('inactive', 'Inactive'),
         ('banned', 'Banned'),
+        ('deceased', 'Deceased'),
     ]
     
     id       = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -181,10 +227,8 @@ class GroupMembership(models.Model):
 
     def approve(self, approved_by_user):
         """Approve membership"""
-        self.status = 'active'
-        self.approved_at = timezone.now()
-        self.approved_by = approved_by_user
-        self.save()
+        from .membership import approve
+        return approve(self, approved_by_user)
 
     def is_admin_or_creator(self):
         return (self.role in ['admin', 'moderator'] or 
@@ -200,6 +244,12 @@ class GroupInvitation(models.Model):
         ('declined', 'Declined'),
         ('expired', 'Expired'),
     ]
+
+    DELIVERY_STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
     
     id    = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     group = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='invitations')
@@ -214,9 +264,18 @@ class GroupInvitation(models.Model):
     expires_at   = models.DateTimeField()
     responded_at = models.DateTimeField(null=True, blank=True)
 
+    # Email delivery, reported by the email outbox (group.invitations)
+    delivery_status   = models.CharField(max_length=20, choices=DELIVERY_STATUS_CHOICES, default='queued')
+    delivery_attempts = models.PositiveSmallIntegerField(default=0)
+    delivery_error    = models.TextField(blank=True)
+    sent_at           = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         unique_together = ['group', 'invited_email']
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['delivery_status', 'created_at'], name='invitation_delivery_idx'),
+        ]
 
     def __str__(self):
         return f"Invitation to {self.group.name} for {self.invited_email}"
@@ -246,12 +305,15 @@ class GroupInvitation(models.Model):
             return False, "Invitation has expired"
         
         if self.invited_user:
-            # Create or update membership
-            membership, created = GroupMembership.objects.get_or_create(
-                group=self.group,
-                user=self.invited_user,
-                defaults={'status': 'active' if not self.group.requires_approval else 'pending'}
-            )
+            # Create the membership unless the user already has one
+            from .membership import join
+            if not GroupMembership.objects.filter(group=self.group, user=self.invited_user).exists():
+                join(
+                    self.group,
+                    self.invited_user,
+                    status='pending' if self.group.requires_approval else 'active',
+                    approved_by=self.invited_by,
+                )
             
             self.status = 'accepted'
             self.responded_at = timezone.now()
@@ -0,0 +1,73 @@
+# group/roles.py - Per-request resolution of a user's role in a group
+from collections import namedtuple
+
+
+GroupRole = namedtuple('GroupRole', ['is_member', 'is_admin', 'role', 'status'])
+
+NO_ROLE = GroupRole(is_member=False, is_admin=False, role=None, status=None)
+
+
+def request_cache(user, name):
+    """
+    Return a dict cached on the user object under ``name``.
+
+    ``request.user`` is rebuilt for every request, so anything stored here
+    lives exactly as long as the request that loaded it.
+    """
+    cache = getattr(user, name, None)
+    if cache is None:
+        cache = {}
+        setattr(user, name, cache)
+    return cache
+
+
+def get_group_role(group, user):
+    """
+    Resolve the user's membership, role and admin status for ``group``.
+
+    The first lookup for a group costs at most two queries; every later
+    is_member / is_admin / can_view / can_edit check for the same group
+    in the same request is answered from the cache.
+    """
+    if user is None or not user.is_authenticated:
+        return NO_ROLE
+
+    cache = request_cache(user, '_group_role_cache')
+    role = cache.get(group.pk)
+    if role is not None:
+        return role
+
+    from .models import GroupMembership
+
+    membership = GroupMembership.objects.filter(
+        group_id=group.pk,
+        user_id=user.pk
+    ).values('role', 'status', 'is_active').first()
+
+    is_admin = (
+        group.creator_id == user.pk or
+        group.admins.filter(pk=user.pk).exists()
+    )
+
+    role = GroupRole(
+        is_member=bool(membership and membership['is_active']),
+        is_admin=is_admin,
+        role=membership['role'] if membership else None,
+        status=membership['status'] if membership else None,
+    )
+    cache[group.pk] = role
+    return role
+
+
+def is_memorial_admin(memorial, user):
+    """Cached equivalent of ``Memorial.is_admin`` for the current request"""
+    if user is None or not user.is_authenticated:
+        return False
+
+    cache = request_cache(user, '_memorial_admin_cache')
+    if memorial.pk not in cache:
+        cache[memorial.pk] = (
+            memorial.created_by_id == user.pk or
+            memorial.family_admins.filter(pk=user.pk).exists()
+        )
+    return cache[memorial.pk]
@@ -0,0 +1,130 @@
+# group/search.py - Indexed group discovery
+"""
+Group names and tags are normalised into GroupKeyword rows (one per name
+word and per tag, casefolded), kept in step by the Group signals. A search
+word matches a group when it is a prefix of one of its keywords, which is
+an index range scan on GroupKeyword.keyword instead of the LIKE '%q%'
+table scans over name, description and tags.
+"""
+import re
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Group, GroupKeyword
+
+
+# Autocomplete results returned by group_search_suggestions
+SUGGESTION_LIMIT = 5
+
+# Above this many keyword matches, autocomplete walks groups in popularity
+# order probing their keywords instead of sorting every match
+SUGGESTION_CANDIDATE_LIMIT = 500
+
+# Shortest word worth a prefix lookup
+MIN_PREFIX_LENGTH = 2
+
+WORD_RE = re.compile(r'\w+')
+
+# Sorts after every character that can appear in a keyword, so
+# [prefix, prefix + PREFIX_END) is the range of keywords starting with prefix
+PREFIX_END = '\U0010ffff'
+
+KEYWORD_MAX_LENGTH = GroupKeyword._meta.get_field('keyword').max_length
+
+
+def normalize(text):
+    """Casefold ``text`` and collapse runs of whitespace"""
+    return ' '.join((text or '').casefold().split())
+
+
+def query_words(query):
+    return [word for word in WORD_RE.findall(normalize(query)) if len(word) >= MIN_PREFIX_LENGTH]
+
+
+def group_keywords(group):
+    """The (source, keyword) pairs indexed for ``group``"""
+    keywords = {('name', word) for word in WORD_RE.findall(normalize(group.name))}
+    for tag in (group.tags or '').split(','):
+        tag = normalize(tag)
+        keywords.add(('tag', tag))
+        # Multi-word tags are also findable by each of their words
+        keywords.update(('tag', word) for word in WORD_RE.findall(tag))
+    return {(source, keyword[:KEYWORD_MAX_LENGTH]) for source, keyword in keywords if keyword}
+
+
+def index_groups(groups):
+    """Rebuild the keyword rows of ``groups``"""
+    groups = list(groups)
+    with transaction.atomic():
+        GroupKeyword.objects.filter(group__in=groups).delete()
+        GroupKeyword.objects.bulk_create([
+            GroupKeyword(group=group, source=source, keyword=keyword)
+            for group in groups
+            for source, keyword in sorted(group_keywords(group))
+        ])
+
+
+def keyword_prefix_q(word):
+    return {'keyword__gte': word, 'keyword__lt': word + PREFIX_END}
+
+
+def search_groups(query, groups=None):
+    """
+    Groups from ``groups`` (default: all) with a keyword starting with
+    each word of ``query``. Words shorter than MIN_PREFIX_LENGTH are
+    ignored; a query without usable words matches nothing.
+    """
+    if groups is None:
+        groups = Group.objects.all()
+
+    words = query_words(query)
+    if not words:
+        return groups.none()
+
+    for word in words:
+        groups = groups.filter(
+            pk__in=GroupKeyword.objects.filter(**keyword_prefix_q(word)).values('group_id')
+        )
+    return groups
+
+
+def discoverable_groups():
+    """Groups listed in browse and autocomplete"""
+    return Group.objects.filter(is_active=True, privacy='public')
+
+
+def suggest_groups(query, limit=SUGGESTION_LIMIT):
+    """
+    Most popular discoverable groups matching ``query``, for autocomplete.
+
+    When any word is selective (few keyword matches) its matches are
+    fetched by primary key, filtered by the other words and sorted. When
+    every word is common ("fa") they can match a large share of all
+    groups; then groups are read in member_count order from
+    group_popular_idx and each is checked for matching keywords, which
+    stops as soon as ``limit`` are found.
+    """
+    words = query_words(query)
+    if not words:
+        return []
+
+    groups = discoverable_groups()
+    for word in sorted(words, key=len, reverse=True):
+        candidates = list(
+            GroupKeyword.objects.filter(**keyword_prefix_q(word))
+            .values_list('group_id', flat=True)[:SUGGESTION_CANDIDATE_LIMIT + 1]
+        )
+        if len(candidates) <= SUGGESTION_CANDIDATE_LIMIT:
+            groups = groups.filter(pk__in=set(candidates))
+            break
+
+    # Probed per group, so a common word never materialises all its matches
+    for word in words:
+        groups = groups.filter(Exists(
+            GroupKeyword.objects.filter(group=OuterRef('pk'), **keyword_prefix_q(word))
+        ))
+
+    # Categories are prefetched: joining the (small) category table makes
+    # SQLite give up the index order and sort every match
+    return list(groups.prefetch_related('category').order_by('-member_count', 'name')[:limit])
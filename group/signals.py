@@ -1,6 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
-from .models import Group
+from .membership import adjust_member_count, counts_as_member
+from .models import Group, GroupMembership
+from .search import index_groups
 from feeds.models import Feed
 
 
@@ -10,4 +12,42 @@ def create_group_feed(sender, instance, created, **kwargs):
     Automatically create a Feed object whenever a new Group is created.
     """
     if created:
-        Feed.objects.create(group=instance)
\ No newline at end of file
+        Feed.objects.create(group=instance)
+
+
+@receiver(post_init, sender=Group)
+def remember_group_keywords(sender, instance, **kwargs):
+    instance._indexed_text = (instance.name, instance.tags)
+
+
+@receiver(post_save, sender=Group)
+def group_search_index(sender, instance, created, **kwargs):
+    """Rebuild the group's search keywords when its name or tags change"""
+    if created or instance._indexed_text != (instance.name, instance.tags):
+        index_groups([instance])
+    instance._indexed_text = (instance.name, instance.tags)
+
+
+@receiver(post_init, sender=GroupMembership)
+def remember_member_counted(sender, instance, **kwargs):
+    instance._counted_member = counts_as_member(instance)
+
+
+@receiver(post_save, sender=GroupMembership)
+def membership_member_count(sender, instance, created, **kwargs):
+    """
+    Keep Group.member_count in step as members join, leave or are approved.
+    Inside a group.membership transition this runs in the transition's
+    transaction, against the row state read under its lock.
+    """
+    counted = counts_as_member(instance)
+    was_counted = instance._counted_member and not created
+    if counted != was_counted:
+        adjust_member_count(instance.group_id, 1 if counted else -1)
+    instance._counted_member = counted
+
+
+@receiver(post_delete, sender=GroupMembership)
+def membership_deleted_member_count(sender, instance, **kwargs):
+    if instance._counted_member:
+        adjust_member_count(instance.group_id, -1)
@@ -6,17 +6,20 @@ from django.contrib import messages
 from django.db.models import Q, Count
 from django.http import JsonResponse
 from django.core.paginator import Paginator
-from django.core.mail import send_mail
 from customuser.models import Profile
 from feeds.models import Feed
 from group.forms import GroupCreationForm, GroupInvitationForm, GroupJoinForm, GroupSearchForm, GroupEditForm, MarkDeceasedForm
+from . import membership as membership_service
 from .models import Group, GroupMembership, GroupInvitation, Category
+from .search import MIN_PREFIX_LENGTH, discoverable_groups, search_groups, suggest_groups
 from datetime import timezone
 from django.utils import timezone
 from django.shortcuts import get_object_or_404, render
 from django.http import HttpResponse
 from django.contrib.auth.decorators import login_required
+from django.template.defaultfilters import pluralize
 from django.template.loader import render_to_string
+import uuid
 
 
 
@@ -31,14 +34,7 @@ def create_group_view(request):
             group.save()
             
             # Auto-add creator as admin member
-            GroupMembership.objects.create(
-                group=group,
-                user=request.user,
-                role='admin',
-                status='active',
-                approved_at=timezone.now(),
-                approved_by=request.user
-            )
+            membership_service.join(group, request.user, role='admin', approved_by=request.user)
             
             messages.success(
                 request, 
@@ -56,9 +52,7 @@ def create_group_view(request):
 
 def browse_groups_view(request):
     """Browse and search groups"""
-    groups = Group.objects.filter(is_active=True, privacy='public').annotate(
-        num_members=Count('memberships', filter=Q(memberships__is_active=True))
-    )
+    groups = discoverable_groups().prefetch_related('category')
     
     # Search functionality
     search_form = GroupSearchForm(request.GET)
@@ -68,11 +62,8 @@ def browse_groups_view(request):
         city = search_form.cleaned_data.get('city')
         
         if query:
-            groups = groups.filter(
-                Q(name__icontains=query) |
-                Q(description__icontains=query) |
-                Q(tags__icontains=query)
-            )
+            # Prefix match on name words and tags, see group.search
+            groups = search_groups(query, groups)
         
         if category:
             groups = groups.filter(category=category)
@@ -89,7 +80,8 @@ def browse_groups_view(request):
         'groups': page_groups,
         'search_form': search_form,
         'categories': Category.objects.filter(is_active=True),
-        'total_results': groups.count(),
+        # Already counted by the paginator
+        'total_results': paginator.count,
     }
     
     return render(request, 'group/browse_groups.html', context)
@@ -149,13 +141,12 @@ def join_group_view(request, slug):
 
             status = 'pending' if group.requires_approval else 'active'
 
-            membership = GroupMembership.objects.create(
-                group=group,
-                user=request.user,
+            membership_service.join(
+                group,
+                request.user,
                 status=status,
                 join_message=join_message,
-                approved_at=timezone.now() if status == 'active' else None,  # type: ignore
-                approved_by=group.creator if status == 'active' else None,
+                approved_by=group.creator,
             )
 
             if status == 'active':
@@ -195,9 +186,6 @@ def my_groups_view(request):
             creator=request.user,
             is_active=True
         )
-        .annotate(
-            num_members=Count("memberships", filter=Q(memberships__is_active=True))
-        )
     )
 
     # Build unified list
@@ -255,8 +243,7 @@ def leave_group_view(request, slug):
             return redirect('group_detail', slug=slug)
         
         if request.method == 'POST':
-            membership.is_active = False
-            membership.save()
+            membership_service.leave(membership)
             
             messages.success(request, f'You have left {group.name}.')
             return redirect('my_groups')
@@ -277,23 +264,15 @@ def group_search_suggestions(request):
     query = request.GET.get('q', '').strip()
     suggestions = []
     
-    if len(query) >= 2:
-        groups = Group.objects.filter(
-            Q(name__icontains=query) | Q(tags__icontains=query),
-            is_active=True,
-            privacy='public'
-        ).annotate(
-            num_members=Count('memberships', filter=Q(memberships__is_active=True))
-        )[:5]
-        
+    if len(query) >= MIN_PREFIX_LENGTH:
         suggestions = [
             {
                 'name': group.name,
                 'slug': group.slug,
-                'member_count': group.num_members, # type: ignore
+                'member_count': group.member_count,
                 'category': group.category.name if group.category else None,
             }
-            for group in groups
+            for group in suggest_groups(query)
         ]
     
     return JsonResponse({'suggestions': suggestions})
@@ -310,21 +289,8 @@ def approve_member_view(request, slug, membership_id):
         return redirect('group_detail', slug=slug)
     
     if request.method == 'POST':
-        if membership.status == 'pending':
-            membership.approve(request.user)
-            
-            # Send notification email to the user
-            try:
-                send_mail(
-                    subject=f'Welcome to {group.name}!',
-                    message=f'Your request to join {group.name} has been approved.',
-                    from_email=None,  # Use DEFAULT_FROM_EMAIL
-                    recipient_list=[membership.user.email],
-                    fail_silently=True,
-                )
-            except:
-                pass  # Don't fail if email sending fails
-            
+        # Also queues the welcome notification and email
+        if membership_service.bulk_approve(group, [membership.pk], request.user):
             messages.success(request, f'{membership.user.profile.full_name or membership.user.email} has been approved!')
         else:
             messages.info(request, 'This member has already been processed.')
@@ -343,8 +309,7 @@ def reject_member_view(request, slug, membership_id):
         return redirect('group_detail', slug=slug)
     
     if request.method == 'POST':
-        if membership.status == 'pending':
-            membership.delete()
+        if membership_service.reject(membership):
             messages.success(request, 'Member request has been rejected.')
         else:
             messages.info(request, 'This member has already been processed.')
@@ -369,20 +334,8 @@ def remove_member_view(request, slug, membership_id):
     
     if request.method == 'POST':
         user_name = membership.user.profile.full_name or membership.user.email
-        membership.is_active = False
-        membership.save()
-        
-        # Send notification email
-        try:
-            send_mail(
-                subject=f'Removed from {group.name}',
-                message=f'You have been removed from the group {group.name}.',
-                from_email=None,
-                recipient_list=[membership.user.email],
-                fail_silently=True,
-            )
-        except:
-            pass
+        # Also queues the notification and email to the member
+        membership_service.bulk_remove(group, [membership.pk])
         
         messages.success(request, f'{user_name} has been removed from the group.')
     
@@ -406,10 +359,9 @@ def change_member_role_view(request, slug, membership_id):
     
     if request.method == 'POST':
         new_role = request.POST.get('role')
-        if new_role in ['member', 'moderator', 'admin']:
+        if new_role in membership_service.ROLES:
             old_role = membership.role
-            membership.role = new_role
-            membership.save()
+            membership_service.change_role(membership, new_role)
             
             user_name = membership.user.profile.full_name or membership.user.email
             messages.success(
@@ -423,6 +375,50 @@ def change_member_role_view(request, slug, membership_id):
 
 
 
+@login_required
+def bulk_member_action_view(request, slug):
+    """Approve, remove or change the role of several members at once"""
+    group = get_object_or_404(Group, slug=slug, is_active=True)
+    
+    if not group.is_admin(request.user):
+        messages.error(request, "You don't have permission to manage members.")
+        return redirect('group_detail', slug=slug)
+    
+    if request.method != 'POST':
+        return redirect('group_manage_members', slug=slug)
+    
+    action = request.POST.get('action', '')
+    membership_ids = request.POST.getlist('memberships')
+    if not membership_ids:
+        messages.error(request, "Select at least one member.")
+        return redirect('group_manage_members', slug=slug)
+    
+    try:
+        membership_ids = [uuid.UUID(pk) for pk in membership_ids]
+    except ValueError:
+        messages.error(request, "Invalid member selection.")
+        return redirect('group_manage_members', slug=slug)
+    
+    if action == 'approve':
+        count = membership_service.bulk_approve(group, membership_ids, request.user)
+        messages.success(request, f'{count} member{pluralize(count)} approved.')
+    elif action == 'remove':
+        count = membership_service.bulk_remove(group, membership_ids)
+        messages.success(request, f'{count} member{pluralize(count)} removed.')
+    elif action.startswith('role:') and action[5:] in membership_service.ROLES:
+        role = action[5:]
+        # Only creator can assign admin roles
+        if role == 'admin' and request.user != group.creator:
+            messages.error(request, "Only the group creator can assign admin roles.")
+            return redirect('group_manage_members', slug=slug)
+        count = membership_service.bulk_change_role(group, membership_ids, role)
+        messages.success(request, f'{count} member{pluralize(count)} changed to {role}.')
+    else:
+        messages.error(request, "Invalid action specified.")
+    
+    return redirect('group_manage_members', slug=slug)
+
+
 # In your views.py (or wherever mark_deceased_view is located)
 from django.shortcuts import get_object_or_404
 from django.http import HttpResponse
@@ -456,11 +452,7 @@ def mark_deceased_view(request, slug, pk):
             profile.save()
 
             # Update the membership status
-            membership.status = 'deceased'
-            membership.is_active = False
-            membership.can_post = False
-            membership.can_comment = False
-            membership.save()
+            membership_service.mark_deceased(membership)
 
             # Re-render the table row partial
             html = render_to_string(
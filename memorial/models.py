@@ -53,4 +53,5 @@ class Memorial(models.Model):
     
 
     def is_admin(self, user):
-        return user == self.created_by or user in self.family_admins.all()
+        from group.roles import is_memorial_admin
+        return is_memorial_admin(self, user)
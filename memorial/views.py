@@ -84,11 +84,7 @@ def memorial_detail_view(request, pk):
     group = memorial.associated_group
     
     # Permission check: Group members or public access
-    is_member = GroupMembership.objects.filter(
-        group=group,
-        user=request.user,
-        is_active=True
-    ).exists()
+    is_member = group.is_member(request.user)
     
     is_admin = memorial.is_admin(request.user)
     
@@ -221,11 +217,7 @@ def group_memorials_list_view(request, slug):
     group = get_object_or_404(Group, slug=slug)
     
     # Check if user is a member
-    is_member = GroupMembership.objects.filter(
-        group=group,
-        user=request.user,
-        is_active=True
-    ).exists()
+    is_member = group.is_member(request.user)
     
     if not is_member:
         # Show only public memorials for non-members
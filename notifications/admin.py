@@ -11,7 +11,9 @@ from .models import (
     NotificationPreference, 
     NotificationTemplate, 
     NotificationDeliveryLog,
-    NotificationBatch
+    NotificationBatch,
+    NotificationFanout,
+    OutboxEmail
 )
 
 
@@ -26,6 +28,7 @@ class DeliveryStatusFilter(SimpleListFilter):
             ('sent', 'Sent'),
             ('delivered', 'Delivered'),
             ('failed', 'Failed'),
+            ('skipped', 'Skipped'),
             ('read', 'Read'),
         )
 
@@ -213,7 +216,8 @@ class NotificationAdmin(admin.ModelAdmin):
         """Reset failed notifications for resending"""
         updated = queryset.filter(status='failed').update(
             status='pending',
-            sent_at=None
+            sent_at=None,
+            claimed_at=None
         )
         self.message_user(request, f'{updated} notifications reset for resending.')
     resend_notifications.short_description = "Reset failed notifications for resending"
@@ -535,4 +539,116 @@ class NotificationBatchAdmin(admin.ModelAdmin):
             '<span style="font-weight: bold; color: {}; padding: 2px 6px;">{:.0f}%</span>',
             color, percent
         )
-    progress_display.short_description = "Progress"
\ No newline at end of file
+    progress_display.short_description = "Progress"
+
+
+@admin.register(NotificationFanout)
+class NotificationFanoutAdmin(admin.ModelAdmin):
+    list_display = [
+        'event_type',
+        'group',
+        'notification_type',
+        'status_badge',
+        'created_count',
+        'attempts',
+        'created_at',
+        'completed_at'
+    ]
+
+    list_filter = [
+        'status',
+        'event_type',
+        'created_at'
+    ]
+
+    search_fields = [
+        'title',
+        'group__name'
+    ]
+
+    readonly_fields = [
+        'id',
+        'created_at',
+        'started_at',
+        'heartbeat_at',
+        'completed_at',
+        'last_recipient_id',
+        'created_count',
+        'attempts',
+        'error_message'
+    ]
+
+    def status_badge(self, obj):
+        colors = {
+            'pending': '#ffc107',
+            'processing': '#17a2b8',
+            'completed': '#28a745',
+            'failed': '#dc3545'
+        }
+        color = colors.get(obj.status, '#6c757d')
+        return format_html(
+            '<span style="background-color: {}; color: white; padding: 3px 8px; '
+            'border-radius: 3px; font-size: 11px;">{}</span>',
+            color, obj.get_status_display()
+        )
+    status_badge.short_description = 'Status'
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = [
+        'subject',
+        'recipients',
+        'category',
+        'status_badge',
+        'attempts',
+        'created_at',
+        'sent_at'
+    ]
+
+    list_filter = [
+        'status',
+        'category',
+        'created_at'
+    ]
+
+    search_fields = [
+        'subject',
+        'reference'
+    ]
+
+    readonly_fields = [
+        'id',
+        'created_at',
+        'claimed_at',
+        'sent_at',
+        'attempts',
+        'last_error'
+    ]
+
+    actions = ['retry_emails']
+
+    def recipients(self, obj):
+        return ', '.join(obj.to)
+
+    def status_badge(self, obj):
+        colors = {
+            'pending': '#ffc107',
+            'sending': '#17a2b8',
+            'sent': '#28a745',
+            'failed': '#dc3545'
+        }
+        color = colors.get(obj.status, '#6c757d')
+        return format_html(
+            '<span style="background-color: {}; color: white; padding: 3px 8px; '
+            'border-radius: 3px; font-size: 11px;">{}</span>',
+            color, obj.get_status_display()
+        )
+    status_badge.short_description = 'Status'
+
+    def retry_emails(self, request, queryset):
+        updated = queryset.filter(status='failed').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{updated} emails queued for another attempt.')
+    retry_emails.short_description = 'Retry failed emails'
@@ -0,0 +1,121 @@
+# notifications/coalesce.py - Rolling notifications for repeated events
+"""
+Events that pile up on one object (comments on a post, likes) are folded
+into a single rolling notification per recipient, found through
+Notification.group_key (e.g. 'post:<id>:comments'). While a recipient's
+rolling notification is unread, each new event updates it in place
+instead of inserting a row: its actors, count and text ("12 people
+commented on your post") change, and created_at moves to now so it
+comes back to the top. Once it has been read, the next event starts a
+new one.
+
+A batch of recipients costs one SELECT, one bulk UPDATE and one
+bulk INSERT, whatever its size.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification
+
+
+# Actor names kept for the message text ("Ann, Ben and 10 others ...")
+ACTOR_NAMES_SHOWN = 2
+
+
+def group_key(obj, event):
+    """The group_key of ``event`` notifications about ``obj``, e.g. 'post:<id>:comments'"""
+    return f'{obj._meta.model_name}:{obj.pk}:{event}'
+
+
+def actors_text(names, count):
+    """'Ann', 'Ann and Ben', 'Ann, Ben and 3 others'"""
+    names = names[:ACTOR_NAMES_SHOWN]
+    others = count - len(names)
+    if others <= 0:
+        return ' and '.join(names)
+    return f"{', '.join(names)} and {others} other{'s' if others != 1 else ''}"
+
+
+def coalesce_notification(recipient_ids, key, notification_type, actor, actor_name, verb,
+                          title, message, related_object=None, action_url=None,
+                          priority='normal', data=None):
+    """
+    Record an event by ``actor`` for each of ``recipient_ids`` under
+    ``key``: update their unread notification with that key, or create
+    one.
+
+    A notification with a single actor reads ``title`` / ``message``; with
+    several, "<n> people <verb>" / "<actors> <verb>".
+
+    Returns (created, updated).
+    """
+    recipient_ids = set(recipient_ids)
+    if not recipient_ids:
+        return 0, 0
+
+    now = timezone.now()
+    data = dict(data or {})
+
+    content_type = None
+    object_id = None
+    if related_object is not None:
+        content_type = ContentType.objects.get_for_model(related_object)
+        object_id = str(related_object.pk)
+
+    with transaction.atomic():
+        rolling = {}
+        for notification in (
+            Notification.objects.select_for_update()
+            .filter(group_key=key, recipient_id__in=recipient_ids, read_at__isnull=True)
+            .order_by('created_at')
+        ):
+            # If there are several (a race), the newest one rolls on
+            rolling[notification.recipient_id] = notification
+
+        for notification in rolling.values():
+            actor_ids = notification.data.get('actor_ids', [])
+            names = notification.data.get('actor_names', [])
+            if actor.pk not in actor_ids:
+                actor_ids.append(actor.pk)
+            names = [actor_name] + [name for name in names if name != actor_name]
+            count = len(actor_ids)
+
+            notification.data = {
+                **notification.data,
+                **data,
+                'actor_ids': actor_ids,
+                'actor_names': names[:ACTOR_NAMES_SHOWN],
+                'event_count': notification.data.get('event_count', 1) + 1,
+            }
+            if count > 1:
+                notification.title = f'{count} people {verb}'
+                notification.message = f'{actors_text(names, count)} {verb}'
+            else:
+                notification.title = title
+                notification.message = message
+            notification.action_url = action_url or notification.action_url
+            notification.created_at = now
+
+        Notification.objects.bulk_update(
+            list(rolling.values()), ['title', 'message', 'data', 'action_url', 'created_at']
+        )
+
+        created = Notification.objects.bulk_create([
+            Notification(
+                recipient_id=recipient_id,
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                content_type=content_type,
+                object_id=object_id,
+                action_url=action_url,
+                priority=priority,
+                group_key=key,
+                created_at=now,
+                data={**data, 'actor_ids': [actor.pk], 'actor_names': [actor_name], 'event_count': 1},
+            )
+            for recipient_id in recipient_ids - rolling.keys()
+        ])
+
+    return len(created), len(rolling)
@@ -0,0 +1,258 @@
+# notifications/delivery.py - Delivery of pending notifications
+"""
+The deliver_notifications worker sends pending Notification rows. Each
+batch is claimed, split by delivery_method and handed to its channel:
+
+- in_app needs nothing more than being marked sent;
+- email is rendered and queued in the outbox (notifications.outbox), whose
+  worker owns the SMTP connections and logs the delivery;
+- sms and push go to their provider from a bounded thread pool per
+  channel, so the channels' requests overlap and no provider receives
+  more concurrent requests than its pool allows.
+
+Everything touching the database (claiming, preferences, rendering,
+recording outcomes) runs on the worker's own thread; the pool threads
+only talk to providers. Outcomes are written with one UPDATE per status
+and one bulk_create of NotificationDeliveryLog rows per batch.
+"""
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Notification, NotificationDeliveryLog
+from .outbox import queue_emails
+from .preferences import delivery_decision, preload_preferences
+from .utils import NotificationService, send_push_message, send_sms_message
+
+
+# Notifications claimed per worker poll
+DELIVERY_BATCH_SIZE = getattr(settings, 'NOTIFICATION_DELIVERY_BATCH_SIZE', 200)
+
+# A claimed notification that is still pending after this long is handed
+# out again: its worker crashed, or it was held back for quiet hours
+DELIVERY_LEASE = timedelta(seconds=getattr(settings, 'NOTIFICATION_DELIVERY_LEASE_SECONDS', 300))
+
+# Provider requests in flight at once, per channel
+CHANNEL_CONCURRENCY = {
+    'sms': 4,
+    'push': 8,
+    **getattr(settings, 'NOTIFICATION_CHANNEL_CONCURRENCY', {}),
+}
+
+
+def _render_sms(notification):
+    phone_number, message = NotificationService.render_sms(notification)
+    return lambda: send_sms_message(phone_number, message)
+
+
+def _render_push(notification):
+    title, body = NotificationService.render_push(notification)
+    return lambda: send_push_message(notification.recipient_id, title, body, notification.action_url)
+
+
+# delivery_method -> callable(notification) rendering it (on the worker's
+# thread) into a provider call made from the channel's pool
+PROVIDER_CHANNELS = {
+    'sms': _render_sms,
+    'push': _render_push,
+}
+
+
+def claim_notifications(limit=DELIVERY_BATCH_SIZE):
+    """
+    Lease up to ``limit`` pending notifications to this worker.
+
+    Where the database supports it the candidates are locked with
+    SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers pass over
+    each other's rows instead of waiting. Elsewhere (SQLite) the batch is
+    claimed with one conditional UPDATE stamped with this worker's claim
+    time, and only the rows carrying that stamp belong to it.
+    """
+    now = timezone.now()
+    claimable = Q(status='pending') & (Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - DELIVERY_LEASE))
+    candidates = Notification.objects.filter(claimable).order_by('created_at').values_list('id', flat=True)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(candidates.select_for_update(skip_locked=True)[:limit])
+            Notification.objects.filter(pk__in=ids).update(claimed_at=now)
+    else:
+        ids = list(candidates[:limit])
+        Notification.objects.filter(claimable, pk__in=ids).update(claimed_at=now)
+
+    if not ids:
+        return []
+    return list(
+        Notification.objects.filter(pk__in=ids, status='pending', claimed_at=now)
+        .select_related('recipient')
+        .order_by('created_at')
+    )
+
+
+class ChannelStats:
+    """Outcome counts of one channel and the time of the batches they came from"""
+
+    def __init__(self):
+        self.sent = self.failed = self.skipped = self.deferred = 0
+        self.seconds = 0.0
+
+    def add(self, other):
+        self.sent += other.sent
+        self.failed += other.failed
+        self.skipped += other.skipped
+        self.deferred += other.deferred
+        self.seconds += other.seconds
+
+    @property
+    def throughput(self):
+        return self.sent / self.seconds if self.seconds else 0.0
+
+
+class DeliveryWorker:
+    """
+    Delivers claimed batches, keeping one thread pool per provider
+    channel for its lifetime.
+    """
+
+    def __init__(self, concurrency=None):
+        self.concurrency = {**CHANNEL_CONCURRENCY, **(concurrency or {})}
+        self.pools = {}
+
+    def pool(self, channel):
+        if channel not in self.pools:
+            self.pools[channel] = ThreadPoolExecutor(
+                max_workers=max(self.concurrency.get(channel, 1), 1),
+                thread_name_prefix=f'notify-{channel}',
+            )
+        return self.pools[channel]
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.shutdown()
+        self.pools = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def deliver_batch(self, limit=DELIVERY_BATCH_SIZE):
+        """
+        Claim and deliver one batch. Returns {channel: ChannelStats},
+        empty when nothing was pending.
+        """
+        notifications = claim_notifications(limit)
+        if not notifications:
+            return {}
+
+        started = time.monotonic()
+        stats = defaultdict(ChannelStats)
+        sent, failed, skipped = [], [], []
+        logs = []
+        now = timezone.now()
+
+        def fail(notification, error):
+            failed.append(notification.pk)
+            stats[notification.delivery_method].failed += 1
+            logs.append(NotificationDeliveryLog(
+                notification=notification,
+                delivery_method=notification.delivery_method,
+                status='failed',
+                error_message=str(error)[:1000],
+                attempted_at=now,
+            ))
+
+        # Preferences and rendering, on this thread
+        preferences = preload_preferences({notification.recipient_id for notification in notifications}, now)
+        calls, emails = [], []
+        for notification in notifications:
+            channel = notification.delivery_method
+            try:
+                decision = delivery_decision(preferences[notification.recipient_id], notification)
+                if decision == 'skip':
+                    skipped.append(notification.pk)
+                    stats[channel].skipped += 1
+                elif decision == 'later':
+                    # Keeps its lease and comes back when it runs out
+                    stats[channel].deferred += 1
+                elif channel == 'in_app':
+                    sent.append(notification.pk)
+                    stats[channel].sent += 1
+                elif channel == 'email':
+                    emails.append((notification, NotificationService.render_email(notification)))
+                elif channel in PROVIDER_CHANNELS:
+                    calls.append((notification, PROVIDER_CHANNELS[channel](notification)))
+                else:
+                    raise ValueError(f'No delivery channel for {channel!r}')
+            except Exception as e:
+                fail(notification, e)
+
+        futures = [
+            (notification, self.pool(notification.delivery_method).submit(call))
+            for notification, call in calls
+        ]
+
+        for notification, _ in emails:
+            sent.append(notification.pk)
+            stats['email'].sent += 1
+
+        for notification, future in futures:
+            try:
+                external_id = future.result()
+            except Exception as e:
+                fail(notification, e)
+            else:
+                sent.append(notification.pk)
+                stats[notification.delivery_method].sent += 1
+                logs.append(NotificationDeliveryLog(
+                    notification=notification,
+                    delivery_method=notification.delivery_method,
+                    status='success',
+                    attempted_at=now,
+                    delivered_at=timezone.now(),
+                    external_id=external_id or '',
+                ))
+
+        # Emails are queued with the status change, so a crash in between
+        # cannot queue them twice. A notification read in the meantime
+        # stays read.
+        with transaction.atomic():
+            queue_emails([email for _, email in emails])
+            pending = Notification.objects.filter(status='pending')
+            pending.filter(pk__in=sent).update(status='sent', sent_at=timezone.now(), claimed_at=None)
+            pending.filter(pk__in=failed).update(status='failed', claimed_at=None)
+            pending.filter(pk__in=skipped).update(status='skipped', claimed_at=None)
+            NotificationDeliveryLog.objects.bulk_create(logs)
+
+        elapsed = time.monotonic() - started
+        for channel_stats in stats.values():
+            channel_stats.seconds = elapsed
+        return dict(stats)
+
+
+def delivery_metrics(window=timedelta(hours=1)):
+    """Pending backlog and recent sends per channel, for deliver_notifications --stats"""
+    since = timezone.now() - window
+    pending = Counter(dict(
+        Notification.objects.filter(status='pending')
+        .values_list('delivery_method').annotate(n=Count('pk')).order_by()
+    ))
+    sent = Counter(dict(
+        Notification.objects.filter(sent_at__gte=since)
+        .values_list('delivery_method').annotate(n=Count('pk')).order_by()
+    ))
+    return {
+        channel: {
+            'pending': pending[channel],
+            'sent_recently': sent[channel],
+            'throughput': sent[channel] / window.total_seconds(),
+        }
+        for channel, _ in Notification.DELIVERY_METHODS
+    }
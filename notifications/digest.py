@@ -0,0 +1,133 @@
+# notifications/digest.py - Hourly and daily notification digests
+"""
+Users whose digest_frequency is hourly or daily get no email per
+notification (their preference mask has no email bits). Instead,
+send_digests periodically gathers each subscriber's unread notifications
+since their last digest and queues one outbox email summarising them.
+Only types the subscriber would get by email are included: the same
+per-type columns as for immediate email (notifications.preferences).
+Rolling notifications (notifications.coalesce) appear once with their
+count.
+
+Subscribers are handled in chunks: one query for their preferences, one
+for their notifications, one bulk insert of emails and one UPDATE of
+last_digest_at per chunk.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Notification, NotificationPreference
+from .outbox import outbox_email, queue_emails
+from .preferences import BITS, compile_mask, preference_values
+
+
+DIGEST_PERIODS = {
+    'hourly': timedelta(hours=1),
+    'daily': timedelta(days=1),
+}
+
+# Notifications listed in one digest; the rest are summed up in a line
+DIGEST_MAX_ITEMS = getattr(settings, 'NOTIFICATION_DIGEST_MAX_ITEMS', 20)
+
+DIGEST_CHUNK_SIZE = 500
+
+
+def due_subscribers(frequency, now):
+    """Preferences of ``frequency`` subscribers whose last digest is at least a period old"""
+    period = DIGEST_PERIODS[frequency]
+    return NotificationPreference.objects.filter(
+        Q(last_digest_at__isnull=True) | Q(last_digest_at__lte=now - period),
+        digest_frequency=frequency,
+        email_notifications_enabled=True,
+    ).exclude(user__email='')
+
+
+def digest_mask(preferences):
+    """
+    The preference mask of a digest subscriber as if they took email
+    immediately, so its email bits say which types they want at all
+    """
+    return compile_mask({**preference_values(preferences), 'digest_frequency': 'immediate'})
+
+
+def digest_email(user, notifications, total, frequency):
+    """The unsaved OutboxEmail of one user's digest"""
+    context = {
+        'user': user,
+        'notifications': notifications,
+        'more': total - len(notifications),
+        'total': total,
+        'frequency': frequency,
+        'site_name': getattr(settings, 'SITE_NAME', 'Our Site'),
+        'site_url': getattr(settings, 'SITE_URL', 'http://localhost:8000').rstrip('/'),
+    }
+    return outbox_email(
+        to=user.email,
+        subject=f"{total} new notification{'s' if total != 1 else ''} from {context['site_name']}",
+        body=render_to_string('notifications/emails/digest.txt', context),
+        html_body=render_to_string('notifications/emails/digest.html', context),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        category='digest',
+        reference=user.pk,
+    )
+
+
+def send_digests(frequency, now=None, chunk_size=DIGEST_CHUNK_SIZE):
+    """
+    Queue the due ``frequency`` digests. Subscribers with nothing new get
+    no email but their last_digest_at still moves on.
+    Returns (digests queued, subscribers processed).
+    """
+    now = now or timezone.now()
+    period = DIGEST_PERIODS[frequency]
+    queued = processed = 0
+
+    subscribers = due_subscribers(frequency, now).select_related('user').order_by('pk')
+    last_pk = 0
+    while True:
+        chunk = list(subscribers.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            break
+        last_pk = chunk[-1].pk
+
+        since = {
+            preferences.user_id: preferences.last_digest_at or now - period
+            for preferences in chunk
+        }
+        masks = {preferences.user_id: digest_mask(preferences) for preferences in chunk}
+        unread = defaultdict(list)
+        for notification in (
+            Notification.objects.filter(
+                recipient_id__in=since,
+                read_at__isnull=True,
+                created_at__gt=min(since.values()),
+                created_at__lte=now,
+            ).order_by('-created_at')
+        ):
+            if notification.created_at <= since[notification.recipient_id]:
+                continue
+            if masks[notification.recipient_id] & BITS.get((notification.notification_type, 'email'), 0):
+                unread[notification.recipient_id].append(notification)
+
+        emails = [
+            digest_email(preferences.user, unread[preferences.user_id][:DIGEST_MAX_ITEMS],
+                         len(unread[preferences.user_id]), frequency)
+            for preferences in chunk
+            if unread[preferences.user_id]
+        ]
+        with transaction.atomic():
+            queue_emails(emails)
+            NotificationPreference.objects.filter(pk__in=[preferences.pk for preferences in chunk]).update(
+                last_digest_at=now
+            )
+
+        queued += len(emails)
+        processed += len(chunk)
+
+    return queued, processed
@@ -0,0 +1,247 @@
+# notifications/fanout.py - Asynchronous fan-out of group events
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Avg, F, Min, Q, Sum
+from django.utils import timezone
+
+from .models import Notification, NotificationFanout
+
+
+# Recipients written per bulk_create / transaction
+FANOUT_CHUNK_SIZE = getattr(settings, 'NOTIFICATION_FANOUT_CHUNK_SIZE', 500)
+
+# A fan-out left in 'processing' longer than this is assumed to belong to a
+# crashed worker and is handed out again (it resumes from its cursor)
+FANOUT_LEASE = timedelta(seconds=getattr(settings, 'NOTIFICATION_FANOUT_LEASE_SECONDS', 300))
+
+FANOUT_MAX_ATTEMPTS = 5
+
+# event_type -> callable(fanout, recipient_ids, now) writing one chunk.
+# Events without a registered handler become notifications.
+FANOUT_HANDLERS = {}
+
+
+def register_fanout_handler(event_type, handler):
+    """
+    Let another app reuse the fan-out queue for its own per-member rows
+    (e.g. feeds' home timeline). The handler is called inside the chunk's
+    transaction, so it must not commit on its own.
+    """
+    FANOUT_HANDLERS[event_type] = handler
+
+
+def enqueue_fanout(event_type, group, notification_type, title, message,
+                   related_object=None, action_url=None, priority='normal',
+                   data=None, exclude_user=None, recipient_ids=None):
+    """
+    Queue a fan-out of one notification to every active member of ``group``,
+    or to the users in ``recipient_ids`` when given (e.g. the members a
+    bulk admin action applied to, who may no longer be active).
+
+    The row is written when the surrounding transaction commits, so the
+    request that triggered the event only pays for a single INSERT.
+    """
+    content_type = None
+    object_id = None
+    if related_object is not None:
+        content_type = ContentType.objects.get_for_model(related_object)
+        object_id = str(related_object.pk)
+
+    data = dict(data or {})
+    if recipient_ids is not None:
+        data['recipient_ids'] = sorted(recipient_ids)
+
+    def _create():
+        NotificationFanout.objects.create(
+            event_type=event_type,
+            group=group,
+            exclude_user=exclude_user,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            priority=priority,
+            content_type=content_type,
+            object_id=object_id,
+            action_url=action_url,
+            data=data,
+        )
+
+    transaction.on_commit(_create)
+
+
+def expire_fanouts(now=None):
+    """
+    Fail fan-outs whose lease ran out on their last attempt.
+
+    claim_fanouts will not hand them out again, so without this they
+    would stay 'processing' forever.
+    Returns the number of fan-outs failed.
+    """
+    now = now or timezone.now()
+    return NotificationFanout.objects.filter(
+        status='processing',
+        heartbeat_at__lt=now - FANOUT_LEASE,
+        attempts__gte=FANOUT_MAX_ATTEMPTS,
+    ).update(
+        status='failed',
+        error_message='Worker stopped before the fan-out finished',
+    )
+
+
+def claim_fanouts(limit=10):
+    """
+    Claim up to ``limit`` pending (or abandoned) fan-outs for this worker.
+
+    Each row is claimed with a conditional UPDATE so two workers never
+    process the same fan-out.
+    """
+    now = timezone.now()
+    claimable = (
+        Q(status='pending') | Q(status='processing', heartbeat_at__lt=now - FANOUT_LEASE)
+    ) & Q(attempts__lt=FANOUT_MAX_ATTEMPTS)
+
+    candidate_ids = list(
+        NotificationFanout.objects.filter(claimable)
+        .order_by('created_at')
+        .values_list('id', flat=True)[:limit]
+    )
+
+    claimed = [
+        fanout_id for fanout_id in candidate_ids
+        if NotificationFanout.objects.filter(claimable, pk=fanout_id).update(
+            status='processing',
+            started_at=now,
+            heartbeat_at=now,
+            attempts=F('attempts') + 1,
+        )
+    ]
+
+    return list(NotificationFanout.objects.filter(pk__in=claimed).select_related('group'))
+
+
+def write_notifications(fanout, recipient_ids, now):
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=recipient_id,
+            notification_type=fanout.notification_type,
+            title=fanout.title,
+            message=fanout.message,
+            priority=fanout.priority,
+            content_type_id=fanout.content_type_id,
+            object_id=fanout.object_id,
+            action_url=fanout.action_url,
+            data=fanout.data,
+            created_at=now,
+        )
+        for recipient_id in recipient_ids
+    ])
+
+
+def process_fanout(fanout, chunk_size=None):
+    """
+    Materialise the rows (notifications by default) for one claimed fan-out.
+
+    Recipients are read in primary key order in chunks; every chunk is
+    written with a single bulk_create and the cursor is advanced in the
+    same transaction, so a crash never duplicates or skips a recipient.
+    Returns the number of rows created.
+    """
+    chunk_size = chunk_size or FANOUT_CHUNK_SIZE
+    created = 0
+    write_chunk = FANOUT_HANDLERS.get(fanout.event_type, write_notifications)
+
+    if 'recipient_ids' in fanout.data:
+        recipients = get_user_model().objects.filter(pk__in=fanout.data['recipient_ids'])
+    else:
+        recipients = fanout.group.members
+    if fanout.exclude_user_id:
+        recipients = recipients.exclude(pk=fanout.exclude_user_id)
+
+    while True:
+        recipient_ids = list(
+            recipients.filter(pk__gt=fanout.last_recipient_id)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:chunk_size]
+        )
+        if not recipient_ids:
+            break
+
+        now = timezone.now()
+        with transaction.atomic():
+            write_chunk(fanout, recipient_ids, now)
+            fanout.last_recipient_id = recipient_ids[-1]
+            fanout.created_count += len(recipient_ids)
+            # Refresh the lease while making progress on very large groups
+            fanout.heartbeat_at = now
+            fanout.save(update_fields=['last_recipient_id', 'created_count', 'heartbeat_at'])
+
+        created += len(recipient_ids)
+
+    fanout.status = 'completed'
+    fanout.completed_at = timezone.now()
+    fanout.save(update_fields=['status', 'completed_at'])
+    return created
+
+
+def run_pending_fanouts(limit=10, chunk_size=None):
+    """
+    Claim and process a batch of fan-outs, after failing the ones
+    abandoned on their last attempt.
+
+    Returns a tuple of (fan-outs processed, notifications created).
+    """
+    processed = 0
+    created = 0
+
+    expire_fanouts()
+
+    for fanout in claim_fanouts(limit):
+        try:
+            created += process_fanout(fanout, chunk_size)
+            processed += 1
+        except Exception as e:
+            fanout.status = 'failed' if fanout.attempts >= FANOUT_MAX_ATTEMPTS else 'pending'
+            fanout.error_message = str(e)
+            fanout.save(update_fields=['status', 'error_message'])
+
+    return processed, created
+
+
+def fanout_metrics(window=timedelta(hours=1)):
+    """
+    Throughput and lag figures for the fan-out queue.
+
+    - backlog / oldest_pending_lag: how far behind the workers are right now
+    - avg_queue_lag: time from enqueue to a worker picking the event up
+    - throughput: notifications written per second of processing time
+    """
+    now = timezone.now()
+    since = now - window
+
+    queue = NotificationFanout.objects.all()
+    oldest_pending = queue.filter(status='pending').aggregate(oldest=Min('created_at'))['oldest']
+
+    completed = queue.filter(status='completed', completed_at__gte=since)
+    totals = completed.aggregate(
+        notifications=Sum('created_count'),
+        queue_lag=Avg(F('started_at') - F('created_at')),
+        duration=Sum(F('completed_at') - F('started_at')),
+    )
+
+    notifications = totals['notifications'] or 0
+    duration = totals['duration'].total_seconds() if totals['duration'] else 0
+
+    return {
+        'backlog': queue.filter(status='pending').count(),
+        'processing': queue.filter(status='processing').count(),
+        'failed': queue.filter(status='failed').count(),
+        'oldest_pending_lag': (now - oldest_pending).total_seconds() if oldest_pending else 0,
+        'completed': completed.count(),
+        'notifications_created': notifications,
+        'avg_queue_lag': totals['queue_lag'].total_seconds() if totals['queue_lag'] else 0,
+        'throughput': notifications / duration if duration else 0,
+    }
@@ -11,7 +11,7 @@ class NotificationPreferenceForm(forms.ModelForm):
     
     class Meta:
         model = NotificationPreference
-        exclude = ['user', 'created_at', 'updated_at']
+        exclude = ['user', 'created_at', 'updated_at', 'last_digest_at']
         
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -40,7 +40,8 @@ class NotificationPreferenceForm(forms.ModelForm):
         ]
         
         self.general_fields = [
-            'email_notifications_enabled', 'push_notifications_enabled', 'sms_notifications_enabled'
+            'email_notifications_enabled', 'push_notifications_enabled', 'sms_notifications_enabled',
+            'digest_frequency'
         ]
         
         self.quiet_hours_fields = [
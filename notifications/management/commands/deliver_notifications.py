@@ -0,0 +1,111 @@
+# notifications/management/commands/deliver_notifications.py
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from notifications.delivery import DELIVERY_BATCH_SIZE, ChannelStats, DeliveryWorker, delivery_metrics
+
+
+class Command(BaseCommand):
+    help = 'Deliver pending notifications (in-app, email, SMS, push)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the pending notifications once and exit instead of polling'
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DELIVERY_BATCH_SIZE,
+            help='Number of notifications claimed per poll'
+        )
+
+        parser.add_argument(
+            '--sms-concurrency',
+            type=int,
+            default=None,
+            help='SMS provider requests in flight at once'
+        )
+
+        parser.add_argument(
+            '--push-concurrency',
+            type=int,
+            default=None,
+            help='Push provider requests in flight at once'
+        )
+
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when nothing is pending'
+        )
+
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Print the pending backlog and throughput per channel and exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.show_metrics()
+            return
+
+        concurrency = {
+            channel: options[f'{channel}_concurrency']
+            for channel in ['sms', 'push']
+            if options[f'{channel}_concurrency']
+        }
+        totals = defaultdict(ChannelStats)
+
+        self.stdout.write('Delivering notifications...')
+
+        with DeliveryWorker(concurrency) as worker:
+            try:
+                while True:
+                    stats = worker.deliver_batch(limit=options['batch_size'])
+
+                    if stats:
+                        for channel, channel_stats in stats.items():
+                            totals[channel].add(channel_stats)
+                        self.stdout.write('  ✓ ' + ', '.join(
+                            f'{channel} {self.describe(channel_stats)}' for channel, channel_stats in sorted(stats.items())
+                        ))
+                        continue
+
+                    if options['once']:
+                        break
+
+                    time.sleep(options['sleep'])
+            except KeyboardInterrupt:
+                pass
+
+        for channel, channel_stats in sorted(totals.items()):
+            self.stdout.write(
+                f'  {channel}: {self.describe(channel_stats)} ({channel_stats.throughput:.0f}/s)'
+            )
+        self.stdout.write(self.style.SUCCESS('Notifications delivered'))
+
+    def describe(self, stats):
+        parts = [f'{stats.sent} sent']
+        for label in ['failed', 'skipped', 'deferred']:
+            if getattr(stats, label):
+                parts.append(f'{getattr(stats, label)} {label}')
+        return '/'.join(parts)
+
+    def show_metrics(self):
+        metrics = delivery_metrics()
+
+        self.stdout.write('Notification Delivery')
+        self.stdout.write('=' * 50)
+        for channel, channel_metrics in metrics.items():
+            self.stdout.write(
+                f'{channel:8} {channel_metrics["pending"]:>8} pending   '
+                f'{channel_metrics["sent_recently"]:>8} sent in the last hour '
+                f'({channel_metrics["throughput"]:.2f}/s)'
+            )
@@ -0,0 +1,87 @@
+# notifications/management/commands/run_fanout.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.fanout import fanout_metrics, run_pending_fanouts
+
+
+class Command(BaseCommand):
+    help = 'Process queued notification fan-outs (e.g. new post notifications)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the queue once and exit instead of polling'
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Number of fan-out events claimed per poll'
+        )
+
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Recipients written per bulk insert'
+        )
+
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when the queue is empty'
+        )
+
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Print queue throughput and lag metrics and exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.show_metrics()
+            return
+
+        self.stdout.write('Processing notification fan-outs...')
+
+        while True:
+            started = time.monotonic()
+            processed, created = run_pending_fanouts(
+                limit=options['batch_size'],
+                chunk_size=options['chunk_size']
+            )
+            elapsed = time.monotonic() - started
+
+            if processed:
+                self.stdout.write(
+                    f'  ✓ {processed} event(s), {created} notification(s) '
+                    f'in {elapsed:.2f}s ({created / elapsed if elapsed else 0:.0f}/s)'
+                )
+                continue
+
+            if options['once']:
+                break
+
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS('Fan-out queue drained'))
+
+    def show_metrics(self):
+        metrics = fanout_metrics()
+
+        self.stdout.write('Notification Fan-out Queue')
+        self.stdout.write('=' * 50)
+        self.stdout.write(f'Backlog: {metrics["backlog"]} pending, {metrics["processing"]} processing, {metrics["failed"]} failed')
+        self.stdout.write(f'Oldest pending event: {metrics["oldest_pending_lag"]:.1f}s old')
+        self.stdout.write('')
+        self.stdout.write('Last hour:')
+        self.stdout.write(f'  Events completed: {metrics["completed"]}')
+        self.stdout.write(f'  Notifications created: {metrics["notifications_created"]}')
+        self.stdout.write(f'  Average queue lag: {metrics["avg_queue_lag"]:.2f}s')
+        self.stdout.write(f'  Throughput: {metrics["throughput"]:.0f} notifications/s')
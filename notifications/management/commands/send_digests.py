@@ -0,0 +1,37 @@
+# notifications/management/commands/send_digests.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.digest import DIGEST_CHUNK_SIZE, DIGEST_PERIODS, send_digests
+
+
+class Command(BaseCommand):
+    help = 'Queue the hourly or daily notification digest emails that are due'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--frequency',
+            choices=sorted(DIGEST_PERIODS),
+            required=True,
+            help='Which digest subscribers to send to'
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DIGEST_CHUNK_SIZE,
+            help='Number of subscribers handled per transaction'
+        )
+
+    def handle(self, *args, **options):
+        frequency = options['frequency']
+        self.stdout.write(f'Sending {frequency} digests...')
+
+        started = time.monotonic()
+        queued, processed = send_digests(frequency, chunk_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(f'  ✓ {processed} subscribers checked in {elapsed:.2f}s')
+        self.stdout.write(f'  ✓ {queued} digest emails queued')
+        self.stdout.write(self.style.SUCCESS('Digests queued'))
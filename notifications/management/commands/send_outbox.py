@@ -0,0 +1,95 @@
+# notifications/management/commands/send_outbox.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import (
+    OUTBOX_BATCH_SIZE, OUTBOX_CONNECTIONS, OUTBOX_RATE_LIMIT,
+    ConnectionPool, outbox_metrics, send_outbox_batch,
+)
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbox emails over a pool of long-lived connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain the due emails once and exit instead of polling'
+        )
+
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=OUTBOX_BATCH_SIZE,
+            help='Number of emails claimed per poll'
+        )
+
+        parser.add_argument(
+            '--connections',
+            type=int,
+            default=OUTBOX_CONNECTIONS,
+            help='Connections kept open to the mail server'
+        )
+
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=OUTBOX_RATE_LIMIT,
+            help='Maximum messages per second (0 for no limit)'
+        )
+
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls when nothing is due'
+        )
+
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Print outbox backlog and throughput and exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.show_metrics()
+            return
+
+        self.stdout.write('Sending outbox emails...')
+
+        with ConnectionPool(size=options['connections'], rate=options['rate']) as pool:
+            while True:
+                started = time.monotonic()
+                sent, retried, failed = send_outbox_batch(pool, limit=options['batch_size'])
+                elapsed = time.monotonic() - started
+
+                if sent or retried or failed:
+                    self.stdout.write(
+                        f'  ✓ {sent} sent, {retried} to retry, {failed} failed '
+                        f'in {elapsed:.2f}s ({sent / elapsed if elapsed else 0:.0f}/s)'
+                    )
+                    continue
+
+                if options['once']:
+                    break
+
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS('Outbox drained'))
+
+    def show_metrics(self):
+        metrics = outbox_metrics()
+
+        self.stdout.write('Email Outbox')
+        self.stdout.write('=' * 50)
+        self.stdout.write(
+            f'Backlog: {metrics["pending"]} pending, {metrics["sending"]} sending, {metrics["failed"]} failed'
+        )
+        self.stdout.write(f'Oldest due email: {metrics["oldest_due_lag"]:.1f}s overdue')
+        self.stdout.write('')
+        self.stdout.write('Last hour:')
+        self.stdout.write(f'  Emails sent: {metrics["sent_recently"]}')
+        self.stdout.write(f'  Throughput: {metrics["throughput"]:.2f} emails/s')
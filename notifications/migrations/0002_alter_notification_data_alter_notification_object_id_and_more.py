@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:03
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('group', '0002_groupmembership_is_deceased'),
+        ('notifications', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='data',
+            field=models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='object_id',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.CreateModel(
+            name='NotificationFanout',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('event_type', models.CharField(max_length=50)),
+                ('notification_type', models.CharField(choices=[('memorial_created', 'Memorial Created'), ('new_memory_posted', 'New Memory Posted'), ('new_condolence', 'New Condolence'), ('condolence_approved', 'Condolence Approved'), ('funeral_update', 'Funeral Update'), ('member_joined', 'New Member Joined'), ('member_approved', 'Member Request Approved'), ('member_left', 'Member Left Group'), ('group_updated', 'Group Information Updated'), ('invitation_received', 'Group Invitation'), ('new_contribution', 'New Contribution Received'), ('contribution_milestone', 'Contribution Milestone'), ('expense_recorded', 'New Expense Recorded'), ('campaign_update', 'Campaign Update'), ('contribution_completed', 'Your Contribution Completed'), ('deadline_approaching', 'Deadline Approaching'), ('welcome', 'Welcome Message'), ('profile_incomplete', 'Complete Your Profile'), ('system_update', 'System Update')], max_length=30)),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('priority', models.CharField(choices=[('low', 'Low'), ('normal', 'Normal'), ('high', 'High'), ('urgent', 'Urgent')], default='normal', max_length=10)),
+                ('object_id', models.CharField(blank=True, max_length=64, null=True)),
+                ('action_url', models.URLField(blank=True, max_length=500, null=True)),
+                ('data', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_recipient_id', models.PositiveBigIntegerField(default=0)),
+                ('created_count', models.PositiveIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('exclude_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_fanouts', to='group.group')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='notificatio_status_a246b9_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_notification_delivery_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationpreference',
+            name='digest_frequency',
+            field=models.CharField(choices=[('immediate', 'Send emails immediately'), ('hourly', 'Hourly digest'), ('daily', 'Daily digest')], db_index=True, default='immediate', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='notificationpreference',
+            name='last_digest_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -4,6 +4,7 @@ from django.conf import settings
 from django.utils import timezone
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from django.core.serializers.json import DjangoJSONEncoder
 import uuid
 
 
@@ -60,6 +61,7 @@ class Notification(models.Model):
         ('sent', 'Sent'),
         ('delivered', 'Delivered'),
         ('failed', 'Failed'),
+        ('skipped', 'Skipped'),
         ('read', 'Read'),
     ]
     
@@ -85,7 +87,8 @@ class Notification(models.Model):
         null=True, 
         blank=True
     )
-    object_id = models.PositiveIntegerField(null=True, blank=True)
+    # Stored as text so UUID primary keys (posts, groups) can be referenced
+    object_id = models.CharField(max_length=64, null=True, blank=True)
     related_object = GenericForeignKey('content_type', 'object_id')
     
     # Delivery and Status
@@ -97,9 +100,11 @@ class Notification(models.Model):
     sent_at = models.DateTimeField(null=True, blank=True)
     read_at = models.DateTimeField(null=True, blank=True)
     expires_at = models.DateTimeField(null=True, blank=True)
+    # Lease of the deliver_notifications worker holding a pending notification
+    claimed_at = models.DateTimeField(null=True, blank=True)
     
     # Additional data for complex notifications
-    data = models.JSONField(default=dict, blank=True)
+    data = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
     
     # Action URL for clickable notifications
     action_url = models.URLField(max_length=500, blank=True, null=True)
@@ -113,6 +118,7 @@ class Notification(models.Model):
             models.Index(fields=['recipient', '-created_at']),
             models.Index(fields=['notification_type', '-created_at']),
             models.Index(fields=['status', 'delivery_method']),
+            models.Index(fields=['status', 'created_at']),
             models.Index(fields=['group_key']),
         ]
     
@@ -145,6 +151,15 @@ class Notification(models.Model):
         return False
 
 
+def in_quiet_hours(start, end, now=None):
+    """Whether ``now`` (default: the current time) is between ``start`` and ``end``"""
+    now = (now or timezone.now()).time()
+    if start <= end:
+        return start <= now <= end
+    else:  # Crosses midnight
+        return now >= start or now <= end
+
+
 class NotificationPreference(models.Model):
     """
     User preferences for different notification types and delivery methods
@@ -191,6 +206,16 @@ class NotificationPreference(models.Model):
     push_notifications_enabled  = models.BooleanField(default=True)
     sms_notifications_enabled   = models.BooleanField(default=True)
     
+    # Email digest: instead of one email per notification, unread
+    # notifications are summarised hourly or daily (send_digests)
+    DIGEST_CHOICES = [
+        ('immediate', 'Send emails immediately'),
+        ('hourly', 'Hourly digest'),
+        ('daily', 'Daily digest'),
+    ]
+    digest_frequency = models.CharField(max_length=10, choices=DIGEST_CHOICES, default='immediate', db_index=True)
+    last_digest_at   = models.DateTimeField(null=True, blank=True)
+    
     # Quiet hours
     quiet_hours_enabled = models.BooleanField(default=False)
     quiet_hours_start   = models.TimeField(default='22:00') # type: ignore
@@ -202,16 +227,11 @@ class NotificationPreference(models.Model):
     def __str__(self):
         return f"Notification preferences for {self.user.profile.full_name or self.user.email}"
     
-    def is_quiet_time(self):
+    def is_quiet_time(self, now=None):
         """Check if current time is within quiet hours"""
         if not self.quiet_hours_enabled:
             return False
-        
-        now = timezone.now().time()
-        if self.quiet_hours_start <= self.quiet_hours_end:
-            return self.quiet_hours_start <= now <= self.quiet_hours_end
-        else:  # Crosses midnight
-            return now >= self.quiet_hours_start or now <= self.quiet_hours_end
+        return in_quiet_hours(self.quiet_hours_start, self.quiet_hours_end, now)
 
 
 class NotificationTemplate(models.Model):
@@ -329,4 +349,116 @@ class NotificationBatch(models.Model):
     )
     
     def __str__(self):
-        return f"Batch: {self.name} ({self.status})"
\ No newline at end of file
+        return f"Batch: {self.name} ({self.status})"
+
+
+class NotificationFanout(models.Model):
+    """
+    A single queued event (e.g. a post being published) that a worker
+    expands into one notification per group member
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    event_type = models.CharField(max_length=50)
+
+    # Audience: active members of the group (or data['recipient_ids']),
+    # minus the user who caused the event
+    group = models.ForeignKey(
+        'group.Group',
+        on_delete=models.CASCADE,
+        related_name='notification_fanouts'
+    )
+    exclude_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+
+    # Notification payload shared by every recipient
+    notification_type = models.CharField(max_length=30, choices=Notification.NOTIFICATION_TYPES)
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    priority = models.CharField(max_length=10, choices=Notification.PRIORITY_LEVELS, default='normal')
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, blank=True)
+    object_id = models.CharField(max_length=64, null=True, blank=True)
+    action_url = models.URLField(max_length=500, blank=True, null=True)
+    data = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+
+    # Progress - recipients are walked in primary key order so an
+    # interrupted fan-out resumes after the last recipient it wrote
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_recipient_id = models.PositiveBigIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} fan-out for {self.group} ({self.status})"
+
+
+class OutboxEmail(models.Model):
+    """
+    An email waiting for the send_outbox worker. Rows are written in the
+    transaction of the change that caused them, so an email goes out
+    exactly when that change commits, and sending never happens in a
+    request.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    # What the email is about, e.g. ('group_invitation', <invitation id>);
+    # the category's delivery callback is told how sending went
+    category = models.CharField(max_length=50, blank=True)
+    reference = models.CharField(max_length=64, blank=True)
+
+    from_email = models.CharField(max_length=254, blank=True)
+    to = models.JSONField(default=list)
+    subject = models.CharField(max_length=500)
+    body = models.TextField(blank=True)
+    html_body = models.TextField(blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(default=timezone.now)
+    # Earliest time the next attempt may be made (retry backoff)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['category', 'reference']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.to)} ({self.status})"
@@ -0,0 +1,333 @@
+# notifications/outbox.py - Transactional email outbox
+"""
+Instead of sending, code queues OutboxEmail rows (queue_email /
+queue_emails) in its own transaction. The send_outbox worker claims due
+rows in batches and sends them over a small pool of long-lived
+connections. The pool lives as long as the worker, so the TCP, TLS and
+AUTH handshake is paid once per connection rather than once per email.
+
+Failed sends are retried with exponential backoff, and a rate limit
+shared by the pool keeps the worker within the provider's sending quota.
+Apps that track delivery themselves (e.g. group invitations) register a
+callback for their category of email.
+
+To run the worker against a local SMTP server:
+
+    python -m aiosmtpd -n -l localhost:8025
+
+with EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend',
+EMAIL_HOST = 'localhost', EMAIL_PORT = 8025 and EMAIL_USE_TLS = False.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+# Emails claimed per worker poll
+OUTBOX_BATCH_SIZE = getattr(settings, 'EMAIL_OUTBOX_BATCH_SIZE', 100)
+
+# Connections the worker keeps open, each with its own sending thread
+OUTBOX_CONNECTIONS = getattr(settings, 'EMAIL_OUTBOX_CONNECTIONS', 2)
+
+# Messages per second across all connections; 0 disables the limit
+OUTBOX_RATE_LIMIT = getattr(settings, 'EMAIL_OUTBOX_RATE_LIMIT', 10)
+
+# Connections are reopened after this many seconds or messages: servers
+# drop long sessions and cap the messages sent over one
+OUTBOX_CONNECTION_MAX_AGE = getattr(settings, 'EMAIL_OUTBOX_CONNECTION_MAX_AGE', 300)
+OUTBOX_CONNECTION_MAX_MESSAGES = getattr(settings, 'EMAIL_OUTBOX_CONNECTION_MAX_MESSAGES', 100)
+
+# An email left in 'sending' longer than this belongs to a crashed worker
+# and is claimed again
+OUTBOX_LEASE = timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_LEASE_SECONDS', 300))
+
+OUTBOX_MAX_ATTEMPTS = 6
+
+# The first retry waits this many seconds, doubling up to the maximum
+OUTBOX_RETRY_DELAY = 60
+OUTBOX_RETRY_MAX_DELAY = 3600
+
+# category -> callable(emails) told the outcome of each batch
+DELIVERY_CALLBACKS = {}
+
+
+def register_delivery_callback(category, callback):
+    """
+    Have ``callback`` called with the ``category`` emails of every batch
+    after their outcome is recorded: status 'sent', 'failed', or
+    'pending' again when a retry is scheduled.
+    """
+    DELIVERY_CALLBACKS[category] = callback
+
+
+def outbox_email(to, subject, body='', html_body='', from_email=None, category='', reference=''):
+    """An unsaved OutboxEmail, for queue_emails"""
+    if isinstance(to, str):
+        to = [to]
+    return OutboxEmail(
+        to=list(to),
+        subject=subject[:500],
+        body=body,
+        html_body=html_body,
+        from_email=from_email or '',
+        category=category,
+        reference=str(reference or ''),
+    )
+
+
+def queue_emails(emails):
+    """Write unsaved OutboxEmail rows with one INSERT"""
+    return OutboxEmail.objects.bulk_create(emails)
+
+
+def queue_email(to, subject, **kwargs):
+    """Queue one email; takes the arguments of outbox_email"""
+    return queue_emails([outbox_email(to, subject, **kwargs)])[0]
+
+
+def email_message(email):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or None,
+        to=email.to,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(OUTBOX_RETRY_MAX_DELAY, OUTBOX_RETRY_DELAY * 2 ** max(attempts - 1, 0)))
+
+
+class RateLimiter:
+    """Spaces calls to wait() at least 1/rate seconds apart, across threads"""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            self._next = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+class PooledConnection:
+    """One backend connection, reopened when it gets old, full or breaks"""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.connection = None
+        self.opened_at = 0
+        self.sent = 0
+
+    def send(self, message):
+        if self.connection is not None and (
+            time.monotonic() - self.opened_at > OUTBOX_CONNECTION_MAX_AGE
+            or self.sent >= OUTBOX_CONNECTION_MAX_MESSAGES
+        ):
+            self.close()
+
+        try:
+            if self.connection is None:
+                self.connection = get_connection(self.backend)
+                self.connection.open()
+                self.opened_at = time.monotonic()
+                self.sent = 0
+            if not self.connection.send_messages([message]):
+                raise RuntimeError('The email backend did not send the message')
+        except Exception:
+            # The session may be unusable; the next message reconnects
+            self.close()
+            raise
+        self.sent += 1
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+
+class ConnectionPool:
+    """
+    ``size`` long-lived connections, each driven by its own thread. Keep
+    one for the life of the worker so connections outlive batches.
+    """
+
+    def __init__(self, size=OUTBOX_CONNECTIONS, rate=OUTBOX_RATE_LIMIT, backend=None):
+        self.connections = [PooledConnection(backend) for _ in range(max(size, 1))]
+        self.limiter = RateLimiter(rate)
+        self.executor = ThreadPoolExecutor(max_workers=len(self.connections), thread_name_prefix='outbox')
+
+    def send(self, messages):
+        """Send ``messages``; returns None (sent) or the exception for each"""
+        results = [None] * len(messages)
+        lanes = len(self.connections)
+
+        def send_lane(lane):
+            connection = self.connections[lane]
+            for index in range(lane, len(messages), lanes):
+                self.limiter.wait()
+                try:
+                    connection.send(messages[index])
+                except Exception as exc:
+                    results[index] = exc
+
+        list(self.executor.map(send_lane, range(lanes)))
+        return results
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def expire_outbox(now=None):
+    """
+    Fail emails whose lease ran out on their last attempt.
+
+    claim_outbox will not hand them out again, so without this they would
+    stay 'sending' and their category's callback would never hear of
+    them. The rows are stamped like a claim, so concurrent workers never
+    report the same email twice.
+    Returns the failed emails.
+    """
+    now = now or timezone.now()
+    expired = Q(status='sending', claimed_at__lt=now - OUTBOX_LEASE, attempts__gte=OUTBOX_MAX_ATTEMPTS)
+
+    candidate_ids = list(OutboxEmail.objects.filter(expired).values_list('id', flat=True))
+    if not candidate_ids:
+        return []
+
+    OutboxEmail.objects.filter(expired, pk__in=candidate_ids).update(
+        status='failed',
+        claimed_at=now,
+        last_error='Sending did not finish',
+    )
+    return list(OutboxEmail.objects.filter(pk__in=candidate_ids, status='failed', claimed_at=now))
+
+
+def _report_delivery(emails):
+    """Hand each registered category the outcome of its emails"""
+    by_category = {}
+    for email in emails:
+        if email.category in DELIVERY_CALLBACKS:
+            by_category.setdefault(email.category, []).append(email)
+    for category, category_emails in by_category.items():
+        DELIVERY_CALLBACKS[category](category_emails)
+
+
+def claim_outbox(limit=OUTBOX_BATCH_SIZE):
+    """
+    Claim up to ``limit`` due (or abandoned) emails for this worker.
+
+    The batch is claimed with one conditional UPDATE stamped with this
+    worker's claim time; only the rows carrying that stamp afterwards
+    belong to it.
+    """
+    now = timezone.now()
+    claimable = (
+        Q(status='pending', next_attempt_at__lte=now)
+        | Q(status='sending', claimed_at__lt=now - OUTBOX_LEASE)
+    ) & Q(attempts__lt=OUTBOX_MAX_ATTEMPTS)
+
+    candidate_ids = list(
+        OutboxEmail.objects.filter(claimable)
+        .order_by('next_attempt_at')
+        .values_list('id', flat=True)[:limit]
+    )
+    if not candidate_ids:
+        return []
+
+    OutboxEmail.objects.filter(claimable, pk__in=candidate_ids).update(
+        status='sending',
+        claimed_at=now,
+        attempts=F('attempts') + 1,
+    )
+    return list(OutboxEmail.objects.filter(pk__in=candidate_ids, status='sending', claimed_at=now))
+
+
+def send_outbox_batch(pool, limit=OUTBOX_BATCH_SIZE):
+    """
+    Claim one batch and send it over ``pool``. Emails abandoned on their
+    last attempt are failed first.
+    Returns (sent, retried, failed).
+    """
+    expired = expire_outbox()
+    _report_delivery(expired)
+
+    emails = claim_outbox(limit)
+    if not emails:
+        return 0, 0, len(expired)
+
+    results = pool.send([email_message(email) for email in emails])
+
+    now = timezone.now()
+    sent = retried = 0
+    failed = len(expired)
+    for email, error in zip(emails, results):
+        if error is None:
+            sent += 1
+            email.status = 'sent'
+            email.sent_at = now
+            email.last_error = ''
+        elif email.attempts >= OUTBOX_MAX_ATTEMPTS:
+            failed += 1
+            email.status = 'failed'
+            email.last_error = str(error)[:1000]
+        else:
+            retried += 1
+            email.status = 'pending'
+            email.next_attempt_at = now + retry_delay(email.attempts)
+            email.last_error = str(error)[:1000]
+
+    OutboxEmail.objects.bulk_update(emails, ['status', 'sent_at', 'last_error', 'next_attempt_at'])
+
+    _report_delivery(emails)
+
+    return sent, retried, failed
+
+
+def outbox_metrics(window=timedelta(hours=1)):
+    """Backlog and recent throughput of the outbox, for send_outbox --stats"""
+    now = timezone.now()
+    by_status = dict(OutboxEmail.objects.values_list('status').annotate(n=Count('pk')).order_by())
+    oldest_due = OutboxEmail.objects.filter(status='pending', next_attempt_at__lte=now).aggregate(
+        oldest=Min('next_attempt_at')
+    )['oldest']
+    sent_recently = OutboxEmail.objects.filter(status='sent', sent_at__gte=now - window).count()
+
+    return {
+        'pending': by_status.get('pending', 0),
+        'sending': by_status.get('sending', 0),
+        'sent': by_status.get('sent', 0),
+        'failed': by_status.get('failed', 0),
+        'oldest_due_lag': (now - oldest_due).total_seconds() if oldest_due else 0.0,
+        'sent_recently': sent_recently,
+        'throughput': sent_recently / window.total_seconds(),
+    }
@@ -0,0 +1,125 @@
+# notifications/preferences.py - Compiled notification preferences
+"""
+NotificationPreference has a switch per delivery method plus columns of
+the form ``<notification type>_<channel>`` (e.g. new_condolence_email).
+Deciding whether a notification may be sent means consulting several of
+them, plus quiet hours.
+
+For bulk delivery a row is compiled into a bitmask with one bit per
+(notification type, channel) pair. The bit is set when both the channel
+switch and the type's column (where there is one) allow it. Quiet hours
+are evaluated once when the batch is loaded. The decision inside the
+delivery loop is then a single bit test. Users without a row get the
+mask of an unsaved NotificationPreference, so missing rows need no
+INSERT.
+
+Users on an hourly or daily digest have no email bits. Their
+notifications reach them through send_digests instead.
+"""
+from collections import namedtuple
+from itertools import product
+
+from django.utils import timezone
+
+from .models import Notification, NotificationPreference, in_quiet_hours
+
+
+CHANNELS = ['email', 'sms', 'push', 'in_app']
+
+# Master switch of each channel; in-app notifications are always allowed
+CHANNEL_SWITCHES = {
+    'email': 'email_notifications_enabled',
+    'sms': 'sms_notifications_enabled',
+    'push': 'push_notifications_enabled',
+}
+
+# Notification types whose preference columns use another name
+TYPE_PREFIXES = {
+    'invitation_received': 'group_invitation',
+}
+
+PREFERENCE_FIELDS = {field.name for field in NotificationPreference._meta.concrete_fields}
+
+# (notification type, channel) -> its bit
+BITS = {
+    key: 1 << index
+    for index, key in enumerate(product(
+        [notification_type for notification_type, _ in Notification.NOTIFICATION_TYPES], CHANNELS
+    ))
+}
+
+
+def type_field(notification_type, channel):
+    """The per-type column for ``notification_type`` on ``channel``, or None"""
+    field = f'{TYPE_PREFIXES.get(notification_type, notification_type)}_{channel}'
+    return field if field in PREFERENCE_FIELDS else None
+
+
+# The columns a mask is compiled from
+MASK_FIELDS = sorted(
+    set(CHANNEL_SWITCHES.values())
+    | {'digest_frequency'}
+    | {field for notification_type, channel in BITS if (field := type_field(notification_type, channel))}
+)
+
+QUIET_FIELDS = ['quiet_hours_enabled', 'quiet_hours_start', 'quiet_hours_end']
+
+CompiledPreferences = namedtuple('CompiledPreferences', ['mask', 'quiet'])
+
+
+def compile_mask(values):
+    """The bitmask of a preference row given as {field: value}"""
+    mask = 0
+    for (notification_type, channel), bit in BITS.items():
+        switch = CHANNEL_SWITCHES.get(channel)
+        if switch and not values[switch]:
+            continue
+        if channel == 'email' and values['digest_frequency'] != 'immediate':
+            continue
+        field = type_field(notification_type, channel)
+        if field and not values[field]:
+            continue
+        mask |= bit
+    return mask
+
+
+def compile_preferences(values, now=None):
+    quiet = values['quiet_hours_enabled'] and in_quiet_hours(
+        values['quiet_hours_start'], values['quiet_hours_end'], now
+    )
+    return CompiledPreferences(compile_mask(values), quiet)
+
+
+def preference_values(preferences):
+    return {field: getattr(preferences, field) for field in MASK_FIELDS + QUIET_FIELDS}
+
+
+# Compiled from the model's field defaults: what users without a row get
+DEFAULT_VALUES = preference_values(NotificationPreference())
+
+
+def preload_preferences(user_ids, now=None):
+    """
+    {user id: CompiledPreferences} for ``user_ids`` with one query,
+    quiet hours evaluated at ``now``
+    """
+    now = now or timezone.now()
+    default = compile_preferences(DEFAULT_VALUES, now)
+    compiled = {user_id: default for user_id in user_ids}
+    for values in NotificationPreference.objects.filter(user_id__in=compiled).values('user_id', *MASK_FIELDS, *QUIET_FIELDS):
+        compiled[values['user_id']] = compile_preferences(values, now)
+    return compiled
+
+
+def delivery_decision(preferences, notification):
+    """
+    'send', 'skip' (the recipient turned this type or delivery method
+    off) or 'later' (quiet hours; high and urgent notifications go
+    through) for ``notification`` given its recipient's
+    CompiledPreferences
+    """
+    if not preferences.mask & BITS.get((notification.notification_type, notification.delivery_method), 0):
+        return 'skip'
+    if preferences.quiet and notification.delivery_method != 'in_app' and notification.priority not in ['high', 'urgent']:
+        return 'later'
+    return 'send'
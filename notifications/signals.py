@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import NotificationTemplate
+from .template_cache import template_cache
+
+
+@receiver(post_save, sender=NotificationTemplate)
+@receiver(post_delete, sender=NotificationTemplate)
+def clear_template_cache(sender, **kwargs):
+    """
+    Drop this process's compiled templates; other processes notice the
+    change through the cache's version stamp
+    """
+    template_cache.clear()
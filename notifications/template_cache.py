@@ -0,0 +1,94 @@
+# notifications/template_cache.py - Compiled notification templates
+"""
+NotificationTemplate strings are compiled into django Template objects
+once per process rather than once per notification. Compiled templates
+are keyed by (notification_type, channel, updated_at), so an edited
+template never reuses the compiled form of its previous text.
+
+The cache is kept fresh two ways:
+- post_save and post_delete on NotificationTemplate clear it in the
+  process that made the change;
+- every process compares a version stamp of the table (its row count
+  and newest updated_at) at most every TEMPLATE_CACHE_CHECK_SECONDS,
+  which picks up changes made by other processes.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.template import Template
+
+from .models import NotificationTemplate
+
+
+# How stale another process's edit may appear here
+TEMPLATE_CACHE_CHECK_SECONDS = getattr(settings, 'NOTIFICATION_TEMPLATE_CHECK_SECONDS', 5)
+
+# channel -> NotificationTemplate fields rendered for it
+CHANNEL_FIELDS = {
+    'email': ('email_subject_template', 'email_body_template'),
+    'sms': ('sms_template',),
+    'push': ('push_title_template', 'push_body_template'),
+    'in_app': ('in_app_title_template', 'in_app_message_template'),
+}
+
+
+class TemplateCache:
+    """Active NotificationTemplates and their compiled strings, per process"""
+
+    def __init__(self, check_seconds=TEMPLATE_CACHE_CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.templates = None
+            self.compiled = {}
+            self.version = None
+            self.checked_at = 0
+
+    def current_version(self):
+        stamp = NotificationTemplate.objects.aggregate(count=Count('pk'), latest=Max('updated_at'))
+        return stamp['count'], stamp['latest']
+
+    def active_templates(self):
+        """notification_type -> active NotificationTemplate"""
+        with self.lock:
+            now = time.monotonic()
+            if self.templates is not None and now - self.checked_at < self.check_seconds:
+                return self.templates
+
+            version = self.current_version()
+            if self.templates is None or version != self.version:
+                self.templates = {
+                    template.notification_type: template
+                    for template in NotificationTemplate.objects.filter(is_active=True)
+                }
+                self.compiled = {}
+                self.version = version
+            self.checked_at = now
+            return self.templates
+
+    def get(self, notification_type):
+        """The active template of ``notification_type``; raises DoesNotExist like a query would"""
+        try:
+            return self.active_templates()[notification_type]
+        except KeyError:
+            raise NotificationTemplate.DoesNotExist(
+                f'No active notification template for {notification_type!r}'
+            ) from None
+
+    def render(self, notification_type, channel, context):
+        """The rendered CHANNEL_FIELDS of ``channel``, as a tuple"""
+        template = self.get(notification_type)
+        key = (notification_type, channel, template.updated_at)
+        compiled = self.compiled.get(key)
+        if compiled is None:
+            compiled = tuple(Template(getattr(template, field)) for field in CHANNEL_FIELDS[channel])
+            self.compiled[key] = compiled
+        return tuple(part.render(context) for part in compiled)
+
+
+template_cache = TemplateCache()
@@ -1,15 +1,17 @@
 # notifications/utils.py - Utility functions for notifications
-from django.template import Template, Context
-from django.core.mail import send_mail
+from django.template import Context
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 import json
 
 from .models import (
-    Notification, NotificationTemplate, NotificationPreference,
+    Notification, NotificationPreference,
     NotificationDeliveryLog
 )
+from .outbox import outbox_email, queue_emails, register_delivery_callback
+from .preferences import compile_preferences, delivery_decision, preference_values
+from .template_cache import template_cache
 
 
 class NotificationService:
@@ -42,7 +44,7 @@ class NotificationService:
         object_id = None
         if related_object:
             content_type = ContentType.objects.get_for_model(related_object)
-            object_id = related_object.pk
+            object_id = str(related_object.pk)
         
         notification = Notification.objects.create(
             recipient=recipient,
@@ -65,19 +67,8 @@ class NotificationService:
         Send notification via specified delivery method
         """
         try:
-            # Check user preferences
-            preferences = getattr(notification.recipient, 'notification_preferences', None)
-            if not preferences:
-                preferences = NotificationPreference.objects.create(
-                    user=notification.recipient
-                )
-            
-            # Check if delivery method is enabled
-            if not cls._is_delivery_method_enabled(notification, preferences):
-                return False
-            
-            # Check quiet hours
-            if preferences.is_quiet_time() and notification.priority not in ['high', 'urgent']:
+            preferences = cls.get_preferences(notification.recipient)
+            if cls.delivery_decision(notification, preferences) != 'send':
                 return False
             
             # Send based on delivery method
@@ -97,49 +88,75 @@ class NotificationService:
             return False
     
     @classmethod
-    def _is_delivery_method_enabled(cls, notification, preferences):
-        """Check if delivery method is enabled for user"""
-        method_map = {
-            'email': preferences.email_notifications_enabled,
-            'sms': preferences.sms_notifications_enabled,
-            'push': preferences.push_notifications_enabled,
-            'in_app': True  # Always enabled
-        }
-        return method_map.get(notification.delivery_method, False)
+    def get_preferences(cls, user):
+        """The user's preferences; unsaved defaults if they have none"""
+        preferences = getattr(user, 'notification_preferences', None)
+        if not preferences:
+            preferences = NotificationPreference(user=user)
+        return preferences
+    
+    @classmethod
+    def delivery_decision(cls, notification, preferences):
+        """
+        'send', 'skip' or 'later' for ``notification`` given its
+        recipient's NotificationPreference (see preferences.delivery_decision)
+        """
+        compiled = compile_preferences(preference_values(preferences))
+        return delivery_decision(compiled, notification)
+    
+    @classmethod
+    def render(cls, notification, channel):
+        """
+        The notification rendered with its type's active template for
+        ``channel`` (see template_cache.CHANNEL_FIELDS)
+        """
+        context = Context({
+            'user': notification.recipient,
+            'notification': notification,
+            **notification.data
+        })
+        return template_cache.render(notification.notification_type, channel, context)
+    
+    @classmethod
+    def render_email(cls, notification):
+        """The notification as an unsaved OutboxEmail"""
+        subject, body = cls.render(notification, 'email')
+        return outbox_email(
+            to=notification.recipient.email,
+            subject=subject,
+            body=body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            category='notification',
+            reference=notification.pk,
+        )
+    
+    @classmethod
+    def render_sms(cls, notification):
+        """(phone number, message) of an SMS notification"""
+        phone_number = getattr(notification.recipient, 'phone_number', None)
+        if not phone_number:
+            raise Exception("User has no phone number")
+        
+        message, = cls.render(notification, 'sms')
+        
+        # Truncate to SMS limit
+        if len(message) > 160:
+            message = message[:157] + '...'
+        return phone_number, message
+    
+    @classmethod
+    def render_push(cls, notification):
+        """(title, body) of a push notification"""
+        return cls.render(notification, 'push')
     
     @classmethod
     def _send_email(cls, notification):
-        """Send email notification"""
+        """Queue email notification"""
         try:
-            template = NotificationTemplate.objects.get(
-                notification_type=notification.notification_type,
-                is_active=True
-            )
-            
-            # Render templates
-            context = Context({
-                'user': notification.recipient,
-                'notification': notification,
-                **notification.data
-            })
-            
-            subject_template = Template(template.email_subject_template)
-            body_template = Template(template.email_body_template)
-            
-            subject = subject_template.render(context)
-            body = body_template.render(context)
-            
-            # Send email
-            send_mail(
-                subject=subject,
-                message=body,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[notification.recipient.email],
-                fail_silently=False
-            )
+            # Hand the email to the outbox; email_delivered logs the outcome
+            queue_emails([cls.render_email(notification)])
             
             notification.mark_as_sent()
-            cls._log_delivery_success(notification, 'email')
             return True
             
         except Exception as e:
@@ -148,39 +165,10 @@ class NotificationService:
     
     @classmethod
     def _send_sms(cls, notification):
-        """Send SMS notification - integrate with South African SMS providers"""
-        # This is a placeholder for SMS integration
-        # You would integrate with providers like:
-        # - Clickatell (popular in SA)
-        # - SMSPortal
-        # - Twilio
-        
+        """Send SMS notification"""
         try:
-            # Example integration with SMS provider
-            phone_number = getattr(notification.recipient, 'phone_number', None)
-            if not phone_number:
-                raise Exception("User has no phone number")
-            
-            template = NotificationTemplate.objects.get(
-                notification_type=notification.notification_type,
-                is_active=True
-            )
-            
-            context = Context({
-                'user': notification.recipient,
-                'notification': notification,
-                **notification.data
-            })
-            
-            sms_template = Template(template.sms_template)
-            message = sms_template.render(context)
-            
-            # Truncate to SMS limit
-            if len(message) > 160:
-                message = message[:157] + '...'
-            
-            # Send SMS via your provider
-            # response = your_sms_provider.send_sms(phone_number, message)
+            phone_number, message = cls.render_sms(notification)
+            send_sms_message(phone_number, message)
             
             notification.mark_as_sent()
             cls._log_delivery_success(notification, 'sms')
@@ -193,34 +181,9 @@ class NotificationService:
     @classmethod
     def _send_push(cls, notification):
         """Send push notification"""
-        # Placeholder for push notification integration
-        # You would integrate with services like:
-        # - Firebase Cloud Messaging (FCM)
-        # - OneSignal
-        # - Pusher
-        
         try:
-            template = NotificationTemplate.objects.get(
-                notification_type=notification.notification_type,
-                is_active=True
-            )
-            
-            context = Context({
-                'user': notification.recipient,
-                'notification': notification,
-                **notification.data
-            })
-            
-            title_template = Template(template.push_title_template)
-            body_template = Template(template.push_body_template)
-            
-            title = title_template.render(context)
-            body = body_template.render(context)
-            
-            # Send push notification via your provider
-            # response = your_push_provider.send_notification(
-            #     user_token, title, body, notification.action_url
-            # )
+            title, body = cls.render_push(notification)
+            send_push_message(notification.recipient_id, title, body, notification.action_url)
             
             notification.mark_as_sent()
             cls._log_delivery_success(notification, 'push')
@@ -255,6 +218,55 @@ class NotificationService:
         notification.save(update_fields=['status'])
 
 
+def send_sms_message(phone_number, message):
+    """
+    Send an SMS - integrate with South African SMS providers such as
+    Clickatell (popular in SA), SMSPortal or Twilio. Returns the provider's
+    message id. Called from delivery worker threads: no database access.
+    """
+    # response = your_sms_provider.send_sms(phone_number, message)
+    return ''
+
+
+def send_push_message(user_id, title, body, url=None):
+    """
+    Send a push notification - integrate with a service such as Firebase
+    Cloud Messaging (FCM), OneSignal or Pusher. Returns the provider's
+    message id. Called from delivery worker threads: no database access.
+    """
+    # response = your_push_provider.send_notification(user_token, title, body, url)
+    return ''
+
+
+def email_delivered(emails):
+    """Outbox callback: log the delivery of notification emails"""
+    now = timezone.now()
+    status = {'sent': 'success', 'pending': 'retry', 'failed': 'failed'}
+    existing = {
+        str(pk) for pk in
+        Notification.objects.filter(pk__in=[email.reference for email in emails]).values_list('pk', flat=True)
+    }
+    emails = [email for email in emails if email.reference in existing]
+    NotificationDeliveryLog.objects.bulk_create([
+        NotificationDeliveryLog(
+            notification_id=email.reference,
+            delivery_method='email',
+            status=status[email.status],
+            error_message=email.last_error,
+            attempted_at=now,
+            delivered_at=email.sent_at if email.status == 'sent' else None,
+            external_id=str(email.pk),
+        )
+        for email in emails
+    ])
+    Notification.objects.filter(
+        pk__in=[email.reference for email in emails if email.status == 'failed']
+    ).update(status='failed')
+
+
+register_delivery_callback('notification', email_delivered)
+
+
 # Convenience functions for common notification types
 def notify_memorial_created(memorial, users=None):
     """Send notification when memorial is created"""